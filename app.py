@@ -1,37 +1,18 @@
 from sqlalchemy import func
 from flask import Flask
 from db import db
+import cache
+import dataset_profiler
+import dataset_variants
+import dataset_worker
+import metrics
+import publisher
+import uploads
 from routes import admin, auth
+from builder import assets, cli as build_cli, deps, jinja_cache
 from flask_login import LoginManager
 from models import AdminUser
-from models import FunctionImpl
-from models import BenchmarkDataset, PipelineDataset
-
-def function_family_usage_count(family_id):
-    return (
-        FunctionImpl.query
-        .filter_by(family_id=family_id)
-        .count()
-    )
-
-def usage_dataset(ds):
-    bench_count = (
-        BenchmarkDataset.query
-        .filter_by(dataset_id=ds.id)
-        .count()
-    )
-
-    pipeline_count = (
-        PipelineDataset.query
-        .filter_by(dataset_id=ds.id)
-        .count()
-    )
-
-    return {
-        "benchmarks": bench_count,
-        "pipelines": pipeline_count,
-        "total": bench_count + pipeline_count,
-    }
+
 
 login_manager = LoginManager()
 
@@ -43,8 +24,12 @@ def create_app():
 
     app = Flask(__name__)
     app.config.from_object("config.Config")
+    uploads.init_app(app)
 
     db.init_app(app)
+    deps.init_app(app)
+    cache.init_app(app)
+    metrics.init_app(app)
 
     @app.teardown_appcontext
     def shutdown_session(exception=None):
@@ -54,15 +39,17 @@ def create_app():
     login_manager.login_view = "auth.login"
 
     app.config["DEBUG"] = False
-    app.config["TEMPLATES_AUTO_RELOAD"] = True
 
     app.register_blueprint(auth.bp)
     app.register_blueprint(admin.bp, url_prefix="/admin")
 
-    app.jinja_env.filters["function_family_usage_count"] = (
-        function_family_usage_count
-    )
-    app.jinja_env.filters["usage_dataset"] = usage_dataset
+    jinja_cache.init_app(app)
+    assets.init_app(app)
+    publisher.init_app(app)
+    dataset_profiler.init_app(app)
+    dataset_variants.init_app(app)
+    dataset_worker.init_app(app)
+    build_cli.init_app(app)
     return app
 
 
@@ -0,0 +1,7 @@
+from .paths import BUILD_DIR, DOCS_DIR, BASE_URL
+
+__all__ = [
+    "BUILD_DIR",
+    "DOCS_DIR",
+    "BASE_URL",
+]
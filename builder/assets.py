@@ -0,0 +1,233 @@
+from hashlib import sha256
+from pathlib import Path
+from typing import Dict, List, Optional
+import json
+import os
+import re
+import threading
+import time
+
+from flask import Flask, current_app
+
+# -------------------------------------------------------------------
+# Static asset fingerprinting
+#
+# `flask fingerprint-static` copies every asset under static/ to a
+# content-addressed name next to it and records the mapping:
+#
+#   static/css/style.css  ->  static/css/style.3f2a9c1be0.css
+#   static/assets.json       {"css/style.css": "css/style.3f2a9c1be0.css", ...}
+#
+# Templates (both Jinja envs) reference assets through asset_url(),
+# which resolves through the manifest, so fingerprinted URLs can be
+# cached as immutable. url(...) references inside CSS are rewritten
+# to fingerprinted names before the CSS itself is hashed: changing a
+# font changes the stylesheet's name too.
+#
+# Without a manifest (fresh checkout, development) asset_url() returns
+# the plain /static/ path. Pages embed the fingerprinted URLs, so run
+# `flask build-site` after `flask fingerprint-static`. Old copies are
+# kept, because pages of older site generations (and browsers holding
+# old pages) still use them; --prune drops the ones no longer in the
+# manifest.
+# -------------------------------------------------------------------
+
+MANIFEST_NAME = "assets.json"
+STATIC_URL = "/static/"
+
+HASH_CHARS = 10
+
+# Script bundles of built pages (builder/bundle.py), already fingerprinted
+BUNDLE_DIR = "bundles"
+
+# Not fingerprinted: dataset downloads (uploads.py) and generated files
+SKIP_DIRS = {"datasets", BUNDLE_DIR}
+SKIP_SUFFIXES = {".gz", ".br", ".map", ".tmp"}
+
+_FINGERPRINTED = re.compile(r"\.[0-9a-f]{%d}(\.[^./]+)$" % HASH_CHARS)
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+_URL_TAIL = re.compile(r"([^?#]*)(.*)")
+
+# How often (s) asset_url() checks the manifest for a newer version
+RELOAD_INTERVAL = 2.0
+
+
+def fingerprinted_name(rel: str, digest: str) -> str:
+    """
+    "prism/prism.min.js" -> "prism/prism.min.<hash>.js"
+    """
+    stem, dot, suffix = rel.rpartition(".")
+    if not dot or "/" in suffix:
+        return f"{rel}.{digest[:HASH_CHARS]}"
+    return f"{stem}.{digest[:HASH_CHARS]}.{suffix}"
+
+
+def _sources(root: Path) -> List[str]:
+    rels = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = Path(dirpath).relative_to(root)
+        if rel_dir == Path("."):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for name in filenames:
+            rel = (rel_dir / name).as_posix()
+            if (
+                Path(name).suffix in SKIP_SUFFIXES
+                or _FINGERPRINTED.search(name)
+                or rel == MANIFEST_NAME
+            ):
+                continue
+            rels.append(rel)
+    return sorted(rels)
+
+
+def _rewrite_css(css: str, rel: str, manifest: Dict[str, str]) -> str:
+    base = os.path.dirname(rel) or "."
+
+    def replace(match):
+        quote, url = match.group(1), match.group(2).strip()
+        if url.startswith(("data:", "http:", "https:", "//", "#")):
+            return match.group(0)
+        # keep ?#iefix-style suffixes
+        path, tail = _URL_TAIL.match(url).groups()
+        if path.startswith(STATIC_URL):
+            target = path[len(STATIC_URL):]
+        else:
+            target = os.path.normpath(os.path.join(base, path))
+        hashed = manifest.get(target)
+        if hashed is None:
+            return match.group(0)
+        new = STATIC_URL + hashed if path.startswith(STATIC_URL) else os.path.relpath(hashed, base)
+        return f"url({quote}{new}{tail}{quote})"
+
+    return _CSS_URL.sub(replace, css)
+
+
+def _write_copy(dest: Path, data: bytes, replace: bool = False) -> bool:
+    # same name, same bytes: an existing copy is already right
+    if dest.exists() and not replace:
+        return False
+    tmp = dest.with_name(dest.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(dest)
+    return True
+
+
+def fingerprint_static(root: Path, prune: bool = False) -> Dict[str, int]:
+    """
+    Write fingerprinted copies and the manifest. CSS goes last, so its
+    url() references can point at fingerprinted files.
+    """
+    rels = _sources(root)
+    rels.sort(key=lambda r: r.endswith(".css"))
+
+    manifest: Dict[str, str] = {}
+    written = 0
+    for rel in rels:
+        data = (root / rel).read_bytes()
+        if rel.endswith(".css"):
+            data = _rewrite_css(data.decode("utf-8"), rel, manifest).encode("utf-8")
+        hashed = fingerprinted_name(rel, sha256(data).hexdigest())
+        manifest[rel] = hashed
+        written += _write_copy(root / hashed, data)
+
+    _write_copy(root / MANIFEST_NAME, json.dumps(manifest, indent=1, sort_keys=True).encode(), replace=True)
+    _manifest.invalidate()
+
+    removed = 0
+    if prune:
+        live = set(manifest.values())
+        for path in root.rglob("*"):
+            rel = path.relative_to(root).as_posix()
+            if rel.split("/", 1)[0] in SKIP_DIRS or not path.is_file():
+                continue
+            # compress-static siblings go with their file
+            base = rel[:-len(path.suffix)] if path.suffix in (".gz", ".br") else rel
+            if _FINGERPRINTED.search(base) and base not in live:
+                path.unlink()
+                removed += 1
+
+    return {"assets": len(manifest), "written": written, "removed": removed}
+
+
+# -------------------------------------------------------------------
+# Lookup
+# -------------------------------------------------------------------
+
+class _Manifest:
+    """
+    static/assets.json, reloaded when the file changes (checked at most
+    every RELOAD_INTERVAL seconds).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._mapping: Dict[str, str] = {}
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+        self.version = ""
+
+    def invalidate(self) -> None:
+        self._checked = 0.0
+
+    def get(self) -> Dict[str, str]:
+        now = time.monotonic()
+        if now - self._checked < RELOAD_INTERVAL:
+            return self._mapping
+        with self._lock:
+            self._checked = now
+            try:
+                mtime = self.path.stat().st_mtime
+            except FileNotFoundError:
+                self._mapping, self._mtime, self.version = {}, None, ""
+                return self._mapping
+            if mtime != self._mtime:
+                data = self.path.read_bytes()
+                self._mapping = json.loads(data)
+                self._mtime = mtime
+                self.version = sha256(data).hexdigest()[:HASH_CHARS]
+        return self._mapping
+
+
+_manifest = _Manifest(Path(__file__).resolve().parent.parent / "static" / MANIFEST_NAME)
+
+
+def asset_url(rel: str) -> str:
+    """
+    Public URL of a static asset, fingerprinted when the manifest has it.
+    """
+    rel = rel.lstrip("/")
+    return STATIC_URL + _manifest.get().get(rel, rel)
+
+
+def static_file(url: str) -> Optional[Path]:
+    """
+    The file behind a /static/ URL (asset_url() output), if it exists.
+    Needs an app context.
+    """
+    if not url.startswith(STATIC_URL):
+        return None
+    path = Path(current_app.static_folder) / url[len(STATIC_URL):].split("?", 1)[0]
+    return path if path.is_file() else None
+
+
+def assets_version() -> str:
+    """
+    Short hash of the manifest ("" without one), for cache keys of
+    rendered HTML.
+    """
+    _manifest.get()
+    return _manifest.version
+
+
+def init_app(app: Flask) -> None:
+    """
+    Expose asset_url() to both Jinja envs.
+    """
+    # here, not at module level: page stages (builder/writer.py) use
+    # this module, and builder/pages.py imports the writer
+    from .pages import env
+
+    _manifest.path = Path(app.static_folder) / MANIFEST_NAME
+    app.jinja_env.globals["asset_url"] = asset_url
+    env.globals["asset_url"] = asset_url
@@ -0,0 +1,142 @@
+from hashlib import sha256
+from pathlib import Path
+from typing import Dict, List, Tuple
+import html as htmllib
+import os
+import re
+
+from flask import current_app
+
+from .assets import BUNDLE_DIR, STATIC_URL, fingerprinted_name, static_file
+from .compress import compress_file
+from .minify import minify_js
+
+# -------------------------------------------------------------------
+# Script bundles (page stage, see builder/writer.py)
+#
+# Templates mark the scripts a built page may bundle, in order:
+#
+#   <script defer src="{{ asset_url('js/main.js') }}" data-bundle></script>
+#   <script defer src="{{ asset_url('prism/prism.min.js') }}" data-bundle="code"></script>
+#
+# Scripts marked data-bundle="code" (Prism and its languages, and the
+# inline highlightAll call) are only needed on pages that contain a
+# <code class="language-*"> block not highlighted at build time
+# (builder/highlight.py). For every built page, this stage
+# concatenates the scripts the page needs, minifies them (not the
+# .min.js ones) and writes one fingerprinted file per page class:
+#
+#   static/bundles/site.<hash>.js        listings, cards
+#   static/bundles/site-code.<hash>.js   pages with code blocks
+#
+# The first marked tag becomes one deferred <script> for that bundle,
+# the others are dropped. Bundles are written once per process and
+# content (same bytes, same name), with their .gz/.br siblings. Old
+# bundles are kept for older site generations.
+#
+# Pages rendered by Flask (admin) never reach this stage: there the
+# marked scripts load one by one.
+# -------------------------------------------------------------------
+
+BUNDLE_NAME = "site"
+
+_SCRIPT = re.compile(
+    r"<script\b(?P<attrs>[^>]*\bdata-bundle\b[^>]*)>(?P<body>.*?)</script\s*>",
+    re.I | re.S,
+)
+_GROUP = re.compile(r"""\bdata-bundle\s*=\s*(['"])(.*?)\1""", re.I)
+_SRC = re.compile(r"""\bsrc\s*=\s*(['"])(.*?)\1""", re.I)
+
+# Blocks left for Prism (class="language-cpp", "lang-c"...)
+_CODE = re.compile(
+    r"""<code\b(?![^>]*\bdata-highlighted\b)[^>]*\bclass\s*=\s*(['"])[^'"]*\blang(uage)?-[\w+-]+""",
+    re.I,
+)
+
+# One part of a bundle: ("src", url) or ("inline", body)
+Part = Tuple[str, str]
+
+# (parts) -> bundle URL, per process
+_written: Dict[Tuple[Part, ...], str] = {}
+
+
+def page_groups(html: str) -> List[str]:
+    """
+    Optional script groups the page needs.
+    """
+    return ["code"] if _CODE.search(html) else []
+
+
+def _part_source(part: Part) -> str:
+    kind, value = part
+    if kind == "inline":
+        return minify_js(value)
+    path = static_file(value)
+    if path is None:
+        raise FileNotFoundError(f"Bundled script {value} is not under static/")
+    source = path.read_text("utf-8")
+    return source if path.name.endswith(".min.js") else minify_js(source)
+
+
+def write_bundle(name: str, parts: Tuple[Part, ...]) -> str:
+    """
+    Write (once) the bundle of these parts and return its URL.
+    """
+    url = _written.get(parts)
+    if url is not None:
+        return url
+
+    # ";" between parts: a file may end without one (ASI across files)
+    data = "\n;\n".join(_part_source(p) for p in parts).encode("utf-8")
+    root = Path(current_app.static_folder)
+    rel = fingerprinted_name(f"{BUNDLE_DIR}/{name}.js", sha256(data).hexdigest())
+    path = root / rel
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # several build processes may write the same bundle
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+        compress_file(path)
+
+    url = _written[parts] = STATIC_URL + rel
+    return url
+
+
+def bundle_stage(path: Path, html: str) -> str:
+    """
+    Page stage: replace the data-bundle scripts by the one bundle this
+    page needs.
+    """
+    tags = list(_SCRIPT.finditer(html))
+    if not tags:
+        return html
+
+    groups = set(page_groups(html))
+    parts: List[Part] = []
+    for tag in tags:
+        group = _GROUP.search(tag.group("attrs"))
+        if group is not None and group.group(2) and group.group(2) not in groups:
+            continue
+        src = _SRC.search(tag.group("attrs"))
+        if src is not None:
+            parts.append(("src", htmllib.unescape(src.group(2))))
+        elif tag.group("body").strip():
+            parts.append(("inline", tag.group("body")))
+
+    replacement = ""
+    if parts:
+        name = "-".join([BUNDLE_NAME, *sorted(groups)])
+        try:
+            url = write_bundle(name, tuple(parts))
+        except (FileNotFoundError, UnicodeDecodeError):
+            # e.g. a script missing from this checkout: keep the tags
+            current_app.logger.warning("Not bundling scripts of %s", path, exc_info=True)
+            return html
+        replacement = f'<script defer src="{htmllib.escape(url)}"></script>'
+
+    out = [html[:tags[0].start()], replacement]
+    for prev, tag in zip(tags, tags[1:]):
+        out.append(html[prev.end():tag.start()])
+    out.append(html[tags[-1].end():])
+    return "".join(out)
@@ -0,0 +1,241 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+import multiprocessing
+import os
+import signal
+import time
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+from db import db
+from metrics import track
+
+from .assets import fingerprint_static
+from .compress import brotli, compress_tree
+from .generations import (
+    build_lock, current_generation, generations, publish, require_full_publish, switch_to,
+)
+from .jinja_cache import warm_templates
+from .jobs import finish_build, recover_jobs, work
+from .pages import all_targets, prune_orphans, run_targets
+from .report import BuildReport, build_report
+
+# -------------------------------------------------------------------
+# flask build-site
+#
+# Regenerates all of builds/ from the database. Targets are split into
+# chunks and rendered across a process pool (one process per CPU by
+# default). Each worker process creates its own app, so it has its own
+# DB engine/session and its own Jinja env. Pages of rows that are gone
+# are then pruned, and post-build steps (sitemap, ...) run once, in the
+# parent, on the merged report.
+#
+# The parent holds the build lock throughout, and the site goes live
+# as one new generation at the end (builder/generations.py): visitors
+# keep getting the previous site while builds/ is being rewritten.
+# -------------------------------------------------------------------
+
+# Worker-process globals, set by _init_worker()
+_worker_app: Optional[Flask] = None
+
+
+def _init_worker() -> None:
+    global _worker_app
+    from app import create_app
+
+    _worker_app = create_app()
+
+
+def _build_chunk(targets: List[tuple]) -> BuildReport:
+    with _worker_app.app_context():
+        with track("build_site"), build_report() as report:
+            report.targets_run = run_targets(targets)
+            # Manifest rows of this chunk's pages
+            db.session.commit()
+    return report
+
+
+def _chunks(items: list, n: int) -> List[list]:
+    # Round-robin, so expensive kinds (function_doc, show_functions)
+    # spread evenly instead of landing on one worker.
+    return [c for c in (items[i::n] for i in range(n)) if c]
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f} ms"
+
+
+@click.command("build-site")
+@click.option(
+    "--workers", "-j",
+    type=int,
+    default=None,
+    help="Worker processes (default: CPU count).",
+)
+@with_appcontext
+def build_site_command(workers: Optional[int]) -> None:
+    """Render every page of builds/ from the database."""
+    with build_lock():
+        _build_site(workers or os.cpu_count() or 1)
+
+
+def _build_site(workers: int) -> None:
+    t_start = time.perf_counter()
+
+    # 1. Enumerate
+    targets = all_targets()
+    t_enum = time.perf_counter()
+    click.echo(f"enumerate: {len(targets)} targets in {_ms(t_enum - t_start)}")
+
+    # 2. Render (workers commit manifest rows as they go: publish the
+    # whole of builds/ next, even if this build does not get that far)
+    require_full_publish()
+    report = BuildReport()
+    if workers == 1:
+        with track("build_site"), build_report() as chunk_report:
+            chunk_report.targets_run = run_targets(targets)
+        report.merge(chunk_report)
+    else:
+        # spawn, not fork: children must not share the parent's DB
+        # connections
+        ctx = multiprocessing.get_context("spawn")
+        chunks = _chunks(targets, workers * 4)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+        ) as pool:
+            for chunk_report in pool.map(_build_chunk, chunks):
+                report.merge(chunk_report)
+    t_render = time.perf_counter()
+    click.echo(
+        f"render:    {report.pages_rendered} pages "
+        f"({len(report.changed)} changed, {report.skipped} unchanged) "
+        f"on {workers} worker(s) in {_ms(t_render - t_enum)}"
+    )
+    saved = sum(report.bytes_saved.values())
+    click.echo(f"minify:    {saved / 1024:.1f} KiB saved across {len(report.bytes_saved)} pages")
+
+    # 3. Pages of rows deleted behind the admin's back (SQL, ...): no
+    # target writes or removes them
+    with build_report() as final:
+        final.merge(report)
+        pruned = prune_orphans(targets)
+        t_prune = time.perf_counter()
+        click.echo(f"prune:     {pruned} orphaned page dir(s) in {_ms(t_prune - t_render)}")
+
+        # 4. Post-build steps, once, on the merged report
+        finish_build(final, "build-site")
+    t_post = time.perf_counter()
+    click.echo(f"post:      {_ms(t_post - t_prune)}")
+    click.echo(f"live:      {final.generation or current_generation() or '-'}")
+
+    click.echo(f"total:     {_ms(t_post - t_start)}")
+
+
+@click.command("build-worker")
+@with_appcontext
+def build_worker_command() -> None:
+    """Run queued build jobs (the admin's rebuilds) until stopped."""
+    counts = recover_jobs()
+    if counts["requeued"] or counts["failed"]:
+        click.echo(f"recovered: {counts['requeued']} requeued, {counts['failed']} failed")
+
+    stopping = []
+
+    def stop(signum, frame):
+        # finish the build in progress, then exit
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    def report(job) -> None:
+        click.echo(
+            f"job {job.id}: {job.status}, {job.pages_changed}/{job.pages_rendered} pages "
+            f"changed in {job.duration_ms} ms"
+        )
+
+    click.echo("build worker ready")
+    work(lambda: bool(stopping), report)
+
+
+@click.command("compress-static")
+@with_appcontext
+def compress_static_command() -> None:
+    """Write .gz/.br siblings for static/ assets that changed."""
+    t0 = time.perf_counter()
+    count = compress_tree(Path(current_app.static_folder))
+    kinds = "gzip + brotli" if brotli is not None else "gzip only (brotli not installed)"
+    click.echo(f"compressed {count} file(s), {kinds}, in {_ms(time.perf_counter() - t0)}")
+
+
+@click.command("fingerprint-static")
+@click.option("--prune", is_flag=True, help="Delete fingerprinted copies not in the new manifest.")
+@with_appcontext
+def fingerprint_static_command(prune: bool) -> None:
+    """Write content-hashed copies of static/ assets and their manifest."""
+    t0 = time.perf_counter()
+    root = Path(current_app.static_folder)
+    stats = fingerprint_static(root, prune=prune)
+    count = compress_tree(root)
+    click.echo(
+        f"fingerprinted {stats['assets']} asset(s) ({stats['written']} new, "
+        f"{stats['removed']} pruned), compressed {count}, in {_ms(time.perf_counter() - t0)}"
+    )
+
+
+@click.command("warm-templates")
+@with_appcontext
+def warm_templates_command() -> None:
+    """Compile every template into the Jinja bytecode cache."""
+    t0 = time.perf_counter()
+    count = warm_templates(current_app)
+    click.echo(f"compiled {count} template(s) in {_ms(time.perf_counter() - t0)}")
+
+
+@click.command("build-generations")
+@with_appcontext
+def build_generations_command() -> None:
+    """List site generations (* = live)."""
+    current = current_generation()
+    for generation in generations():
+        click.echo(f"{'*' if generation == current else ' '} {generation}")
+
+
+@click.command("build-publish")
+@with_appcontext
+def build_publish_command() -> None:
+    """Snapshot builds/ as a new live generation (hand-edited files)."""
+    with build_lock():
+        click.echo(f"live: {publish()}")
+
+
+@click.command("build-rollback")
+@click.argument("generation", required=False)
+@with_appcontext
+def build_rollback_command(generation: Optional[str]) -> None:
+    """Serve an older generation (default: the one before the live one)."""
+    with build_lock():
+        if generation is None:
+            known, current = generations(), current_generation()
+            older = known[:known.index(current)] if current in known else []
+            if not older:
+                raise click.ClickException("No older generation to roll back to")
+            generation = older[-1]
+        switch_to(generation)
+    click.echo(f"live: {generation} (the next build publishes builds/ again)")
+
+
+def init_app(app: Flask) -> None:
+    app.cli.add_command(build_site_command)
+    app.cli.add_command(build_worker_command)
+    app.cli.add_command(build_generations_command)
+    app.cli.add_command(build_publish_command)
+    app.cli.add_command(build_rollback_command)
+    app.cli.add_command(compress_static_command)
+    app.cli.add_command(fingerprint_static_command)
+    app.cli.add_command(warm_templates_command)
@@ -0,0 +1,86 @@
+from pathlib import Path
+from typing import Iterable
+import gzip
+
+try:
+    import brotli
+except ImportError:  # optional: without it only .gz siblings are written
+    brotli = None
+
+from .report import BuildReport
+
+# -------------------------------------------------------------------
+# Precompressed siblings
+#
+# For every changed output we write <file>.gz (and <file>.br when the
+# brotli module is installed) at maximum compression, so nginx can
+# serve them with gzip_static / brotli_static and never compress at
+# request time. Siblings follow their page: they are only rewritten
+# when the page's content hash changed, and removed with its tree.
+# -------------------------------------------------------------------
+
+COMPRESSIBLE = {".html", ".xml", ".json", ".txt", ".css", ".js", ".svg"}
+
+# Below this, the compressed response is not worth a second file
+MIN_SIZE = 256
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+def _remove(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def compress_file(path: Path) -> None:
+    gz = path.with_name(path.name + ".gz")
+    br = path.with_name(path.name + ".br")
+
+    data = path.read_bytes()
+    if len(data) < MIN_SIZE:
+        _remove(gz)
+        _remove(br)
+        return
+
+    # mtime=0 keeps the output deterministic for identical input
+    _write_atomic(gz, gzip.compress(data, compresslevel=9, mtime=0))
+
+    if brotli is not None:
+        _write_atomic(br, brotli.compress(data, quality=11))
+
+
+def compress_paths(paths: Iterable[Path]) -> int:
+    count = 0
+    for path in paths:
+        if path.suffix in COMPRESSIBLE and path.exists():
+            compress_file(path)
+            count += 1
+    return count
+
+
+def compress_step(report: BuildReport) -> None:
+    """
+    Post-build step: refresh siblings of everything that changed.
+    """
+    compress_paths(report.changed)
+
+
+def compress_tree(root: Path) -> int:
+    """
+    Offline pass over a static tree (static/ css, js, svg...). A file is
+    recompressed only when it is newer than its .gz sibling.
+    """
+    stale = []
+    for path in root.rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE:
+            continue
+        gz = path.with_name(path.name + ".gz")
+        if not gz.exists() or gz.stat().st_mtime < path.stat().st_mtime:
+            stale.append(path)
+    return compress_paths(stale)
@@ -0,0 +1,224 @@
+from functools import lru_cache
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import FrozenSet, List, Optional, Tuple
+from urllib.parse import urljoin
+import html as htmllib
+import re
+
+from .assets import static_file
+
+# -------------------------------------------------------------------
+# Critical CSS (page stage, see builder/writer.py)
+#
+# Templates mark their stylesheets:
+#
+#   <link rel="stylesheet" href="{{ asset_url('css/style.css') }}" data-critical>
+#
+# For every built page, this stage keeps the rules of each marked
+# stylesheet whose selectors can match the rendered DOM, inlines them
+# in a <style> where the link was, and turns the link into a
+# non-blocking preload (plus a <noscript> fallback). First paint needs no stylesheet request, and
+# the subset follows style.css as it changes: nothing is maintained
+# by hand (critical_style.css is now just the base rules).
+#
+# Matching is by tag, class, id and attribute name, per compound
+# selector; pseudo-classes are ignored. It can only keep too much,
+# never too little, for what is in the HTML. Styles of classes added
+# by scripts (menus opening, ...) arrive with the full stylesheet.
+# Pages of one template usually share their tag/class set, so the
+# subset is computed once per template and stylesheet version.
+#
+# Pages rendered by Flask (admin) never reach this stage: there the
+# marked link is an ordinary stylesheet.
+# -------------------------------------------------------------------
+
+# Attributes set before first paint by inline scripts (theme in base.html)
+SCRIPT_ATTRS = {"data-theme"}
+
+_LINK = re.compile(r"<link\b[^>]*\bdata-critical\b[^>]*>", re.I)
+_HREF = re.compile(r"""\bhref\s*=\s*(['"])(.*?)\1""", re.I | re.S)
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+_ATTRIBUTE = re.compile(r"\[\s*([\w-]+)[^\]]*\]")
+_PSEUDO = re.compile(r"::?[\w-]+(\((?:[^()]|\([^()]*\))*\))?")
+_COMBINATOR = re.compile(r"\s*[>+~]\s*|\s+")
+_SIMPLE = re.compile(r"([.#]?)(-?[\w-]+|\*)|\[([\w-]+)\]")
+_FONT_FAMILY = re.compile(r"font-family\s*:\s*([^;]+)", re.I)
+_KEYFRAMES = re.compile(r"@(-\w+-)?keyframes\s+([\w-]+)", re.I)
+
+Token = Tuple[str, str]   # ("tag", "div"), (".", "card"), ("#", "search"), ("[", "href")
+
+
+class _DomTokens(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.tokens = {("[", a) for a in SCRIPT_ATTRS}
+
+    def handle_starttag(self, tag, attrs):
+        self.tokens.add(("tag", tag))
+        for name, value in attrs:
+            self.tokens.add(("[", name))
+            if name == "class" and value:
+                self.tokens.update((".", c) for c in value.split())
+            elif name == "id" and value:
+                self.tokens.add(("#", value))
+
+
+def dom_tokens(html: str) -> FrozenSet[Token]:
+    parser = _DomTokens()
+    parser.feed(html)
+    parser.close()
+    return frozenset(parser.tokens)
+
+
+# -------------------------------------------------------------------
+# Stylesheet parsing: a flat list of (prelude, body) blocks; body is
+# None for statements (@charset ...;). Block bodies are kept as text
+# and parsed again for @media / @supports.
+# -------------------------------------------------------------------
+
+def parse_blocks(css: str) -> List[Tuple[str, Optional[str]]]:
+    blocks = []
+    depth = 0
+    quote = None
+    start = 0
+    prelude = ""
+    for i, ch in enumerate(css):
+        if quote:
+            if ch == quote and css[i - 1] != "\\":
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "{":
+            if depth == 0:
+                prelude = css[start:i].strip()
+                start = i + 1
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[start:i].strip()))
+                start = i + 1
+        elif ch == ";" and depth == 0:
+            statement = css[start:i].strip()
+            if statement:
+                blocks.append((statement, None))
+            start = i + 1
+    return blocks
+
+
+def _split_selectors(prelude: str) -> List[str]:
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(prelude):
+        if ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(prelude[start:i])
+            start = i + 1
+    parts.append(prelude[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def selector_matches(selector: str, tokens: FrozenSet[Token]) -> bool:
+    selector = _ATTRIBUTE.sub(r"[\1]", selector)
+    selector = _PSEUDO.sub("", selector)
+    for compound in _COMBINATOR.split(selector.strip()):
+        for kind, name, attr in _SIMPLE.findall(compound):
+            if attr:
+                token = ("[", attr)
+            elif kind:
+                token = (kind, name)
+            elif name == "*":
+                continue
+            else:
+                token = ("tag", name.lower())
+            if token not in tokens:
+                return False
+    return True
+
+
+def _subset(blocks: List[Tuple[str, Optional[str]]], tokens: FrozenSet[Token]) -> List[str]:
+    kept: List[str] = []
+    deferred_at: List[Tuple[str, str]] = []
+    for prelude, body in blocks:
+        if body is None:
+            if prelude.lower().startswith(("@charset", "@import", "@namespace")):
+                kept.append(prelude + ";")
+        elif prelude.startswith("@"):
+            rule = prelude.split(None, 1)[0].lower()
+            if rule in ("@media", "@supports", "@layer", "@container"):
+                inner = _subset(parse_blocks(body), tokens)
+                if inner:
+                    kept.append(prelude + "{" + "".join(inner) + "}")
+            elif rule == "@font-face" or rule.endswith("keyframes"):
+                # kept only if a kept rule uses them, see below
+                deferred_at.append((prelude, body))
+            else:
+                kept.append(prelude + "{" + body + "}")
+        elif any(selector_matches(s, tokens) for s in _split_selectors(prelude)):
+            kept.append(prelude + "{" + body + "}")
+
+    used = "".join(kept)
+    needed_at = []
+    for prelude, body in deferred_at:
+        if prelude.lower() == "@font-face":
+            match = _FONT_FAMILY.search(body)
+            family = match.group(1).strip().strip("'\"") if match else ""
+            needed = bool(family) and family in used
+        else:
+            match = _KEYFRAMES.match(prelude)
+            needed = match is not None and match.group(2) in used
+        if needed:
+            needed_at.append(prelude + "{" + body + "}")
+    return needed_at + kept
+
+
+@lru_cache(maxsize=64)
+def _stylesheet(path: Path, mtime: float) -> List[Tuple[str, Optional[str]]]:
+    return parse_blocks(_CSS_COMMENT.sub("", path.read_text("utf-8")))
+
+
+@lru_cache(maxsize=256)
+def _critical(path: Path, mtime: float, href: str, tokens: FrozenSet[Token]) -> str:
+    css = "".join(_subset(_stylesheet(path, mtime), tokens))
+
+    # The rules move from the stylesheet into the page: make relative
+    # url()s absolute
+    def absolute(match):
+        quote, url = match.groups()
+        if url.startswith(("data:", "/", "http:", "https:", "#")):
+            return match.group(0)
+        return f"url({quote}{urljoin(href, url)}{quote})"
+
+    return _CSS_URL.sub(absolute, css)
+
+
+def _inline(link: str, tokens: FrozenSet[Token]) -> str:
+    match = _HREF.search(link)
+    path = static_file(htmllib.unescape(match.group(2))) if match else None
+    if path is None:
+        return link
+    href = htmllib.unescape(match.group(2))
+    css = _critical(path, path.stat().st_mtime, href, tokens).replace("</", "<\\/")
+    attr = htmllib.escape(href)
+    return (
+        f"<style>{css}</style>"
+        f"<link rel=\"preload\" href=\"{attr}\" as=\"style\" "
+        f"onload=\"this.onload=null;this.rel='stylesheet'\">"
+        f"<noscript><link rel=\"stylesheet\" href=\"{attr}\"></noscript>"
+    )
+
+
+def critical_stage(path: Path, html: str) -> str:
+    """
+    Page stage: inline the critical rules of each data-critical
+    stylesheet, load the full ones without blocking rendering.
+    """
+    if _LINK.search(html) is None:
+        return html
+    tokens = dom_tokens(html)
+    return _LINK.sub(lambda m: _inline(m.group(0), tokens), html)
@@ -0,0 +1,346 @@
+from typing import Callable, Dict, FrozenSet, Iterable, NamedTuple, Optional, Set
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from db import db
+from models.dataset import Dataset
+from models.dataset_profile import DatasetProfile
+from models.dataset_variant import DatasetVariant
+from models.function_family import FunctionFamily
+from models.function_impl import FunctionImpl
+from models.benchmark import Benchmark
+from models.benchmark_dataset import BenchmarkDataset
+from models.dev import Dev
+from models.get_started import GetStarted
+from models.pipeline import Pipeline
+from models.pipeline_dataset import PipelineDataset
+
+from .queue import enqueue
+
+# -------------------------------------------------------------------
+# Page dependency graph
+#
+# Each Dependency says: page kind <page> reads <columns> of <model>,
+# and <resolve> maps a changed row to the page keys it feeds.
+#
+#   - inserted / deleted rows always match (whatever the columns)
+#   - updated rows match only if one of <columns> changed
+#
+# SQLAlchemy flush events feed every changed row through this table;
+# the resulting targets are handed to the RebuildQueue once the
+# transaction commits, and dropped on rollback. Admin handlers no
+# longer list the pages they affect.
+#
+# Bulk Query.delete() bypasses the unit of work and therefore this
+# graph: handlers that use it must enqueue the affected pages.
+# -------------------------------------------------------------------
+
+Resolver = Callable[[Session, object], Iterable[tuple]]
+
+
+class Dependency(NamedTuple):
+    page: str
+    model: type
+    columns: FrozenSet[str]
+    resolve: Resolver
+
+
+def _values(obj, column: str) -> Set:
+    """
+    Current and pre-change values of a column (both sides of a move).
+    """
+    hist = inspect(obj).attrs[column].history
+    return {
+        v
+        for v in (*hist.added, *hist.unchanged, *hist.deleted)
+        if v is not None
+    }
+
+
+def _keys(values: Iterable) -> Set[tuple]:
+    return {(v,) for v in values}
+
+
+def _scalars(session: Session, stmt) -> Set:
+    return set(session.execute(stmt).scalars())
+
+
+# -------------------------------------------------------------------
+# Resolvers
+# -------------------------------------------------------------------
+
+def _own_id(session, obj):
+    return _keys(_values(obj, "id"))
+
+
+def _single(session, obj):
+    return {()}
+
+
+def _functions_in_families(session, obj):
+    families = _values(obj, "family_id")
+    if not families:
+        return set()
+    return _keys(_scalars(
+        session,
+        select(FunctionImpl.id).where(FunctionImpl.family_id.in_(families)),
+    ))
+
+
+def _function_families(session, obj):
+    return _keys(_values(obj, "family_id"))
+
+
+def _benchmark_function(session, obj):
+    return _keys(_values(obj, "function_impl_id"))
+
+
+def _benchmark_dataset_function(session, obj):
+    benchmarks = _values(obj, "benchmark_id")
+    if not benchmarks:
+        return set()
+    return _keys(_scalars(
+        session,
+        select(Benchmark.function_impl_id).where(Benchmark.id.in_(benchmarks)),
+    ))
+
+
+def _functions_using(session, ids):
+    by_default = select(FunctionImpl.id).where(FunctionImpl.default_dataset_id.in_(ids))
+    by_benchmark = (
+        select(Benchmark.function_impl_id)
+        .join(BenchmarkDataset, BenchmarkDataset.benchmark_id == Benchmark.id)
+        .where(BenchmarkDataset.dataset_id.in_(ids))
+    )
+    return _keys(_scalars(session, by_default) | _scalars(session, by_benchmark))
+
+
+def _pipelines_using(session, ids):
+    return _keys(_scalars(
+        session,
+        select(PipelineDataset.pipeline_id).where(PipelineDataset.dataset_id.in_(ids)),
+    ))
+
+
+def _dataset_functions(session, obj):
+    return _functions_using(session, _values(obj, "id"))
+
+
+def _dataset_pipelines(session, obj):
+    return _pipelines_using(session, _values(obj, "id"))
+
+
+def _datasets_with_file(session, checksums):
+    return _scalars(
+        session,
+        select(Dataset.id).where(Dataset.checksum.in_(checksums)),
+    )
+
+
+def _profile_functions(session, obj):
+    return _functions_using(session, _datasets_with_file(session, _values(obj, "checksum")))
+
+
+def _profile_pipelines(session, obj):
+    return _pipelines_using(session, _datasets_with_file(session, _values(obj, "checksum")))
+
+
+def _variant_functions(session, obj):
+    return _functions_using(session, _datasets_with_file(session, _values(obj, "source_checksum")))
+
+
+def _variant_pipelines(session, obj):
+    return _pipelines_using(session, _datasets_with_file(session, _values(obj, "source_checksum")))
+
+
+def _pipeline_of_link(session, obj):
+    return _keys(_values(obj, "pipeline_id"))
+
+
+def _if_in_get_started(session, obj):
+    used = _scalars(
+        session,
+        select(GetStarted.id).where(GetStarted.function_impl_id.in_(_values(obj, "id"))),
+    )
+    return {()} if used else set()
+
+
+def _if_highlighted(session, obj):
+    return {()} if True in _values(obj, "highlighted") else set()
+
+
+def _if_function_highlighted(session, obj):
+    used = _scalars(
+        session,
+        select(Benchmark.id)
+        .where(Benchmark.function_impl_id.in_(_values(obj, "id")))
+        .where(Benchmark.highlighted.is_(True)),
+    )
+    return {()} if used else set()
+
+
+def _dep(page, model, columns, resolve) -> Dependency:
+    return Dependency(page, model, frozenset(columns), resolve)
+
+
+DEPENDENCIES = [
+    # docs/function_doc/<id>  (docs/function.html)
+    _dep("function_doc", FunctionImpl,
+         {"real_name", "signature_html", "description_html",
+          "default_dataset_id", "family_id", "api_level"}, _own_id),
+    _dep("function_doc", FunctionImpl,      # sibling switcher
+         {"real_name", "network", "gpu", "family_id"}, _functions_in_families),
+    _dep("function_doc", Benchmark,
+         {"description_html", "function_impl_id"}, _benchmark_function),
+    _dep("function_doc", BenchmarkDataset,
+         {"benchmark_id", "dataset_id"}, _benchmark_dataset_function),
+    _dep("function_doc", Dataset,
+         {"name", "download_url", "checksum", "size_bytes"}, _dataset_functions),
+    _dep("function_doc", DatasetProfile,
+         {"status", "row_count", "columns", "sample"}, _profile_functions),
+    _dep("function_doc", DatasetVariant,
+         {"status", "download_url", "size_bytes", "checksum"}, _variant_functions),
+
+    # docs/show_functions/<family>/...  (docs/doc_cards.html, family=True)
+    _dep("show_functions", FunctionImpl,
+         {"real_name", "summary", "network", "gpu", "family_id", "api_level"},
+         _function_families),
+    _dep("show_functions", FunctionFamily, set(), _own_id),
+
+    # docs/show_families/<lvl>  (docs/doc_cards.html, family=False)
+    _dep("show_families", FunctionFamily, {"display_name", "description"}, _single),
+
+    # get_started/
+    _dep("get_started", GetStarted,
+         {"goal", "priority", "function_impl_id"}, _single),
+    _dep("get_started", FunctionImpl, {"real_name"}, _if_in_get_started),
+
+    # benchmark/  (highlighted benchmarks only)
+    _dep("benchmark", Benchmark,
+         {"highlighted", "created_at", "function_impl_id"}, _if_highlighted),
+    _dep("benchmark", FunctionImpl,
+         {"real_name", "summary"}, _if_function_highlighted),
+
+    # dev/show_dev, dev/dev/<id>
+    _dep("dev_list", Dev, {"title", "description_html", "created_at"}, _single),
+    _dep("dev", Dev, {"title", "description_html"}, _own_id),
+
+    # pipeline/show_pipeline, pipeline/pipeline/<id>
+    _dep("pipeline_list", Pipeline,
+         {"title", "description_html", "created_at"}, _single),
+    _dep("pipeline", Pipeline, {"title", "description_html"}, _own_id),
+    _dep("pipeline", PipelineDataset,
+         {"pipeline_id", "dataset_id"}, _pipeline_of_link),
+    _dep("pipeline", Dataset,
+         {"name", "download_url", "checksum", "size_bytes"}, _dataset_pipelines),
+    _dep("pipeline", DatasetProfile,
+         {"status", "row_count", "columns", "sample"}, _profile_pipelines),
+    _dep("pipeline", DatasetVariant,
+         {"status", "download_url", "size_bytes", "checksum"}, _variant_pipelines),
+
+    # search/  (builder/search.py)
+    _dep("search", FunctionImpl,
+         {"real_name", "summary", "signature_html", "description_html",
+          "family_id", "api_level", "network", "gpu"}, _single),
+    _dep("search", FunctionFamily, {"display_name"}, _single),
+]
+
+_BY_MODEL: Dict[type, list] = {}
+for _d in DEPENDENCIES:
+    _BY_MODEL.setdefault(_d.model, []).append(_d)
+
+
+# -------------------------------------------------------------------
+# Change detection
+# -------------------------------------------------------------------
+
+def _changed_columns(obj) -> Set[str]:
+    """
+    Column keys of obj with pending changes. A changed relationship
+    counts as a change of its local foreign key column(s).
+    """
+    state = inspect(obj)
+    mapper = state.mapper
+    changed = set()
+
+    for attr in state.attrs:
+        if not attr.history.has_changes():
+            continue
+        rel = mapper.relationships.get(attr.key)
+        if rel is None:
+            changed.add(attr.key)
+        else:
+            changed.update(col.key for col in rel.local_columns)
+
+    return changed
+
+
+def dirty_targets(session: Session, obj, columns: Optional[Set[str]]) -> Set[tuple]:
+    """
+    Page targets fed by obj. columns=None means the row was inserted or
+    deleted, which matches every dependency on its model.
+    """
+    targets = set()
+    for dep in _BY_MODEL.get(type(obj), ()):
+        if columns is not None and not (dep.columns & columns):
+            continue
+        for key in dep.resolve(session, obj):
+            targets.add((dep.page, *key))
+    return targets
+
+
+def _pending(session: Session) -> dict:
+    # dict as an ordered set, same as RebuildQueue
+    return session.info.setdefault("rebuild_targets", {})
+
+
+def _collect(session: Session, obj, columns: Optional[Set[str]]) -> None:
+    for target in dirty_targets(session, obj, columns):
+        _pending(session)[target] = None
+
+
+def _before_flush(session, flush_context, instances):
+    # Deleted rows are resolved before the DELETE runs, while rows that
+    # point at them (ON DELETE SET NULL / CASCADE) can still be found.
+    for obj in session.deleted:
+        _collect(session, obj, None)
+
+
+def _after_flush(session, flush_context):
+    # New rows have their primary keys now; updated rows have their
+    # foreign keys synced from relationships. Attribute history still
+    # holds the pre-flush values here.
+    for obj in session.new:
+        _collect(session, obj, None)
+
+    for obj in session.dirty:
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        columns = _changed_columns(obj)
+        if columns:
+            _collect(session, obj, columns)
+
+
+def _after_commit(session):
+    targets = session.info.pop("rebuild_targets", None)
+    for target in targets or ():
+        enqueue(*target)
+
+
+def _after_rollback(session):
+    session.info.pop("rebuild_targets", None)
+
+
+def init_app(app) -> None:
+    """
+    Register the flush listeners on the Flask-SQLAlchemy session.
+    """
+    for name, fn in (
+        ("before_flush", _before_flush),
+        ("after_flush", _after_flush),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
@@ -0,0 +1,211 @@
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional
+import fcntl
+import os
+import shutil
+
+from flask import current_app
+
+from .paths import BUILD_DIR, rel_path
+from .report import BuildReport
+
+# -------------------------------------------------------------------
+# Build generations
+#
+# builds/ is the working tree: builds write into it page by page. nginx
+# never serves it directly; it serves site/current, a symlink to an
+# immutable snapshot:
+#
+#   site/current -> generations/20261018-101502-123456
+#   site/generations/20261018-101502-123456/...
+#   site/generations/20261018-094210-654321/...   (previous, rollback)
+#
+# Once a build has finished (post-build steps included), publish()
+# makes a new generation with hardlinks and swaps the symlink with a
+# rename, so visitors switch from one complete site to the next.
+# `flask build-site` (and `flask build-publish`) snapshot all of
+# builds/; the admin's builds clone the live generation and relink only
+# what their BuildReport changed or removed, so they never walk
+# builds/. Until a publish succeeds, site/.publish-pending says that
+# builds/ may hold pages no generation has (the manifest already lists
+# them, so no later build would report them as changed): the next
+# publish is then a full one. Every writer replaces files (temp file + rename) instead of
+# writing in place, so an unchanged page is the same inode in every
+# generation, and a changed one never alters older snapshots.
+#
+# Builds hold an exclusive file lock for their whole run (build jobs
+# in any gunicorn worker, build-site), so a snapshot never contains
+# half of a concurrent build. The last BUILD_GENERATIONS_KEEP
+# generations are kept; `flask build-rollback` points site/current back
+# at an older one.
+# -------------------------------------------------------------------
+
+SITE_DIR = Path("site")
+GENERATIONS_DIR = SITE_DIR / "generations"
+CURRENT_LINK = SITE_DIR / "current"
+LOCK_FILE = SITE_DIR / ".build.lock"
+PENDING_FILE = SITE_DIR / ".publish-pending"
+
+
+@contextmanager
+def build_lock() -> Iterator[None]:
+    """
+    Serialize builds across threads and processes.
+    """
+    SITE_DIR.mkdir(exist_ok=True)
+    with open(LOCK_FILE, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def generations() -> List[str]:
+    """
+    Generation ids, oldest first.
+    """
+    if not GENERATIONS_DIR.exists():
+        return []
+    return sorted(p.name for p in GENERATIONS_DIR.iterdir() if p.is_dir() and not p.name.startswith("."))
+
+
+def current_generation() -> Optional[str]:
+    try:
+        return Path(os.readlink(CURRENT_LINK)).name
+    except OSError:
+        return None
+
+
+def _link_file(src: Path, dest: Path) -> None:
+    try:
+        os.link(src, dest)
+    except OSError:
+        # different filesystem (or no hardlink support)
+        shutil.copy2(src, dest)
+
+
+def _link_tree(src: Path, dest: Path) -> int:
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(src):
+        target = dest / Path(dirpath).relative_to(src)
+        target.mkdir(parents=True, exist_ok=True)
+        for name in filenames:
+            if name.endswith(".tmp"):
+                continue
+            _link_file(Path(dirpath) / name, target / name)
+            count += 1
+    return count
+
+
+def _apply_report(report: BuildReport, dest: Path) -> int:
+    """
+    Bring a clone of the previous generation up to date with builds/ for
+    the outputs the report touched. Returns how many files were relinked.
+    """
+    for path in report.removed:
+        target = dest / rel_path(path)
+        if target.is_dir() and not target.is_symlink():
+            shutil.rmtree(target, ignore_errors=True)
+        else:
+            target.unlink(missing_ok=True)
+
+    count = 0
+    for path in report.changed:
+        # the compress step rewrites (or drops) the siblings of every
+        # changed output
+        for src in (path, path.with_name(path.name + ".gz"), path.with_name(path.name + ".br")):
+            target = dest / rel_path(src)
+            target.unlink(missing_ok=True)
+            # written, then removed again later in the same build
+            if not src.exists():
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            _link_file(src, target)
+            count += 1
+    return count
+
+
+def switch_to(generation: str) -> None:
+    """
+    Point site/current at a generation, atomically.
+    """
+    if not (GENERATIONS_DIR / generation).is_dir():
+        raise FileNotFoundError(f"No build generation {generation}")
+    tmp = SITE_DIR / f".current.{os.getpid()}.tmp"
+    tmp.unlink(missing_ok=True)
+    os.symlink(Path("generations") / generation, tmp)
+    os.replace(tmp, CURRENT_LINK)
+
+
+def prune(keep: int) -> List[str]:
+    """
+    Remove all but the newest <keep> generations (never the current
+    one). Returns the removed ids.
+    """
+    current = current_generation()
+    old = [g for g in generations()[:-keep or None] if g != current]
+    for generation in old:
+        shutil.rmtree(GENERATIONS_DIR / generation, ignore_errors=True)
+    return old
+
+
+def require_full_publish() -> None:
+    """
+    Make the next publish() snapshot all of builds/, even after a failed
+    or interrupted build. Call before committing manifest rows of pages
+    that are not published yet.
+    """
+    SITE_DIR.mkdir(exist_ok=True)
+    PENDING_FILE.touch()
+
+
+def publish(report: Optional[BuildReport] = None, full: bool = False) -> Optional[str]:
+    """
+    Make a new generation current. Skipped when the report says nothing
+    changed and a generation is live. With a report (and not full), the
+    live generation is cloned and only the report's outputs are taken
+    from builds/; otherwise all of builds/ is snapshotted. Call with
+    build_lock() held.
+    """
+    pending = PENDING_FILE.exists()
+    if (
+        report is not None
+        and not report.changed
+        and not report.removed
+        and not pending
+        and current_generation() is not None
+    ):
+        return None
+
+    # leftovers of a build that died while snapshotting
+    if GENERATIONS_DIR.exists():
+        for stale in GENERATIONS_DIR.glob(".*"):
+            shutil.rmtree(stale, ignore_errors=True)
+
+    # after a rollback (or a failed publish) the live generation is not
+    # what builds/ holds: snapshot builds/ again
+    previous = current_generation()
+    known = generations()
+    if pending or report is None or previous is None or not known or known[-1] != previous:
+        full = True
+    require_full_publish()
+
+    generation = datetime.utcnow().strftime("%Y%m%d-%H%M%S-%f")
+    staging = GENERATIONS_DIR / f".{generation}"
+    if full:
+        _link_tree(BUILD_DIR, staging)
+    else:
+        _link_tree(GENERATIONS_DIR / previous, staging)
+        _apply_report(report, staging)
+    staging.rename(GENERATIONS_DIR / generation)
+
+    switch_to(generation)
+    PENDING_FILE.unlink(missing_ok=True)
+    prune(current_app.config.get("BUILD_GENERATIONS_KEEP", 5))
+
+    if report is not None:
+        report.generation = generation
+    return generation
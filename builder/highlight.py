@@ -0,0 +1,142 @@
+from hashlib import sha256
+from itertools import groupby
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+import html as htmllib
+import re
+
+from flask import current_app
+
+import cache
+
+try:
+    from pygments.lexers import CLexer, CppLexer
+    from pygments.token import (
+        Comment, Keyword, Name, Number, Operator, Punctuation, String, Text, Whitespace,
+    )
+except ImportError:  # optional: without it Prism highlights in the browser
+    CLexer = None
+
+# -------------------------------------------------------------------
+# Build-time syntax highlighting (page stage, see builder/writer.py)
+#
+# Code blocks of built pages (function signatures and descriptions,
+# benchmark, pipeline and dev descriptions...) are highlighted once,
+# here, instead of by Prism on every page view:
+#
+#   <code class="language-cpp">int x;</code>
+#   -> <code class="language-cpp" data-highlighted>
+#          <span class="token keyword">int</span> x<span class="token punctuation">;</span></code>
+#
+# Pygments lexes the languages Prism was loaded for (c, cpp, clike),
+# and tokens get Prism's class names, so the theme in style.css
+# (.token.keyword, ...) applies unchanged. Like Prism, the block's
+# text content is highlighted (markup inside it is dropped).
+#
+# Results are cached by the hash of the language and code, in the
+# shared cache (cache.py), so build processes reuse each other's work
+# and a rebuild re-lexes nothing.
+#
+# Blocks in other languages, or every block when Pygments is not
+# installed, are left as they are: the bundle stage (builder/bundle.py)
+# then still ships Prism to that page.
+# -------------------------------------------------------------------
+
+_CODE = re.compile(
+    r"<code\b(?P<attrs>[^>]*\bclass\s*=\s*(['\"])[^'\"]*?\blang(?:uage)?-(?P<lang>[\w+-]+)[^>]*)>"
+    r"(?P<body>.*?)</code\s*>",
+    re.I | re.S,
+)
+_HIGHLIGHTED = re.compile(r"\bdata-highlighted\b", re.I)
+_TAG = re.compile(r"<[^>]*>")
+
+LEXERS = {
+    "c": "c",
+    "clike": "c",
+    "cpp": "cpp",
+    "c++": "cpp",
+}
+
+if CLexer is not None:
+    # text kept as is: no stripped or added newlines
+    _LEXERS = {
+        "c": CLexer(stripnl=False, ensurenl=False),
+        "cpp": CppLexer(stripnl=False, ensurenl=False),
+    }
+
+    # Pygments token type -> Prism classes, most specific first
+    TOKEN_CLASSES = [
+        (Comment.PreprocFile, "string"),
+        (Comment.Preproc, "macro property"),
+        (Comment, "comment"),
+        (Keyword.Constant, "boolean"),
+        (Keyword, "keyword"),
+        (String.Char, "char"),
+        (String, "string"),
+        (Number, "number"),
+        (Name.Function, "function"),
+        (Name.Class, "class-name"),
+        (Operator, "operator"),
+        (Punctuation, "punctuation"),
+    ]
+
+
+def _token_class(ttype) -> Optional[str]:
+    for parent, css_class in TOKEN_CLASSES:
+        if ttype in parent:
+            return css_class
+    return None
+
+
+def _classes(tokens: List[Tuple[object, str]]) -> Iterable[Tuple[Optional[str], str]]:
+    for i, (ttype, value) in enumerate(tokens):
+        css_class = _token_class(ttype)
+        if css_class is None and ttype in Name:
+            # a call: Prism marks any name followed by "(" as a function
+            j = i + 1
+            while j < len(tokens) and (tokens[j][0] in Text or tokens[j][0] in Whitespace):
+                j += 1
+            if j < len(tokens) and tokens[j][1].startswith("("):
+                css_class = "function"
+        yield css_class, value
+
+
+def highlight(code: str, language: str) -> str:
+    """
+    code as escaped HTML with Prism-style token spans.
+    """
+    lexer = _LEXERS[LEXERS[language]]
+    tokens = [(t, v) for _, t, v in lexer.get_tokens_unprocessed(code)]
+
+    # one span per run of same-class tokens ("#" "include", '"' "s" '"')
+    out = []
+    for css_class, values in groupby(_classes(tokens), key=lambda cv: cv[0]):
+        value = htmllib.escape("".join(v for _, v in values), quote=False)
+        out.append(f'<span class="token {css_class}">{value}</span>' if css_class else value)
+    return "".join(out)
+
+
+def _cached_highlight(code: str, language: str) -> str:
+    digest = sha256(f"{LEXERS[language]}\0{code}".encode("utf-8")).hexdigest()
+    return cache.cached(
+        f"highlight:{digest}", (), lambda: highlight(code, language),
+        ttl=current_app.config.get("HIGHLIGHT_CACHE_TIMEOUT", 7 * 24 * 3600),
+    )
+
+
+def _replace(match) -> str:
+    attrs = match.group("attrs")
+    language = match.group("lang").lower()
+    if language not in LEXERS or _HIGHLIGHTED.search(attrs):
+        return match.group(0)
+    code = htmllib.unescape(_TAG.sub("", match.group("body")))
+    return f"<code{attrs} data-highlighted>{_cached_highlight(code, language)}</code>"
+
+
+def highlight_stage(path: Path, html: str) -> str:
+    """
+    Page stage: highlight the C/C++ code blocks.
+    """
+    if CLexer is None:
+        return html
+    return _CODE.sub(_replace, html)
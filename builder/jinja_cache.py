@@ -0,0 +1,54 @@
+from pathlib import Path
+from typing import List
+
+from flask import Flask
+from jinja2 import Environment, FileSystemBytecodeCache
+
+from .pages import env
+
+# -------------------------------------------------------------------
+# Jinja bytecode cache
+#
+# The Flask env (admin pages) and the build env (builder/pages.py)
+# share one FileSystemBytecodeCache under JINJA_CACHE_DIR. Compiled
+# templates survive restarts and are shared by every gunicorn worker
+# and build-site process: only the first process after a template
+# change parses it. Entries are keyed by template path and checked
+# against the source, so a stale entry is never used.
+#
+# With JINJA_PRECOMPILE every template is compiled at app creation
+# (worker boot); `flask warm-templates` does the same after a deploy.
+#
+# TEMPLATES_AUTO_RELOAD (dev only) makes both envs stat templates on
+# every use; otherwise a template is loaded once per process.
+# -------------------------------------------------------------------
+
+
+def warm_templates(app: Flask) -> int:
+    """
+    Compile every template into both envs (and the bytecode cache).
+    Returns how many templates were loaded per env.
+    """
+    names: List[str] = env.list_templates(filter_func=lambda n: n.endswith(".html"))
+    for jinja_env in (app.jinja_env, env):
+        for name in names:
+            jinja_env.get_template(name)
+    return len(names)
+
+
+def _attach(jinja_env: Environment, cache: FileSystemBytecodeCache, auto_reload: bool) -> None:
+    jinja_env.bytecode_cache = cache
+    jinja_env.auto_reload = auto_reload
+
+
+def init_app(app: Flask) -> None:
+    cache_dir = Path(app.root_path) / app.config.get("JINJA_CACHE_DIR", "jinja_cache")
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache = FileSystemBytecodeCache(str(cache_dir))
+
+    auto_reload = bool(app.config.get("TEMPLATES_AUTO_RELOAD"))
+    _attach(app.jinja_env, cache, auto_reload)
+    _attach(env, cache, auto_reload)
+
+    if app.config.get("JINJA_PRECOMPILE") and not auto_reload:
+        warm_templates(app)
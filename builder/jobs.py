@@ -0,0 +1,227 @@
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+import json
+import time
+import traceback
+
+from flask import current_app
+
+from db import db
+from metrics import track
+from models.build_job import BuildJob
+
+from .compress import compress_step
+from .generations import build_lock, publish
+from .manifest import render_sitemap
+from .pages import run_targets
+from .paths import BUILD_DIR
+from .profile import save_profile
+from .report import BuildReport, build_report
+from .writer import write_output
+
+# -------------------------------------------------------------------
+# Build worker
+#
+# Static-site regeneration runs outside the web workers: admin saves
+# record a queued BuildJob row and return right away. A separate
+# consumer process, `flask build-worker`, claims queued rows one at a
+# time (an UPDATE ... WHERE status = 'queued', so two consumers never
+# run the same job) and renders the pages. Rendering and compression
+# then never compete with request handling, and the queue survives
+# gunicorn restarts.
+#
+# When the consumer starts, jobs left "running" by a consumer that died
+# are queued again, or failed once they have been tried
+# BUILD_MAX_ATTEMPTS times.
+#
+# Config:
+#   BUILD_ASYNC          False runs jobs inline, in the request (debugging)
+#   BUILD_POLL_INTERVAL  seconds between polls of an empty queue
+#   BUILD_MAX_ATTEMPTS   runs of one job before it is failed
+# -------------------------------------------------------------------
+
+
+# -------------------------------------------------------------------
+# Post-build steps
+#
+# Run once per build, after every target, in order. Each one gets the
+# BuildReport and should only look at what actually changed.
+# -------------------------------------------------------------------
+
+def _sitemap_step(report: BuildReport) -> None:
+    if report.manifest_dirty:
+        write_output(BUILD_DIR / "sitemap.xml", render_sitemap().encode("utf-8"))
+
+
+POST_BUILD_STEPS = [
+    _sitemap_step,
+    compress_step,   # after the sitemap, so sitemap.xml gets siblings too
+]
+
+
+def finish_build(report: BuildReport, source: str, job_id: Optional[int] = None) -> None:
+    """
+    Run the post-build steps for a report, publish builds/ as a new
+    generation, then persist the manifest and the build profile. Must
+    run with report as the current build report and build_lock() held.
+    """
+    for step in POST_BUILD_STEPS:
+        t0 = time.perf_counter()
+        step(report)
+        report.step_ms[step.__name__] = (time.perf_counter() - t0) * 1000
+
+    # build-site rewrote all of builds/: snapshot it whole
+    publish(report, full=source == "build-site")
+
+    # only now: if publishing failed, the rolled back manifest makes the
+    # next build write (and publish) these pages again
+    save_profile(report, source, job_id)
+    db.session.commit()
+
+
+def run_build(targets: Iterable[tuple], job_id: Optional[int] = None) -> BuildReport:
+    """
+    Build targets synchronously in the current app context, run the
+    post-build steps, persist the manifest and publish the result.
+    """
+    with build_lock(), build_report() as report:
+        report.targets_run = run_targets(targets)
+        finish_build(report, "job", job_id)
+
+    return report
+
+
+def submit_build(targets: list) -> Optional[BuildJob]:
+    """
+    Record a queued BuildJob for the targets; the build worker picks it
+    up. Returns None when there is nothing to build.
+    """
+    if not targets:
+        return None
+
+    job = BuildJob(status="queued", targets=json.dumps(targets))
+    db.session.add(job)
+    db.session.commit()
+
+    if not current_app.config.get("BUILD_ASYNC", True):
+        if claim_job(job.id):
+            run_job(job.id)
+
+    return job
+
+
+def claim_job(job_id: int) -> bool:
+    """
+    Mark a queued job as running. False if another consumer got it first.
+    """
+    claimed = (
+        BuildJob.query.filter_by(id=job_id, status="queued")
+        .update(
+            {
+                "status": "running",
+                "started_at": datetime.utcnow(),
+                "attempts": BuildJob.attempts + 1,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.session.commit()
+    return claimed == 1
+
+
+def claim_next() -> Optional[int]:
+    """
+    Claim the oldest queued job. Returns its id, or None when the queue
+    is empty.
+    """
+    while True:
+        job_id = (
+            db.session.query(BuildJob.id)
+            .filter_by(status="queued")
+            .order_by(BuildJob.id)
+            .limit(1)
+            .scalar()
+        )
+        db.session.commit()   # end the read transaction
+        if job_id is None:
+            return None
+        if claim_job(job_id):
+            return job_id
+
+
+def recover_jobs() -> dict:
+    """
+    Jobs left running by a consumer that died: queue them again, or
+    fail them after BUILD_MAX_ATTEMPTS runs. Call when no other
+    consumer is running.
+    """
+    max_attempts = current_app.config.get("BUILD_MAX_ATTEMPTS", 3)
+    stale = BuildJob.query.filter_by(status="running").all()
+    counts = {"requeued": 0, "failed": 0}
+    for job in stale:
+        if job.attempts >= max_attempts:
+            job.status = "failed"
+            job.error = f"Build worker stopped during the build ({job.attempts} attempts)"
+            job.finished_at = datetime.utcnow()
+            counts["failed"] += 1
+        else:
+            job.status = "queued"
+            job.started_at = None
+            counts["requeued"] += 1
+    db.session.commit()
+    return counts
+
+
+def run_job(job_id: int) -> Optional[BuildJob]:
+    """
+    Build a claimed (running) job in the current app context and record
+    the outcome on its row.
+    """
+    job = db.session.get(BuildJob, job_id)
+    if job is None:
+        return None
+
+    targets = [tuple(t) for t in json.loads(job.targets)]
+    t0 = time.perf_counter()
+
+    try:
+        with track("build_job"):
+            report = run_build(targets, job_id)
+    except Exception:
+        db.session.rollback()
+        job.status = "failed"
+        job.error = traceback.format_exc()
+        current_app.logger.exception("Build job %s failed", job_id)
+    else:
+        job.status = "done"
+        job.error = None
+        job.pages_rendered = report.pages_rendered
+        job.pages_changed = len(report.changed)
+        job.bytes_saved = sum(report.bytes_saved.values())
+        job.generation = report.generation
+
+    job.finished_at = datetime.utcnow()
+    job.duration_ms = int((time.perf_counter() - t0) * 1000)
+    db.session.commit()
+    return job
+
+
+def work(
+    should_stop: Callable[[], bool],
+    on_job: Optional[Callable[[BuildJob], None]] = None,
+) -> None:
+    """
+    Consumer loop: run queued jobs until should_stop() says so (checked
+    between jobs, so a build in progress is finished first).
+    """
+    poll = current_app.config.get("BUILD_POLL_INTERVAL", 1.0)
+    while not should_stop():
+        job_id = claim_next()
+        if job_id is None:
+            time.sleep(poll)
+            continue
+        job = run_job(job_id)
+        if job is not None and on_job is not None:
+            on_job(job)
+        # don't keep the job's objects (or a connection) between jobs
+        db.session.remove()
@@ -0,0 +1,159 @@
+from datetime import datetime
+from hashlib import sha256
+from pathlib import Path
+from typing import Optional, Set
+import re
+
+from db import db
+from models.build_page import BuildPage
+
+from .paths import BUILD_DIR, page_url, rel_path
+from .report import current_report
+
+# -------------------------------------------------------------------
+# Hand-authored pages that no rebuild helper writes (they are not in
+# the manifest). They are always listed; lastmod comes from the file.
+# -------------------------------------------------------------------
+STATIC_PAGES = {
+    "index.html": ("1.0", "weekly"),
+    "docs/index.html": ("0.8", "weekly"),
+}
+
+# Outputs that only redirect (old URLs); kept out of the sitemap
+UNLISTED = [
+    # docs/show_functions/<family>/<api>/<network><gpu>/ -> <api>/?network=..
+    re.compile(r"^docs/show_functions/\d+/[a-z]+/(any|yes|no){2}/index\.html$"),
+]
+
+DEFAULT_PRIORITY = "0.6"
+DEFAULT_CHANGEFREQ = "monthly"
+
+
+def content_hash(data: bytes) -> str:
+    return sha256(data).hexdigest()
+
+
+def get_entry(path: Path) -> Optional[BuildPage]:
+    """
+    Stored fingerprint (manifest row) for an output file, if any.
+    """
+    return db.session.get(BuildPage, rel_path(path))
+
+
+def record_page(path: Path, digest: str, entry: Optional[BuildPage] = None) -> None:
+    """
+    Upsert the manifest row for an output whose content just changed.
+
+    Only called by the writer when the hash differs from the stored one,
+    so lastmod is the time of the last real change: re-rendering an
+    unchanged page does not make it look fresh to crawlers.
+    """
+    if entry is None:
+        rel = rel_path(path)
+        entry = BuildPage(path=rel, url=page_url(rel))
+        db.session.add(entry)
+
+    entry.content_hash = digest
+    entry.lastmod = datetime.utcnow()
+
+    mark_sitemap_dirty()
+
+
+def forget_tree(path: Path) -> int:
+    """
+    Drop manifest rows for everything under a removed output directory.
+    Returns how many rows went away.
+    """
+    prefix = rel_path(path).rstrip("/") + "/"
+
+    deleted = (
+        BuildPage.query
+        .filter(BuildPage.path.startswith(prefix, autoescape=True))
+        .delete(synchronize_session=False)
+    )
+    if deleted:
+        mark_sitemap_dirty()
+    return deleted
+
+
+def manifest_children(path: Path) -> Set[str]:
+    """
+    Names directly under an output directory that have manifest rows
+    below them ("3" for docs/function_doc/3/index.html).
+    """
+    prefix = rel_path(path).rstrip("/") + "/"
+    rows = (
+        db.session.query(BuildPage.path)
+        .filter(BuildPage.path.startswith(prefix, autoescape=True))
+    )
+    return {p[len(prefix):].split("/", 1)[0] for (p,) in rows}
+
+
+def mark_sitemap_dirty() -> None:
+    """
+    Flag the running build so sitemap.xml is rewritten once it finishes.
+    """
+    report = current_report()
+    if report is not None:
+        report.manifest_dirty = True
+
+
+# -------------------------------------------------------------------
+# Sitemap (regenerated once per build, from the manifest only)
+# -------------------------------------------------------------------
+
+def render_sitemap() -> str:
+    """
+    sitemap.xml content, built from the manifest only. Non-HTML outputs
+    (sitemap.xml itself, data files) have manifest rows for their
+    fingerprint but are not listed. Pages get their row when a build
+    writes them: a fresh or upgraded database is seeded by one
+    `flask build-site` (see README).
+    """
+    urls = []
+
+    for rel, (priority, changefreq) in STATIC_PAGES.items():
+        path = BUILD_DIR / rel
+        if not path.exists():
+            continue
+        urls.append({
+            "loc": page_url(rel),
+            "lastmod": datetime.utcfromtimestamp(path.stat().st_mtime),
+            "priority": priority,
+            "changefreq": changefreq,
+        })
+
+    pages = (
+        BuildPage.query
+        .filter(BuildPage.path.endswith(".html"))
+        .order_by(BuildPage.path)
+        .all()
+    )
+    for page in pages:
+        if page.path in STATIC_PAGES:
+            continue
+        if any(pattern.match(page.path) for pattern in UNLISTED):
+            continue
+        urls.append({
+            "loc": page.url,
+            "lastmod": page.lastmod,
+            "priority": DEFAULT_PRIORITY,
+            "changefreq": DEFAULT_CHANGEFREQ,
+        })
+
+    xml = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+
+    for u in urls:
+        xml.append("  <url>")
+        xml.append(f"    <loc>{u['loc']}</loc>")
+        xml.append(f"    <lastmod>{u['lastmod'].date().isoformat()}</lastmod>")
+        xml.append(f"    <changefreq>{u['changefreq']}</changefreq>")
+        xml.append(f"    <priority>{u['priority']}</priority>")
+        xml.append("  </url>")
+
+    xml.append("</urlset>")
+
+    return "\n".join(xml)
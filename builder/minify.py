@@ -0,0 +1,96 @@
+from pathlib import Path
+import re
+
+from .paths import rel_path
+from .report import current_report
+
+# -------------------------------------------------------------------
+# HTML minification (page stage, see builder/writer.py)
+#
+# Conservative on purpose, we never parse JS:
+#   - whitespace runs in markup collapse to one space
+#   - HTML comments are dropped (conditional comments kept)
+#   - inline <style>: comments and insignificant whitespace removed
+#   - inline <script>: indentation and blank lines removed, line
+#     breaks kept (ASI); left alone if it holds a multi-line template
+#     literal, whose content would change
+#   - <pre>, <code> and <textarea> are copied byte for byte, so Prism
+#     blocks and function signatures render exactly as authored
+# -------------------------------------------------------------------
+
+_TOKENS = re.compile(
+    r"(?P<keep><(?P<keep_tag>pre|code|textarea)\b[^>]*>.*?</(?P=keep_tag)\s*>)"
+    r"|(?P<script><script\b[^>]*>)(?P<script_body>.*?)(?P<script_end></script\s*>)"
+    r"|(?P<style><style\b[^>]*>)(?P<style_body>.*?)(?P<style_end></style\s*>)"
+    r"|(?P<comment><!--.*?-->)",
+    re.S | re.I,
+)
+
+_WS = re.compile(r"\s+")
+
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_CSS_PUNCT = re.compile(r"\s*([{};,>])\s*")
+
+
+def _collapse(text: str) -> str:
+    return _WS.sub(" ", text)
+
+
+def _has_multiline_template(body: str) -> bool:
+    # Odd segments between backticks are template literal contents
+    parts = body.replace("\\`", "").split("`")
+    return any("\n" in part for part in parts[1::2])
+
+
+def minify_js(body: str) -> str:
+    if _has_multiline_template(body):
+        return body
+    lines = (line.strip() for line in body.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+def minify_css(body: str) -> str:
+    body = _CSS_COMMENT.sub("", body)
+    body = _collapse(body)
+    body = _CSS_PUNCT.sub(r"\1", body)
+    return body.replace(";}", "}").strip()
+
+
+def minify_html(html: str) -> str:
+    out = []
+    pos = 0
+
+    for m in _TOKENS.finditer(html):
+        out.append(_collapse(html[pos:m.start()]))
+        pos = m.end()
+
+        if m.group("keep"):
+            out.append(m.group("keep"))
+        elif m.group("script"):
+            out.append(_collapse(m.group("script")))
+            out.append(minify_js(m.group("script_body")))
+            out.append(m.group("script_end"))
+        elif m.group("style"):
+            out.append(_collapse(m.group("style")))
+            out.append(minify_css(m.group("style_body")))
+            out.append(m.group("style_end"))
+        elif m.group("comment").startswith("<!--[if"):
+            out.append(m.group("comment"))
+
+    out.append(_collapse(html[pos:]))
+    return "".join(out).strip()
+
+
+def minify_stage(path: Path, html: str) -> str:
+    """
+    Page stage: minify and record bytes saved on the build report.
+    """
+    minified = minify_html(html)
+
+    report = current_report()
+    if report is not None:
+        before = len(html.encode("utf-8"))
+        after = len(minified.encode("utf-8"))
+        report.bytes_saved[rel_path(path)] = before - after
+
+    return minified
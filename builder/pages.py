@@ -0,0 +1,436 @@
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from jinja2 import Environment, FileSystemLoader
+
+from models.function_family import FunctionFamily
+from models.function_impl import FunctionImpl
+from models.benchmark import Benchmark
+from models.dev import Dev
+from models.get_started import GetStarted
+from models.pipeline import Pipeline
+
+from db import db
+
+from .manifest import manifest_children
+from .paths import BUILD_DIR, DOCS_DIR
+from .profile import profile_render
+from .search import rebuild_search_index
+from .writer import rm_tree, write_html
+
+# -------------------------------------------------------------------
+# Jinja environment (you use it to render templates to static files)
+#
+# Absolute loader path: template filenames then match the Flask env's,
+# so both share bytecode cache entries (builder/jinja_cache.py).
+# -------------------------------------------------------------------
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+
+env = Environment(
+    loader=FileSystemLoader(str(TEMPLATES_DIR)),
+    autoescape=True,
+)
+
+# Your filter axes for docs/show_functions
+NETWORK = ["any", "yes", "no"]
+GPU = ["any", "yes", "no"]
+
+API_LEVELS = ("low", "high")
+
+
+def render(template: str, **context) -> str:
+    """
+    Render a template with the build env (timed by the build profiler).
+    """
+    with profile_render(template):
+        return env.get_template(template).render(**context)
+
+# -------------------------------------------------------------------
+# Rebuild helpers
+#
+# Which rows each page reads, and so which targets a DB change feeds,
+# is declared in builder/deps.py.
+#
+# Each helper makes one page (or one bucket of pages) match the DB.
+# If the row behind a page is gone, the page is removed instead, so
+# delete handlers just enqueue the same target as edits do.
+#
+# Every page goes through write_html() (builder/writer.py), which skips
+# unchanged bytes and updates the build manifest. Admin code should not
+# call these directly: it enqueues targets on the RebuildQueue
+# (builder/queue.py), which hands each distinct target to the build
+# worker (builder/jobs.py) once the request is over.
+# -------------------------------------------------------------------
+
+def rebuild_function_page(function_id: int) -> None:
+    """
+    Rebuild ONLY the function detail page:
+      builds/docs/function_doc/<fn.id>/index.html
+
+    Trigger when:
+      - FunctionImpl fields change (summary/metadata/etc.)
+      - Benchmark changes (title/desc/highlighted)
+      - BenchmarkDataset changes (datasets list)
+
+    Notes:
+      - It is correct that benchmark changes affect ONLY this page.
+      - We read fn.benchmark and embed it, but we do not mutate it here.
+    """
+    fn = FunctionImpl.query.get(function_id)
+    out_dir = DOCS_DIR / "function_doc" / str(function_id)
+
+    if fn is None:
+        rm_tree(out_dir)
+        return
+
+    benchmark = fn.benchmark
+    siblings = (
+        FunctionImpl.query.filter_by(family_id=fn.family_id)
+        .filter(FunctionImpl.id != fn.id)
+        .all()
+    )
+
+    html = render(
+        "docs/function.html",
+        fn=fn,
+        siblings=siblings,
+        benchmark=benchmark,
+    )
+
+    write_html(out_dir / "index.html", html)
+
+
+# (family_id, api_level, network, gpu) -> functions, in id order
+FacetIndex = Dict[Tuple[int, str, str, str], List[FunctionImpl]]
+
+
+def _facet_values(flag: bool) -> Tuple[str, str]:
+    # A function is listed under "any" and under its own value
+    return ("any", "yes" if flag else "no")
+
+
+def facet_index(family_ids: Iterable[int]) -> Tuple[List[int], FacetIndex]:
+    """
+    One query for the given families and their functions, bucketed by
+    (family, api_level, network, gpu). Returns the ids of the families
+    that still exist, and the buckets (missing key = empty bucket).
+    """
+    rows = (
+        db.session.query(FunctionFamily.id, FunctionImpl)
+        .outerjoin(FunctionImpl, FunctionImpl.family_id == FunctionFamily.id)
+        .filter(FunctionFamily.id.in_(list(family_ids)))
+        .order_by(FunctionFamily.id, FunctionImpl.id)
+        .all()
+    )
+
+    families: Dict[int, None] = {}
+    buckets: FacetIndex = defaultdict(list)
+
+    for family_id, fn in rows:
+        families[family_id] = None
+        if fn is None:
+            continue
+        for network in _facet_values(fn.network):
+            for gpu in _facet_values(fn.gpu):
+                buckets[(family_id, str(fn.api_level), network, gpu)].append(fn)
+
+    return list(families), buckets
+
+
+def _facets(buckets: FacetIndex, family_id: int, api_level: str) -> dict:
+    """
+    Function ids per filter value of one (family, level) page, read by
+    the network/GPU selectors.
+    """
+    def ids(network, gpu):
+        return [fn.id for fn in buckets.get((family_id, api_level, network, gpu), ())]
+
+    return {
+        "network": {v: ids(v, "any") for v in ("yes", "no")},
+        "gpu": {v: ids("any", v) for v in ("yes", "no")},
+    }
+
+
+def _filter_query(network: str, gpu: str) -> str:
+    params = [f"{axis}={v}" for axis, v in (("network", network), ("gpu", gpu)) if v != "any"]
+    return "?" + "&".join(params) if params else ""
+
+
+def rebuild_show_functions(family_ids: Iterable[int]) -> None:
+    """
+    Rebuild the show_functions listings of several families, both API
+    levels, in one pass:
+      builds/docs/show_functions/<family>/<api>/index.html
+
+    One page per (family, level) holds every card plus the facet ids;
+    the network/GPU selectors filter client-side. The former filter
+    URLs <api>/<network><gpu>/ are kept as redirect stubs to
+    <api>/?network=..&gpu=.. (relative, so the same bytes everywhere).
+
+    A level with no function still gets its (empty) page so the API
+    level selector never lands on a 404. Empty pages do not depend on
+    the family, so each level's is rendered only once.
+
+    Trigger when:
+      - FunctionImpl changes that affect cards/listing (summary, name, network/gpu, family, api)
+      - FunctionImpl create/delete
+      - Taxonomy reassignment
+
+    MUST NOT be triggered by benchmark changes.
+    """
+    family_ids = list(dict.fromkeys(family_ids))
+    existing, buckets = facet_index(family_ids)
+
+    for family_id in family_ids:
+        if family_id not in existing:
+            rm_tree(DOCS_DIR / "show_functions" / str(family_id))
+
+    if not existing:
+        return
+
+    empty_pages: Dict[str, str] = {}
+    redirects = {
+        (network, gpu): render(
+            "docs/filter_redirect.html",
+            target="../" + _filter_query(network, gpu),
+        )
+        for network in NETWORK
+        for gpu in GPU
+    }
+
+    for family_id in existing:
+        for api_level in API_LEVELS:
+            base = DOCS_DIR / "show_functions" / str(family_id) / api_level
+            cards = buckets.get((family_id, api_level, "any", "any"))
+
+            if cards:
+                html = render(
+                    "docs/doc_cards.html",
+                    lvl=api_level,
+                    family=True,
+                    cards=cards,
+                    facets=_facets(buckets, family_id, api_level),
+                )
+            else:
+                if api_level not in empty_pages:
+                    empty_pages[api_level] = render(
+                        "docs/doc_cards.html",
+                        lvl=api_level,
+                        family=True,
+                        cards=[],
+                        facets=_facets(buckets, family_id, api_level),
+                    )
+                html = empty_pages[api_level]
+
+            write_html(base / "index.html", html)
+
+            for (network, gpu), stub in redirects.items():
+                write_html(base / f"{network}{gpu}" / "index.html", stub)
+
+
+def rebuild_show_functions_for(family_id: int) -> None:
+    """
+    Rebuild the show_functions listings of one family (see
+    rebuild_show_functions()).
+    """
+    rebuild_show_functions([family_id])
+
+
+def rebuild_family_listings() -> None:
+    """
+    Rebuild family listings:
+      builds/docs/show_families/<low|high>/index.html
+    """
+    families = FunctionFamily.query.order_by(FunctionFamily.display_name).all()
+
+    out_base = DOCS_DIR / "show_families"
+    for lvl in API_LEVELS:
+        html = render(
+            "docs/doc_cards.html",
+            lvl=lvl,
+            family=False,
+            cards=families,
+        )
+        out = out_base / lvl / "index.html"
+        write_html(out, html)
+
+def rebuild_get_started_index() -> None:
+    """
+    Rebuild get started page:
+      builds/get_started/index.html
+    """
+    items = (
+        GetStarted.query.order_by(GetStarted.priority.asc(), GetStarted.id.asc()).all()
+    )
+    html = render("get_started/get_started.html", items=items)
+    out = BUILD_DIR / "get_started" / "index.html"
+    write_html(out, html)
+
+def rebuild_dev_list() -> None:
+    """
+    Rebuild dev list:
+      builds/dev/show_dev/index.html
+    """
+    articles = Dev.query.order_by(Dev.created_at.desc()).all()
+
+    list_html = render("development/dev_cards.html", articles=articles)
+    write_html(BUILD_DIR / "dev" / "show_dev" / "index.html", list_html)
+
+def rebuild_dev_article(article_id: int) -> None:
+    """
+    Rebuild a single article page:
+      builds/dev/dev/<id>/index.html
+    """
+    out_dir = BUILD_DIR / "dev" / "dev" / str(article_id)
+
+    article = Dev.query.get(article_id)
+    if article is None:
+        rm_tree(out_dir)
+        return
+
+    art_html = render("development/dev.html", article=article)
+    write_html(out_dir / "index.html", art_html)
+
+def rebuild_pipeline_list() -> None:
+    """
+    Rebuild pipeline list:
+      builds/pipeline/show_pipeline/index.html
+    """
+    pipelines = Pipeline.query.order_by(Pipeline.created_at.desc()).all()
+
+    list_html = render("pipeline/pipeline_cards.html", pipelines=pipelines)
+    write_html(BUILD_DIR / "pipeline" / "show_pipeline" / "index.html", list_html)
+
+def rebuild_pipeline_page(pipeline_id: int) -> None:
+    """
+    Rebuild a single pipeline page:
+      builds/pipeline/pipeline/<id>/index.html
+    """
+    out_dir = BUILD_DIR / "pipeline" / "pipeline" / str(pipeline_id)
+
+    pipeline = Pipeline.query.get(pipeline_id)
+    if pipeline is None:
+        rm_tree(out_dir)
+        return
+
+    page_html = render("pipeline/pipeline.html", pipeline=pipeline)
+    write_html(out_dir / "index.html", page_html)
+
+def rebuild_highlight_bench() -> None:
+
+    benchs = (
+        Benchmark.query
+        .filter(Benchmark.highlighted.is_(True))
+        .order_by(Benchmark.created_at.desc())
+        .all()
+    )
+
+    html = render("benchmark/benchmark.html", benchs=benchs)
+    write_html(BUILD_DIR / "benchmark" / "index.html", html)
+
+# -------------------------------------------------------------------
+# Page targets
+#
+# A target is a hashable tuple (kind, *key). RUNNERS maps each kind to
+# the helper that builds it; the key is passed as positional args.
+# Order matters only for readability of build logs.
+# -------------------------------------------------------------------
+RUNNERS = {
+    "function_doc":   rebuild_function_page,
+    "show_functions": rebuild_show_functions_for,
+    "show_families":  rebuild_family_listings,
+    "get_started":    rebuild_get_started_index,
+    "benchmark":      rebuild_highlight_bench,
+    "dev_list":       rebuild_dev_list,
+    "dev":            rebuild_dev_article,
+    "pipeline_list":  rebuild_pipeline_list,
+    "pipeline":       rebuild_pipeline_page,
+    "search":         rebuild_search_index,
+}
+
+
+# Kinds whose keys are collected and built together, in one call taking
+# the list of keys, after the other targets (one query for N families
+# instead of N).
+def _show_functions_batch(keys: List[tuple]) -> None:
+    rebuild_show_functions(family_id for (family_id,) in keys)
+
+
+BATCH_RUNNERS = {
+    "show_functions": _show_functions_batch,
+}
+
+
+def run_targets(targets: Iterable[tuple]) -> int:
+    """
+    Build every target in the given order (batched kinds last). Returns
+    how many ran.
+    """
+    count = 0
+    batches: Dict[str, List[tuple]] = {}
+
+    for kind, *key in targets:
+        if kind in BATCH_RUNNERS:
+            batches.setdefault(kind, []).append(tuple(key))
+        else:
+            RUNNERS[kind](*key)
+        count += 1
+
+    for kind, keys in batches.items():
+        BATCH_RUNNERS[kind](keys)
+    return count
+
+
+def all_targets() -> List[tuple]:
+    """
+    Every page target the database currently backs (full-site build).
+    """
+    def ids(model):
+        return [row_id for (row_id,) in db.session.query(model.id).order_by(model.id)]
+
+    targets = [
+        ("show_families",),
+        ("get_started",),
+        ("benchmark",),
+        ("dev_list",),
+        ("pipeline_list",),
+        ("search",),
+    ]
+    targets += [("show_functions", i) for i in ids(FunctionFamily)]
+    targets += [("function_doc", i) for i in ids(FunctionImpl)]
+    targets += [("dev", i) for i in ids(Dev)]
+    targets += [("pipeline", i) for i in ids(Pipeline)]
+    return targets
+
+
+# Targets with one output directory per row: builds/<parent>/<id>/...
+ID_DIRS = {
+    "function_doc": DOCS_DIR / "function_doc",
+    "show_functions": DOCS_DIR / "show_functions",
+    "dev": BUILD_DIR / "dev" / "dev",
+    "pipeline": BUILD_DIR / "pipeline" / "pipeline",
+}
+
+
+def prune_orphans(targets: Iterable[tuple]) -> int:
+    """
+    Remove the outputs (files and manifest rows) of per-row pages whose
+    row is no longer among targets, e.g. deleted outside the admin.
+    Call after a full build, with all_targets(). Returns how many
+    directories went away.
+    """
+    live: Dict[str, set] = defaultdict(set)
+    for target in targets:
+        if target[0] in ID_DIRS:
+            live[target[0]].add(str(target[1]))
+
+    removed = 0
+    for kind, parent in ID_DIRS.items():
+        names = manifest_children(parent)
+        if parent.is_dir():
+            names.update(p.name for p in parent.iterdir() if p.is_dir())
+        for name in sorted(n for n in names if n.isdigit() and n not in live[kind]):
+            rm_tree(parent / name)
+            removed += 1
+    return removed
@@ -0,0 +1,31 @@
+from pathlib import Path
+
+# -------------------------------------------------------------------
+# Build output roots
+# -------------------------------------------------------------------
+BUILD_DIR = Path("builds")
+BUILD_DIR.mkdir(exist_ok=True)
+BASE_URL = "https://visondf.dev"
+
+DOCS_DIR = BUILD_DIR / "docs"  # builds/docs/...
+
+
+def rel_path(path: Path) -> str:
+    """
+    Manifest key for an output file: its path relative to builds/,
+    always with forward slashes.
+    """
+    return path.relative_to(BUILD_DIR).as_posix()
+
+
+def page_url(rel: str) -> str:
+    """
+    Public URL served by nginx for a file under builds/.
+      "docs/function_doc/3/index.html" -> https://visondf.dev/docs/function_doc/3/
+      "index.html"                      -> https://visondf.dev/
+    """
+    if rel == "index.html":
+        return f"{BASE_URL}/"
+    if rel.endswith("/index.html"):
+        return f"{BASE_URL}/{rel[:-len('index.html')]}"
+    return f"{BASE_URL}/{rel}"
@@ -0,0 +1,196 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import json
+import time
+
+from flask import current_app
+
+from db import db
+from metrics import current_scope
+from models.build_profile import BuildProfile
+
+from .paths import rel_path
+from .report import BuildReport, current_report
+
+# -------------------------------------------------------------------
+# Build profiler
+#
+# For every output page the writer records:
+#   query_ms   SQL time since the previous page was written (the
+#              queries that fed this page, lazy loads included)
+#   render_ms  Jinja time of its template, SQL excluded
+#   stage_ms   time of each page stage (builder/writer.py)
+#   write_ms   hash + compare + write
+#   bytes      final size
+#
+# SQL time comes from the metrics scope (metrics.py), so it is 0 when
+# no scope is open. Post-build steps are timed as a whole.
+#
+# After each build, save_profile() stores a summary (totals, per
+# template, per stage, slowest pages) as one build_profile row and
+# keeps the last BUILD_STATS_HISTORY rows; /admin/build-stats shows
+# them.
+# -------------------------------------------------------------------
+
+# Slowest pages kept per build
+SLOWEST_PAGES = 20
+
+
+class PageProfile:
+    __slots__ = ("template", "query_ms", "render_ms", "stage_ms", "write_ms", "bytes")
+
+    def __init__(self, template: Optional[str] = None) -> None:
+        self.template = template
+        self.query_ms = 0.0
+        self.render_ms = 0.0
+        self.stage_ms: Dict[str, float] = {}
+        self.write_ms = 0.0
+        self.bytes = 0
+
+    def total_ms(self) -> float:
+        return self.query_ms + self.render_ms + sum(self.stage_ms.values()) + self.write_ms
+
+
+def _query_ms() -> float:
+    scope = current_scope()
+    return scope.query_ms if scope is not None else 0.0
+
+
+def _ms_since(t0: float) -> float:
+    return (time.perf_counter() - t0) * 1000
+
+
+@contextmanager
+def profile_render(template: str) -> Iterator[None]:
+    """
+    Time one template render; the profile is picked up by the next
+    write_html() call.
+    """
+    report = current_report()
+    if report is None:
+        yield
+        return
+
+    q0 = _query_ms()
+    t0 = time.perf_counter()
+    yield
+    elapsed = _ms_since(t0)
+    queries = _query_ms() - q0
+
+    profile = report.pending_profile or PageProfile()
+    profile.template = template
+    profile.render_ms += elapsed - queries
+    report.pending_profile = profile
+
+
+@contextmanager
+def profile_stage(name: str) -> Iterator[None]:
+    report = current_report()
+    t0 = time.perf_counter()
+    yield
+    if report is not None:
+        profile = report.pending_profile or PageProfile()
+        profile.stage_ms[name] = profile.stage_ms.get(name, 0.0) + _ms_since(t0)
+        report.pending_profile = profile
+
+
+@contextmanager
+def profile_write(path: Path, size: int) -> Iterator[None]:
+    """
+    Time the write of one output and file its profile under the path.
+    """
+    report = current_report()
+    t0 = time.perf_counter()
+    yield
+    if report is None:
+        return
+
+    profile = report.pending_profile or PageProfile()
+    report.pending_profile = None
+
+    now = _query_ms()
+    profile.query_ms = now - report.query_mark
+    report.query_mark = now
+
+    profile.write_ms = _ms_since(t0)
+    profile.bytes = size
+    report.profiles[rel_path(path)] = profile
+
+
+# -------------------------------------------------------------------
+# History
+# -------------------------------------------------------------------
+
+def summarize(report: BuildReport) -> dict:
+    profiles = report.profiles
+
+    templates: Dict[str, dict] = {}
+    stages: Dict[str, float] = {}
+    for profile in profiles.values():
+        t = templates.setdefault(
+            profile.template or "(not rendered)",
+            {"pages": 0, "render_ms": 0.0, "max_render_ms": 0.0, "bytes": 0},
+        )
+        t["pages"] += 1
+        t["render_ms"] += profile.render_ms
+        t["max_render_ms"] = max(t["max_render_ms"], profile.render_ms)
+        t["bytes"] += profile.bytes
+        for name, ms in profile.stage_ms.items():
+            stages[name] = stages.get(name, 0.0) + ms
+
+    slowest = sorted(profiles.items(), key=lambda kv: kv[1].total_ms(), reverse=True)
+    return {
+        "templates": templates,
+        "stages": stages,
+        "steps": report.step_ms,
+        "slowest": [
+            {
+                "path": path,
+                "template": p.template,
+                "query_ms": p.query_ms,
+                "render_ms": p.render_ms,
+                "stage_ms": sum(p.stage_ms.values()),
+                "write_ms": p.write_ms,
+                "bytes": p.bytes,
+            }
+            for path, p in slowest[:SLOWEST_PAGES]
+        ],
+    }
+
+
+def save_profile(report: BuildReport, source: str, job_id: Optional[int] = None) -> None:
+    """
+    Add the report's summary to the history and trim it. The caller
+    commits.
+    """
+    profiles = report.profiles.values()
+    db.session.add(BuildProfile(
+        source=source,
+        job_id=job_id,
+        pages=len(report.profiles),
+        pages_changed=len(report.changed),
+        query_ms=int(sum(p.query_ms for p in profiles)),
+        render_ms=int(sum(p.render_ms for p in profiles)),
+        stage_ms=int(sum(sum(p.stage_ms.values()) for p in profiles)),
+        write_ms=int(sum(p.write_ms for p in profiles)),
+        post_ms=int(sum(report.step_ms.values())),
+        bytes=sum(p.bytes for p in profiles),
+        details=json.dumps(summarize(report)),
+    ))
+    db.session.flush()
+
+    keep = current_app.config.get("BUILD_STATS_HISTORY", 200)
+    cutoff = (
+        db.session.query(BuildProfile.id)
+        .order_by(BuildProfile.id.desc())
+        .offset(keep)
+        .limit(1)
+        .scalar()
+    )
+    if cutoff is not None:
+        BuildProfile.query.filter(BuildProfile.id <= cutoff).delete(synchronize_session=False)
+
+
+def history(limit: int = 50) -> List[BuildProfile]:
+    return BuildProfile.query.order_by(BuildProfile.id.desc()).limit(limit).all()
@@ -0,0 +1,77 @@
+from typing import Optional
+
+from flask import g
+
+from models.build_job import BuildJob
+
+from .jobs import submit_build
+from .pages import RUNNERS
+
+
+class RebuildQueue:
+    """
+    Deduplicated set of page targets, submitted as one build job at the
+    end of a request.
+
+    A target is (kind, *key), e.g.:
+      ("function_doc", 12)
+      ("show_functions", 3)      # one family, both API levels
+      ("get_started",)
+
+    Adding the same target twice is free, so handlers can enqueue
+    everything a mutation touches without worrying about overlap:
+    a bulk taxonomy edit costs O(distinct pages), not O(functions x pages).
+    """
+
+    def __init__(self) -> None:
+        # dict as an ordered set: keeps first-enqueue order, drops duplicates
+        self._targets = {}
+
+    def add(self, kind: str, *key) -> None:
+        if kind not in RUNNERS:
+            raise ValueError(f"Unknown rebuild target kind: {kind!r}")
+        self._targets[(kind, *key)] = None
+
+    def __len__(self) -> int:
+        return len(self._targets)
+
+    def __bool__(self) -> bool:
+        return bool(self._targets)
+
+    def targets(self) -> list:
+        return list(self._targets)
+
+    def drain(self) -> list:
+        """
+        Return the pending targets and empty the queue.
+        """
+        targets, self._targets = self.targets(), {}
+        return targets
+
+
+def get_queue() -> RebuildQueue:
+    """
+    The queue for the current app context (created on first use).
+    """
+    if "rebuild_queue" not in g:
+        g.rebuild_queue = RebuildQueue()
+    return g.rebuild_queue
+
+
+def enqueue(kind: str, *key) -> None:
+    """
+    Schedule a page target on the current app context's queue.
+
+    Requests flush it in the admin blueprint's after_request hook; other
+    app contexts (CLI commands) call flush_queue() themselves.
+    """
+    get_queue().add(kind, *key)
+
+
+def flush_queue() -> Optional[BuildJob]:
+    """
+    Hand the pending targets (if any) to the build worker as one job.
+    """
+    if "rebuild_queue" not in g:
+        return None
+    return submit_build(g.rebuild_queue.drain())
@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class BuildReport:
+    """
+    What one build did. Filled in by the page writer while targets run;
+    read afterwards to decide on follow-up steps (sitemap, ...) and to
+    fill in the BuildJob row.
+    """
+
+    def __init__(self) -> None:
+        self.targets_run = 0
+
+        # Every output handed to the writer, changed or not
+        self.pages_rendered = 0
+        # Outputs whose bytes matched the stored fingerprint
+        self.skipped = 0
+
+        # Outputs actually written / directories removed, in build order
+        self.changed: List[Path] = []
+        self.removed: List[Path] = []
+
+        # True once any manifest row was added, changed or removed
+        self.manifest_dirty = False
+
+        # Bytes removed by minification, per output (path under builds/)
+        self.bytes_saved: Dict[str, int] = {}
+
+        # Build profiler (builder/profile.py): PageProfile per output,
+        # the one being filled in, and SQL time already attributed
+        self.profiles: Dict[str, object] = {}
+        self.pending_profile = None
+        self.query_mark = 0.0
+
+        # Wall time of each post-build step, in ms
+        self.step_ms: Dict[str, float] = {}
+
+        # Generation published at the end (builder/generations.py)
+        self.generation: Optional[str] = None
+
+    def merge(self, other: "BuildReport") -> None:
+        """
+        Fold in a report produced elsewhere (e.g. a build-site worker).
+        """
+        self.targets_run += other.targets_run
+        self.pages_rendered += other.pages_rendered
+        self.skipped += other.skipped
+        self.changed.extend(other.changed)
+        self.removed.extend(other.removed)
+        self.bytes_saved.update(other.bytes_saved)
+        self.profiles.update(other.profiles)
+        for name, ms in other.step_ms.items():
+            self.step_ms[name] = self.step_ms.get(name, 0.0) + ms
+        self.manifest_dirty = self.manifest_dirty or other.manifest_dirty
+
+
+_current: ContextVar[Optional[BuildReport]] = ContextVar("build_report", default=None)
+
+
+def current_report() -> Optional[BuildReport]:
+    return _current.get()
+
+
+@contextmanager
+def build_report():
+    """
+    Collect everything written while the block runs into a BuildReport.
+    """
+    report = BuildReport()
+    token = _current.set(report)
+    try:
+        yield report
+    finally:
+        _current.reset(token)
@@ -0,0 +1,149 @@
+from html import unescape
+from typing import Dict, Iterable, List, Set
+import json
+import re
+
+from db import db
+from models.function_family import FunctionFamily
+from models.function_impl import FunctionImpl
+
+from .manifest import content_hash
+from .paths import BUILD_DIR
+from .writer import write_output
+
+# -------------------------------------------------------------------
+# Client-side search index
+#
+#   builds/search/meta.json        version + layout, fetched first
+#   builds/search/idx/<c>.json     terms starting with <c>:
+#                                    {"p": {prefix:  [fn ids]},
+#                                     "t": {trigram: [fn ids]}}
+#   builds/search/docs/<n>.json    {fn id: [name, family, api_level,
+#                                    network, gpu, summary]}
+#                                  for fn id % DOC_SHARDS == n
+#
+# A one-word query fetches meta.json, one index shard and the doc
+# shards of its hits: a few KB. Prefixes answer "starts with" queries;
+# trigrams are the fallback for words found inside a name.
+#
+# The shard layout is fixed (one per leading character, DOC_SHARDS doc
+# shards), so every build writes the same files. The index is cheap
+# to recompute from one query; write_output() skips shards whose bytes
+# did not change, so editing one function rewrites only the shards
+# its terms live in.
+# -------------------------------------------------------------------
+
+SEARCH_DIR = BUILD_DIR / "search"
+
+DOC_SHARDS = 16
+SHARD_KEYS = "abcdefghijklmnopqrstuvwxyz0123456789_"
+
+# Longest prefix indexed; longer query words match on this prefix
+MAX_PREFIX = 12
+
+# Characters of summary kept in the doc store (result snippet)
+SNIPPET_CHARS = 160
+
+_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"[a-z0-9_]+")
+
+
+def strip_html(html: str) -> str:
+    text = unescape(_TAG.sub(" ", html or ""))
+    return " ".join(text.split())
+
+
+def _words(text: str) -> Set[str]:
+    words = set()
+    for word in _WORD.findall(text.lower()):
+        words.add(word)
+        # group_by -> group, by
+        words.update(part for part in word.split("_") if part)
+    return words
+
+
+def _prefixes(word: str, shortest: int = 1) -> Iterable[str]:
+    return (word[:n] for n in range(shortest, min(len(word), MAX_PREFIX) + 1))
+
+
+def _trigrams(word: str) -> Iterable[str]:
+    return (word[i:i + 3] for i in range(len(word) - 2))
+
+
+def _shard_key(term: str) -> str:
+    return term[0] if term[0] in SHARD_KEYS else "_"
+
+
+def _dump(data) -> bytes:
+    return json.dumps(data, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def build_index() -> Dict[str, bytes]:
+    """
+    Every search file, keyed by path under builds/search/.
+    """
+    rows = (
+        db.session.query(FunctionImpl, FunctionFamily.display_name)
+        .join(FunctionFamily, FunctionImpl.family_id == FunctionFamily.id)
+        .order_by(FunctionImpl.id)
+        .all()
+    )
+
+    prefixes: Dict[str, Dict[str, List[int]]] = {k: {} for k in SHARD_KEYS}
+    trigrams: Dict[str, Dict[str, List[int]]] = {k: {} for k in SHARD_KEYS}
+    docs: List[Dict[str, list]] = [{} for _ in range(DOC_SHARDS)]
+
+    for fn, family_name in rows:
+        summary = strip_html(fn.summary)
+
+        # Names, family, summary and signature: every prefix and trigram.
+        # Description: only prefixes of 3+ characters, to keep it small.
+        main = _words(" ".join((fn.real_name, family_name or "", summary,
+                                strip_html(fn.signature_html))))
+        body = _words(strip_html(fn.description_html)) - main
+
+        terms = {p for w in main for p in _prefixes(w)}
+        terms |= {p for w in body if len(w) >= 3 for p in _prefixes(w, 3)}
+        for term in terms:
+            prefixes[_shard_key(term)].setdefault(term, []).append(fn.id)
+
+        for tri in {t for w in main for t in _trigrams(w)}:
+            trigrams[_shard_key(tri)].setdefault(tri, []).append(fn.id)
+
+        docs[fn.id % DOC_SHARDS][str(fn.id)] = [
+            fn.real_name,
+            family_name,
+            str(fn.api_level),
+            int(bool(fn.network)),
+            int(bool(fn.gpu)),
+            summary[:SNIPPET_CHARS],
+        ]
+
+    files: Dict[str, bytes] = {}
+    for key in SHARD_KEYS:
+        files[f"idx/{key}.json"] = _dump({"p": prefixes[key], "t": trigrams[key]})
+    for n, shard in enumerate(docs):
+        files[f"docs/{n}.json"] = _dump(shard)
+
+    # Clients append ?v=<version> to shard URLs, so shards can be cached
+    # aggressively and still never mix two builds.
+    version = content_hash(b"".join(files[name] for name in sorted(files)))[:12]
+    files["meta.json"] = _dump({
+        "version": version,
+        "doc_shards": DOC_SHARDS,
+        "max_prefix": MAX_PREFIX,
+    })
+    return files
+
+
+def rebuild_search_index() -> None:
+    """
+    Rebuild the search index:
+      builds/search/{meta.json, idx/*.json, docs/*.json}
+
+    Trigger when:
+      - FunctionImpl create/delete, or a searchable field changes
+      - FunctionFamily display_name changes
+    """
+    for name, data in build_index().items():
+        write_output(SEARCH_DIR / name, data)
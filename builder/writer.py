@@ -0,0 +1,85 @@
+from pathlib import Path
+import shutil
+
+from .bundle import bundle_stage
+from .critical import critical_stage
+from .highlight import highlight_stage
+from .manifest import content_hash, forget_tree, get_entry, record_page
+from .minify import minify_stage
+from .profile import profile_stage, profile_write
+from .report import current_report
+
+# -------------------------------------------------------------------
+# Page writer
+#
+# Every build output (pages, sitemap.xml, data files) goes through
+# write_output(). It hashes the bytes, compares them with the stored
+# fingerprint in the manifest and skips the write when nothing changed.
+# Unchanged files keep their inode and mtime, so nginx open_file_cache
+# and CDN entries stay warm.
+#
+# What actually changed is recorded on the current BuildReport; the
+# post-build steps (builder/jobs.py) only look at that list.
+# -------------------------------------------------------------------
+
+def write_output(path: Path, data: bytes) -> bool:
+    """
+    Write data to path atomically unless it is byte-identical to what the
+    manifest says is already there. Returns True when the file was written.
+    """
+    report = current_report()
+    if report is not None:
+        report.pages_rendered += 1
+
+    with profile_write(path, len(data)):
+        digest = content_hash(data)
+        entry = get_entry(path)
+
+        if entry is not None and entry.content_hash == digest and path.exists():
+            if report is not None:
+                report.skipped += 1
+            return False
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(data)
+
+        # atomic on POSIX
+        tmp.replace(path)
+
+        record_page(path, digest, entry)
+
+    if report is not None:
+        report.changed.append(path)
+    return True
+
+
+# -------------------------------------------------------------------
+# Page stages
+#
+# Rendered HTML goes through these, in order, before it is hashed and
+# written. Each stage is (path, html) -> html.
+# -------------------------------------------------------------------
+PAGE_STAGES = [
+    highlight_stage,
+    critical_stage,
+    bundle_stage,
+    minify_stage,
+]
+
+
+def write_html(path: Path, html: str) -> bool:
+    for stage in PAGE_STAGES:
+        with profile_stage(stage.__name__):
+            html = stage(path, html)
+    return write_output(path, html.encode("utf-8"))
+
+
+def rm_tree(path: Path) -> None:
+    shutil.rmtree(path, ignore_errors=True)
+
+    if forget_tree(path):
+        report = current_report()
+        if report is not None:
+            report.removed.append(path)
@@ -0,0 +1,374 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+import pickle
+import random
+import threading
+import time
+
+from flask import Flask, current_app
+from sqlalchemy import event
+
+from db import db
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# -------------------------------------------------------------------
+# Shared cache
+#
+# Query results and rendered admin pages, shared by every gunicorn
+# worker through Redis (CACHE_TYPE = "redis"). Without the redis
+# package, an in-process LRU with TTL stands in ("memory"); "null"
+# disables caching. The memory cache only sees its own worker's
+# commits: with several workers, other workers' writes show up after
+# at most CACHE_DEFAULT_TIMEOUT.
+#
+# The memory cache also stands in while the Redis server cannot be
+# reached (at startup or later): one log line when it goes away, a
+# retry after a growing backoff (up to REDIS_RETRY_MAX seconds), one
+# line when it is back.
+#
+# Entries are never deleted on writes. Each table has a version
+# counter, and the key of an entry includes the versions of the tables
+# it was computed from:
+#
+#   visondf:admin.show_datasets:dataset=17
+#
+# Session listeners collect the tables touched by a transaction (unit
+# of work and bulk Query.update / delete alike) and bump their counters
+# once it commits. Every worker then computes new keys, and the old
+# entries age out (CACHE_DEFAULT_TIMEOUT).
+#
+# Redis should evict with volatile-lru: entries have a TTL, counters
+# do not, so counters are never evicted.
+# -------------------------------------------------------------------
+
+T = TypeVar("T")
+
+KEY_PREFIX = "visondf:"
+
+# Seconds before retrying an unreachable Redis, doubling per failure
+REDIS_RETRY_MIN = 1.0
+REDIS_RETRY_MAX = 60.0
+
+
+class NullBackend:
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        pass
+
+    def versions(self, tables: List[str]) -> List[int]:
+        return [0] * len(tables)
+
+    def bump(self, tables: Iterable[str]) -> None:
+        pass
+
+
+class MemoryBackend:
+    """
+    LRU of at most max_entries, each valid for its TTL. Counters are kept
+    apart and never evicted: an evicted counter restarting at 0 could
+    make stale entries current again.
+    """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self.max_entries = max_entries
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, tables: List[str]) -> List[int]:
+        with self._lock:
+            return [self._versions.get(t, 0) for t in tables]
+
+    def bump(self, tables: Iterable[str]) -> None:
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+
+class RedisBackend:
+    def __init__(self, url: str) -> None:
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(KEY_PREFIX + key)
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        self.client.set(KEY_PREFIX + key, value, ex=ttl)
+
+    def versions(self, tables: List[str]) -> List[int]:
+        keys = [f"{KEY_PREFIX}v:{t}" for t in tables]
+        values = self.client.mget(keys)
+        missing = [k for k, v in zip(keys, values) if v is None]
+        if missing:
+            # First use (or Redis restarted): start at a random version
+            # so keys computed before cannot come back
+            pipe = self.client.pipeline()
+            for key in missing:
+                pipe.set(key, random.randrange(1 << 30), nx=True)
+            pipe.execute()
+            values = self.client.mget(keys)
+        return [int(v or 0) for v in values]
+
+    def bump(self, tables: Iterable[str]) -> None:
+        pipe = self.client.pipeline()
+        for table in tables:
+            pipe.incr(f"{KEY_PREFIX}v:{table}")
+        pipe.execute()
+
+
+class FailoverBackend:
+    """
+    Redis, with a MemoryBackend used while the server is unreachable.
+    Bumps always reach the memory backend too, so its counters know
+    this process's own commits when it has to take over; the tables
+    bumped while Redis was away are bumped there once it is back.
+    """
+
+    def __init__(self, primary: RedisBackend, fallback: MemoryBackend, logger) -> None:
+        self.primary = primary
+        self.fallback = fallback
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._down = False
+        self._retry_at = 0.0
+        self._backoff = 0.0
+        self._missed: set = set()
+
+    def check(self) -> None:
+        """
+        Ping the server now; on failure, fall back until the next retry.
+        """
+        try:
+            self.primary.client.ping()
+        except (redis.ConnectionError, redis.TimeoutError) as exc:
+            self._failed(exc)
+
+    def _failed(self, exc: Exception) -> None:
+        with self._lock:
+            self._backoff = min(max(self._backoff * 2, REDIS_RETRY_MIN), REDIS_RETRY_MAX)
+            self._retry_at = time.monotonic() + self._backoff
+            if not self._down:
+                self._down = True
+                self.logger.warning("Redis unreachable (%s); using a per-process memory "
+                                    "cache until it is back", exc)
+
+    def _replay(self) -> None:
+        # before anything else once Redis answers again
+        with self._lock:
+            missed, self._missed = self._missed, set()
+        if not missed:
+            return
+        try:
+            # counters missing after a Redis restart start at random first
+            self.primary.versions(sorted(missed))
+            self.primary.bump(missed)
+        except Exception:
+            with self._lock:
+                self._missed |= missed
+            raise
+
+    def _recovered(self) -> None:
+        if not self._down:
+            return
+        with self._lock:
+            self._down = False
+            self._backoff = 0.0
+        self.logger.warning("Redis reachable again; shared cache restored")
+
+    def _backing_off(self) -> bool:
+        return self._down and time.monotonic() < self._retry_at
+
+    def _call(self, name: str, *args):
+        if self._backing_off():
+            return getattr(self.fallback, name)(*args)
+        try:
+            if self._down:
+                self._replay()
+            result = getattr(self.primary, name)(*args)
+        except (redis.ConnectionError, redis.TimeoutError) as exc:
+            self._failed(exc)
+            return getattr(self.fallback, name)(*args)
+        self._recovered()
+        return result
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._call("get", key)
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._call("set", key, value, ttl)
+
+    def versions(self, tables: List[str]) -> List[int]:
+        return self._call("versions", tables)
+
+    def bump(self, tables: Iterable[str]) -> None:
+        tables = list(tables)
+        self.fallback.bump(tables)
+        if self._backing_off():
+            with self._lock:
+                self._missed.update(tables)
+            return
+        try:
+            if self._down:
+                self._replay()
+            self.primary.bump(tables)
+        except (redis.ConnectionError, redis.TimeoutError) as exc:
+            with self._lock:
+                self._missed.update(tables)
+            self._failed(exc)
+        else:
+            self._recovered()
+
+
+_backend = MemoryBackend()
+
+
+def _make_backend(app: Flask):
+    kind = app.config.get("CACHE_TYPE", "memory")
+    if kind == "null":
+        return NullBackend()
+    if kind == "redis":
+        if redis is not None:
+            backend = FailoverBackend(
+                RedisBackend(app.config.get("CACHE_REDIS_URL", "redis://localhost:6379/0")),
+                MemoryBackend(app.config.get("CACHE_MEMORY_ENTRIES", 1024)),
+                app.logger,
+            )
+            backend.check()
+            return backend
+        app.logger.warning("CACHE_TYPE is redis but the redis package is missing; "
+                           "using a per-process memory cache")
+    return MemoryBackend(app.config.get("CACHE_MEMORY_ENTRIES", 1024))
+
+
+def _tables(models: Iterable[type]) -> List[str]:
+    return sorted({m.__tablename__ for m in models})
+
+
+# -------------------------------------------------------------------
+# API
+# -------------------------------------------------------------------
+
+def cached(name: str, models: Iterable[type], compute: Callable[[], T],
+           ttl: Optional[int] = None) -> T:
+    """
+    compute() from the cache, recomputed whenever one of models' tables
+    changed (no models: computed from name alone, e.g. a content hash).
+    The value must pickle (plain data or rendered HTML, not ORM
+    instances). A cache that cannot be reached counts as a miss.
+    """
+    tables = _tables(models)
+    try:
+        versions = _backend.versions(tables) if tables else []
+        key = name + ":" + ",".join(f"{t}={v}" for t, v in zip(tables, versions))
+        hit = _backend.get(key)
+    except Exception:
+        current_app.logger.warning("Cache unavailable, computing %s", name, exc_info=True)
+        return compute()
+
+    if hit is not None:
+        return pickle.loads(hit)
+
+    value = compute()
+    try:
+        _backend.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                     ttl or current_app.config.get("CACHE_DEFAULT_TIMEOUT", 300))
+    except Exception:
+        current_app.logger.warning("Cache unavailable, not storing %s", name, exc_info=True)
+    return value
+
+
+def bump(*models: type) -> None:
+    """
+    Invalidate every entry computed from these models' tables (writes
+    that bypass the session, e.g. raw SQL).
+    """
+    _bump(_tables(models))
+
+
+def _bump(tables: Iterable[str]) -> None:
+    try:
+        _backend.bump(tables)
+    except Exception:
+        # entries computed from these tables stay until their TTL
+        current_app.logger.error("Cache version bump failed for %s", sorted(tables), exc_info=True)
+
+
+# -------------------------------------------------------------------
+# Session listeners
+# -------------------------------------------------------------------
+
+def _touched(session) -> set:
+    return session.info.setdefault("cache_tables", set())
+
+
+def _after_flush(session, flush_context):
+    changed = [*session.new, *session.deleted]
+    changed += [
+        obj for obj in session.dirty
+        if session.is_modified(obj, include_collections=False)
+    ]
+    touched = _touched(session)
+    for obj in changed:
+        table = getattr(type(obj), "__tablename__", None)
+        if table is not None:
+            touched.add(table)
+
+
+def _after_bulk(context):
+    # Query.update() / Query.delete(): no objects, only the mapper
+    mapper = getattr(context, "mapper", None)
+    if mapper is not None:
+        _touched(context.session).add(mapper.class_.__tablename__)
+
+
+def _after_commit(session):
+    tables = session.info.pop("cache_tables", None)
+    if tables:
+        _bump(tables)
+
+
+def _after_rollback(session):
+    session.info.pop("cache_tables", None)
+
+
+def init_app(app: Flask) -> None:
+    """
+    Pick the backend from CACHE_TYPE and register the session listeners.
+    """
+    global _backend
+    _backend = _make_backend(app)
+
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("after_bulk_update", _after_bulk),
+        ("after_bulk_delete", _after_bulk),
+        ("after_commit", _after_commit),
+        ("after_rollback", _after_rollback),
+    ):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
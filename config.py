@@ -1,4 +1,5 @@
 from datetime import timedelta
+import os
 
 class Config:
     SECRET_KEY = "PASSWORD"
@@ -25,6 +26,54 @@ class Config:
 
     REMEMBER_COOKIE_DURATION=timedelta(0)
 
+    # Templates (builder/jinja_cache.py). Auto-reload is for template
+    # development only: VISONDF_DEV=1 flask --app run run
+    TEMPLATES_AUTO_RELOAD = os.environ.get("VISONDF_DEV") == "1"
+    JINJA_CACHE_DIR = "jinja_cache"   # bytecode cache, relative to the app root
+    JINJA_PRECOMPILE = True           # compile every template at worker boot
+
+    # Dataset uploads (uploads.py)
+    DATASET_MAX_BYTES = 20 * 1024 ** 3               # per file
+    MAX_CONTENT_LENGTH = DATASET_MAX_BYTES + (1 << 20) # whole request, form fields included
+    UPLOAD_TMP_DIR = "uploads/tmp"                   # same filesystem as uploads/datasets
+
+    # Dataset publisher (publisher.py): quiet time before a burst of
+    # adds/deletes is published, and the longest a change may wait
+    DATASET_PUBLISH_DELAY = 2.0
+    DATASET_PUBLISH_MAX_DELAY = 10.0
+
+    # Dataset worker (dataset_worker.py, `flask dataset-worker`)
+    DATASET_POLL_INTERVAL = 1.0     # seconds between polls of an empty queue
+    DATASET_MAX_ATTEMPTS = 3        # runs of a job interrupted by a dying worker
+    DATASET_STALE_AFTER = 6 * 3600  # CLI commands requeue jobs running longer than this
+    DATASET_PUBLISH_SWEEP = 60.0    # publishes lost with a web worker are retried after this
+
+    # Dataset profiler (dataset_profiler.py)
+    DATASET_PROFILE_ASYNC = True    # False: profile inline, inside the request
+    DATASET_SAMPLE_ROWS = 5         # head rows shown on the pages
+
+    # Dataset variants (dataset_variants.py)
+    DATASET_VARIANT_ASYNC = True    # False: transcode inline, after profiling
+    DATASET_GZIP_LEVEL = 6
+    DATASET_ZSTD_LEVEL = 10         # zstandard package, skipped if missing
+    DATASET_PARQUET_COMPRESSION = "zstd"  # pyarrow, skipped if missing
+
+    # Static-site build worker (builder/jobs.py, `flask build-worker`)
+    BUILD_ASYNC = True        # False: build inline, inside the request
+    BUILD_POLL_INTERVAL = 1.0 # seconds between polls of an empty queue
+    BUILD_MAX_ATTEMPTS = 3    # runs of a job interrupted by a dying worker
+    BUILD_STATS_HISTORY = 200 # build profiles kept for /admin/build-stats
+    BUILD_GENERATIONS_KEEP = 5  # site/generations kept for rollback
+    HIGHLIGHT_CACHE_TIMEOUT = 7 * 24 * 3600  # highlighted code blocks (builder/highlight.py)
+
+    # Request / query instrumentation (metrics.py)
+    SLOW_QUERY_MS = 100       # log statements slower than this
+    METRICS_WINDOW = 500      # samples kept per endpoint for p50/p95
+    METRICS_SERVER_TIMING = False  # Server-Timing header for visitors too (admins always get it)
+
+    # Shared cache (cache.py): "redis", "memory" (per process) or "null"
     CACHE_TYPE = "redis"
     CACHE_REDIS_URL = "redis://localhost:6379/0"
+    CACHE_DEFAULT_TIMEOUT = 300     # seconds an entry lives
+    CACHE_MEMORY_ENTRIES = 1024     # LRU size of the "memory" backend
 
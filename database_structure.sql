@@ -20,10 +20,18 @@ CREATE TABLE IF NOT EXISTS dataset (
     version       VARCHAR(32)  NOT NULL,
     description   TEXT,                 -- HTML allowed
     download_url  VARCHAR(512),
+    checksum      CHAR(64) NULL,         -- SHA-256 of the file (content address)
+    size_bytes    BIGINT NULL,
+    published_at  DATETIME NULL,         -- copy in static/datasets is current
+    publish_error TEXT NULL,
     created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE KEY uq_dataset_name_version (name, version)
+    UNIQUE KEY uq_dataset_name_version (name, version),
+    KEY idx_dataset_checksum (checksum)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- Databases created before checksum / size_bytes / published_at /
+-- publish_error existed: run migrations/dataset_storage.sql
+
 -- -----------------------------------------
 -- FUNCTION FAMILY
 -- Semantic purpose/category (group_by, pivot, scan...)
@@ -201,7 +209,133 @@ CREATE TABLE IF NOT EXISTS pipeline_dataset (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 
+-- -----------------------------------------
+-- BUILD PAGE
+-- Manifest of every page written under builds/
+-- Drives sitemap.xml without walking the filesystem
+-- -----------------------------------------
+CREATE TABLE IF NOT EXISTS build_page (
+    path          VARCHAR(255) NOT NULL PRIMARY KEY,  -- relative to builds/
+    url           VARCHAR(512) NOT NULL,
+    content_hash  CHAR(64)     NOT NULL,              -- sha256 of rendered bytes
+    lastmod       DATETIME     NOT NULL               -- last real content change
+
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+
+-- -----------------------------------------
+-- BUILD JOB
+-- Static-site rebuilds, consumed by `flask build-worker`
+-- Polled via /admin/builds/<id>
+-- -----------------------------------------
+CREATE TABLE IF NOT EXISTS build_job (
+    id              INT AUTO_INCREMENT PRIMARY KEY,
+    status          ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+    targets         TEXT NOT NULL,          -- JSON list of page targets
+
+    pages_rendered  INT NOT NULL DEFAULT 0,  -- outputs rendered
+    pages_changed   INT NOT NULL DEFAULT 0,  -- outputs actually written
+    bytes_saved     BIGINT NOT NULL DEFAULT 0, -- removed by HTML minification
+    attempts        INT NOT NULL DEFAULT 0,  -- runs claimed by a build worker
+    generation      VARCHAR(32) NULL,       -- site/generations/<id> it published
+    error           TEXT,
+
+    created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at      DATETIME NULL,
+    finished_at     DATETIME NULL,
+    duration_ms     INT NULL,
+
+    KEY idx_build_job_status (status)
+
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+
+-- -----------------------------------------
+-- BUILD PROFILE
+-- Timing summary of each build (rolling history, see builder/profile.py)
+-- Shown on /admin/build-stats
+-- -----------------------------------------
+CREATE TABLE IF NOT EXISTS build_profile (
+    id              INT AUTO_INCREMENT PRIMARY KEY,
+    source          VARCHAR(32) NOT NULL,    -- 'job' or 'build-site'
+    job_id          INT NULL,
+
+    pages           INT NOT NULL DEFAULT 0,
+    pages_changed   INT NOT NULL DEFAULT 0,
+
+    query_ms        INT NOT NULL DEFAULT 0,  -- summed over all pages
+    render_ms       INT NOT NULL DEFAULT 0,
+    stage_ms        INT NOT NULL DEFAULT 0,
+    write_ms        INT NOT NULL DEFAULT 0,
+    post_ms         INT NOT NULL DEFAULT 0,  -- sitemap, compression, ...
+
+    bytes           BIGINT NOT NULL DEFAULT 0,
+    details         MEDIUMTEXT NOT NULL,     -- JSON breakdown
+
+    created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT fk_build_profile_job
+        FOREIGN KEY (job_id)
+        REFERENCES build_job(id)
+        ON DELETE SET NULL
+
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+
+-- -----------------------------------------
+-- DATASET PROFILE
+-- Schema / row count / nulls / head sample of a dataset file,
+-- computed in the background (dataset_profiler.py).
+-- Keyed by file checksum: datasets sharing a file share the profile.
+-- -----------------------------------------
+CREATE TABLE IF NOT EXISTS dataset_profile (
+    checksum        CHAR(64) PRIMARY KEY,   -- dataset.checksum
+    status          ENUM('queued', 'running', 'done', 'failed', 'unsupported')
+                    NOT NULL DEFAULT 'queued',
 
+    format          VARCHAR(16) NULL,       -- 'csv', 'parquet'
+    row_count       BIGINT NULL,
+    columns         MEDIUMTEXT NULL,        -- JSON [{name, dtype, nulls}]
+    sample          MEDIUMTEXT NULL,        -- JSON head rows
 
+    error           TEXT NULL,
+    duration_ms     INT NULL,
+    attempts        INT NOT NULL DEFAULT 0, -- runs claimed by a worker
 
+    created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at      DATETIME NULL,
+    profiled_at     DATETIME NULL
+
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+
+-- -----------------------------------------
+-- DATASET VARIANT
+-- Transcoded downloads of a dataset file (dataset_variants.py):
+-- gzip / zstd of the original, and a Parquet conversion of CSV.
+-- Keyed by the source file checksum, like dataset_profile.
+-- -----------------------------------------
+CREATE TABLE IF NOT EXISTS dataset_variant (
+    id              INT AUTO_INCREMENT PRIMARY KEY,
+
+    source_checksum CHAR(64) NOT NULL,      -- dataset.checksum
+    kind            ENUM('gzip', 'zstd', 'parquet') NOT NULL,
+    status          ENUM('queued', 'running', 'done', 'failed', 'skipped')
+                    NOT NULL DEFAULT 'queued',
+
+    download_url    VARCHAR(500) NULL,
+    size_bytes      BIGINT NULL,
+    checksum        CHAR(64) NULL,          -- SHA-256 of the variant
+
+    error           TEXT NULL,
+    duration_ms     INT NULL,
+    attempts        INT NOT NULL DEFAULT 0, -- runs claimed by a worker
+
+    created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at      DATETIME NULL,
+    finished_at     DATETIME NULL,
+
+    UNIQUE KEY uq_dataset_variant_kind (source_checksum, kind),
+    INDEX idx_dataset_variant_source (source_checksum)
+
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,60 @@
+from pathlib import Path
+from typing import BinaryIO, Optional, TextIO, Tuple
+import bz2
+import gzip
+import lzma
+
+# -------------------------------------------------------------------
+# Dataset file formats
+#
+# What a stored dataset file is, from its name:
+#   data.csv      -> (".csv", None)
+#   data.tsv.gz   -> (".tsv", ".gz")
+#   data.parquet  -> (".parquet", None)
+# and how to stream it back, decompressing on the fly. Shared by the
+# profiler and the transcoder.
+# -------------------------------------------------------------------
+
+COMPRESSED = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+}
+
+# Delimited text; None: guess the delimiter
+CSV_SUFFIXES = {".csv": ",", ".tsv": "\t", ".txt": None}
+PARQUET_SUFFIXES = {".parquet", ".pq"}
+
+# Cell values read as missing (compared lower case, stripped)
+NULL_TOKENS = {"", "na", "n/a", "nan", "null", "none"}
+
+# Read size when streaming a file through
+CHUNK_BYTES = 1 << 20
+
+
+def split_suffixes(path: Path) -> Tuple[str, Optional[str]]:
+    """
+    (format suffix, compression suffix or None), both lower case.
+    """
+    suffixes = [s.lower() for s in path.suffixes]
+    if suffixes and suffixes[-1] in COMPRESSED:
+        return (suffixes[-2] if len(suffixes) > 1 else ""), suffixes[-1]
+    return (suffixes[-1] if suffixes else ""), None
+
+
+def open_binary(path: Path) -> BinaryIO:
+    """
+    The file's bytes, decompressed if its name says so.
+    """
+    opener = COMPRESSED.get(split_suffixes(path)[1])
+    if opener is not None:
+        return opener(path, "rb")
+    return open(path, "rb", buffering=CHUNK_BYTES)
+
+
+def open_text(path: Path) -> TextIO:
+    opener = COMPRESSED.get(split_suffixes(path)[1])
+    if opener is not None:
+        return opener(path, "rt", encoding="utf-8", errors="replace", newline="")
+    return open(path, "r", encoding="utf-8", errors="replace", newline="",
+                buffering=CHUNK_BYTES)
@@ -0,0 +1,436 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+import csv
+import json
+import re
+import time
+import traceback
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+from sqlalchemy.exc import IntegrityError
+
+from builder.queue import flush_queue
+from dataset_formats import (
+    CSV_SUFFIXES, NULL_TOKENS, PARQUET_SUFFIXES, open_text, split_suffixes,
+)
+from dataset_variants import schedule_variants
+from db import db
+from metrics import track
+from models.dataset import Dataset
+from models.dataset_profile import DatasetProfile
+from uploads import dataset_path
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# -------------------------------------------------------------------
+# Dataset profiler
+#
+# After an upload, the dataset worker (dataset_worker.py) reads the
+# stored file once and records, in dataset_profile (keyed by the file's checksum):
+#   format, row count, columns (name, inferred dtype, null count) and
+#   the first DATASET_SAMPLE_ROWS rows
+# The function and pipeline pages that list the dataset show it.
+#
+# Memory stays bounded whatever the file size:
+#   CSV / TSV (optionally .gz / .bz2 / .xz)  one pass with the csv
+#       module, row by row; per column only a dtype and a null count
+#   Parquet (pyarrow, optional)  memory-mapped; row count and null
+#       counts come from the footer metadata, the sample from the
+#       first record batch. Columns without statistics are scanned
+#       in batches.
+#
+# Once a file is profiled, its download variants are scheduled
+# (dataset_variants.py): the Parquet variant uses the inferred dtypes.
+#
+# Uploads only queue a dataset_profile row: the CSV pass is pure
+# Python and holds the GIL for the whole file, so it never runs in
+# gunicorn. `flask profile-datasets` profiles datasets uploaded before this
+# existed (or, with --failed, retries failed ones).
+# -------------------------------------------------------------------
+
+# Longest sample cell kept, in characters
+MAX_CELL = 64
+
+# Bytes read to guess the CSV delimiter
+SNIFF_BYTES = 64 * 1024
+
+# Batch size of the Parquet null-count scan
+SCAN_BATCH_ROWS = 64 * 1024
+
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+def _cell(value) -> str:
+    text = "" if value is None else str(value)
+    return text if len(text) <= MAX_CELL else text[:MAX_CELL - 1] + "…"
+
+
+# -------------------------------------------------------------------
+# CSV
+# -------------------------------------------------------------------
+
+_INT = re.compile(r"[+-]?\d+\Z")
+_FLOAT = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\Z|[+-]?inf(inity)?\Z", re.I)
+_BOOL = {"true", "false"}
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}\Z")
+_DATETIME = re.compile(
+    r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?\Z"
+)
+
+# Pairs of dtypes that widen to something narrower than string
+_WIDEN = {
+    frozenset(("int64", "float64")): "float64",
+    frozenset(("date", "datetime")): "datetime",
+}
+
+
+def _kind(value: str) -> str:
+    if _INT.match(value):
+        return "int64"
+    if _FLOAT.match(value):
+        return "float64"
+    if value.lower() in _BOOL:
+        return "bool"
+    if _DATE.match(value):
+        return "date"
+    if _DATETIME.match(value):
+        return "datetime"
+    return "string"
+
+
+class _Column:
+    __slots__ = ("name", "dtype", "nulls")
+
+    def __init__(self, name: str, nulls: int = 0) -> None:
+        self.name = name
+        self.dtype: Optional[str] = None   # None: only nulls so far
+        self.nulls = nulls
+
+    def add(self, value: str) -> None:
+        value = value.strip()
+        if value.lower() in NULL_TOKENS:
+            self.nulls += 1
+            return
+        if self.dtype == "string":
+            return
+        kind = _kind(value)
+        if self.dtype is None or self.dtype == kind:
+            self.dtype = kind
+        else:
+            self.dtype = _WIDEN.get(frozenset((self.dtype, kind)), "string")
+
+    def as_dict(self) -> dict:
+        return {"name": self.name, "dtype": self.dtype or "null", "nulls": self.nulls}
+
+
+def _dialect(sample: str, default: Optional[str]):
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        return csv.get_dialect("excel-tab" if default == "\t" else "excel")
+
+
+def profile_csv(path: Path, sample_rows: int, delimiter: Optional[str] = None) -> dict:
+    """
+    One streaming pass; the first row is the header.
+    """
+    with open_text(path) as f:
+        dialect = _dialect(f.read(SNIFF_BYTES), delimiter)
+        f.seek(0)
+        reader = csv.reader(f, dialect)
+
+        header = next(reader, None)
+        if header is None:
+            return {"format": "csv", "row_count": 0, "columns": [], "sample": []}
+
+        columns = [_Column(name.strip() or f"column_{i + 1}") for i, name in enumerate(header)]
+        sample: List[list] = []
+        rows = 0
+
+        for row in reader:
+            if not row:
+                continue
+            rows += 1
+
+            if len(row) > len(columns):
+                # ragged row: new columns were null in every row before
+                columns += [
+                    _Column(f"column_{i + 1}", nulls=rows - 1)
+                    for i in range(len(columns), len(row))
+                ]
+            for column, value in zip(columns, row):
+                column.add(value)
+            for column in columns[len(row):]:
+                column.nulls += 1
+
+            if len(sample) < sample_rows:
+                sample.append([_cell(v) for v in row])
+
+    return {
+        "format": "csv",
+        "row_count": rows,
+        "columns": [c.as_dict() for c in columns],
+        "sample": sample,
+    }
+
+
+# -------------------------------------------------------------------
+# Parquet
+# -------------------------------------------------------------------
+
+def profile_parquet(path: Path, sample_rows: int) -> dict:
+    if pq is None:
+        raise UnsupportedFormat("Parquet profiling needs pyarrow (pip install pyarrow)")
+
+    pf = pq.ParquetFile(str(path), memory_map=True)
+    meta = pf.metadata
+    fields = list(pf.schema_arrow)
+
+    # Null counts from row group statistics, for flat columns that have
+    # them in every row group
+    leaf = {meta.schema.column(i).path: i for i in range(meta.num_columns)}
+    nulls: Dict[str, int] = {}
+    for field in fields:
+        i = leaf.get(field.name)
+        if i is None:
+            continue
+        total = 0
+        for rg in range(meta.num_row_groups):
+            stats = meta.row_group(rg).column(i).statistics
+            if stats is None or not stats.has_null_count:
+                break
+            total += stats.null_count
+        else:
+            nulls[field.name] = total
+
+    missing = [f.name for f in fields if f.name not in nulls]
+    if missing:
+        counts = dict.fromkeys(missing, 0)
+        for batch in pf.iter_batches(batch_size=SCAN_BATCH_ROWS, columns=missing):
+            for name, array in zip(batch.schema.names, batch.columns):
+                counts[name] += array.null_count
+        nulls.update(counts)
+
+    sample: List[list] = []
+    if sample_rows and meta.num_rows:
+        batch = next(pf.iter_batches(batch_size=sample_rows), None)
+        if batch is not None:
+            sample = [
+                [_cell(row[f.name]) for f in fields]
+                for row in batch.to_pylist()[:sample_rows]
+            ]
+
+    return {
+        "format": "parquet",
+        "row_count": meta.num_rows,
+        "columns": [
+            {"name": f.name, "dtype": str(f.type), "nulls": nulls[f.name]}
+            for f in fields
+        ],
+        "sample": sample,
+    }
+
+
+def profile_file(path: Path, sample_rows: int) -> dict:
+    suffix, compression = split_suffixes(path)
+    if suffix in PARQUET_SUFFIXES and compression is None:
+        return profile_parquet(path, sample_rows)
+    if suffix in CSV_SUFFIXES:
+        return profile_csv(path, sample_rows, CSV_SUFFIXES[suffix])
+    raise UnsupportedFormat(f"No profiler for {''.join(path.suffixes) or 'files without extension'}")
+
+
+# -------------------------------------------------------------------
+# Jobs
+#
+# A profile row is claimed ("queued" -> "running") with one UPDATE, so
+# the dataset worker and `flask profile-datasets` never run the same
+# file twice. Rows left "running" by a process that died are queued
+# again by recover_profiles(), or failed after DATASET_MAX_ATTEMPTS
+# runs.
+# -------------------------------------------------------------------
+
+def claim_profile(checksum: str) -> bool:
+    """
+    Mark a queued profile as running. False if another consumer got it
+    first.
+    """
+    claimed = (
+        DatasetProfile.query.filter_by(checksum=checksum, status="queued")
+        .update(
+            {
+                "status": "running",
+                "error": None,
+                "started_at": datetime.utcnow(),
+                "attempts": DatasetProfile.attempts + 1,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.session.commit()
+    return claimed == 1
+
+
+def claim_next_profile() -> Optional[str]:
+    """
+    Claim the oldest queued profile. Returns its checksum, or None when
+    there is none.
+    """
+    while True:
+        checksum = (
+            db.session.query(DatasetProfile.checksum)
+            .filter_by(status="queued")
+            .order_by(DatasetProfile.created_at)
+            .limit(1)
+            .scalar()
+        )
+        db.session.commit()   # end the read transaction
+        if checksum is None:
+            return None
+        if claim_profile(checksum):
+            return checksum
+
+
+def recover_profiles(stale_after: Optional[float] = None) -> Dict[str, int]:
+    """
+    Profiles left running by a process that died: queue them again, or
+    fail them after DATASET_MAX_ATTEMPTS runs. Without stale_after every
+    running row counts (call when no dataset worker is running);
+    otherwise only rows started more than stale_after seconds ago.
+    """
+    max_attempts = current_app.config.get("DATASET_MAX_ATTEMPTS", 3)
+    query = DatasetProfile.query.filter_by(status="running")
+    if stale_after is not None:
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+        query = query.filter(DatasetProfile.started_at < cutoff)
+
+    counts = {"requeued": 0, "failed": 0}
+    for profile in query.all():
+        if profile.attempts >= max_attempts:
+            profile.status = "failed"
+            profile.error = f"Profiler stopped while profiling ({profile.attempts} attempts)"
+            profile.profiled_at = datetime.utcnow()
+            counts["failed"] += 1
+        else:
+            profile.status = "queued"
+            profile.started_at = None
+            counts["requeued"] += 1
+    db.session.commit()
+    return counts
+
+
+def run_profile(checksum: str) -> Optional[DatasetProfile]:
+    """
+    Profile the file of a claimed (running) profile in the current app
+    context and store the result. The pages showing it are queued for
+    rebuild.
+    """
+    profile = db.session.get(DatasetProfile, checksum)
+    if profile is None:
+        return None
+
+    dataset = Dataset.query.filter_by(checksum=checksum).first()
+    path = dataset_path(dataset.download_url) if dataset is not None else None
+
+    t0 = time.perf_counter()
+    try:
+        if path is None or not path.exists():
+            raise FileNotFoundError(f"No stored file with checksum {checksum}")
+        with track("dataset_profile"):
+            result = profile_file(path, current_app.config.get("DATASET_SAMPLE_ROWS", 5))
+    except UnsupportedFormat as exc:
+        profile.status = "unsupported"
+        profile.error = str(exc)
+    except Exception:
+        db.session.rollback()
+        profile.status = "failed"
+        profile.error = traceback.format_exc()
+        current_app.logger.exception("Profiling dataset %s failed", checksum)
+    else:
+        profile.status = "done"
+        profile.format = result["format"]
+        profile.row_count = result["row_count"]
+        profile.columns = json.dumps(result["columns"])
+        profile.sample = json.dumps(result["sample"])
+
+    profile.profiled_at = datetime.utcnow()
+    profile.duration_ms = int((time.perf_counter() - t0) * 1000)
+    db.session.commit()
+
+    flush_queue()
+    schedule_variants(checksum)
+    return profile
+
+
+def schedule_profile(dataset: Dataset) -> None:
+    """
+    Queue a profile of the dataset's file, unless the file already has
+    one (same bytes uploaded before); the dataset worker runs it. Call
+    after commit.
+    """
+    if not dataset.checksum or db.session.get(DatasetProfile, dataset.checksum) is not None:
+        return
+
+    db.session.add(DatasetProfile(checksum=dataset.checksum, status="queued"))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # a concurrent upload of the same bytes queued it first
+        db.session.rollback()
+        return
+
+    if not current_app.config.get("DATASET_PROFILE_ASYNC", True):
+        if claim_profile(dataset.checksum):
+            run_profile(dataset.checksum)
+
+
+@click.command("profile-datasets")
+@click.option("--failed", is_flag=True, help="Also retry failed profiles.")
+@with_appcontext
+def profile_datasets_command(failed: bool) -> None:
+    """Profile every dataset file that has no profile yet (inline)."""
+    # rows of a dataset worker that died without anyone restarting it
+    counts = recover_profiles(current_app.config.get("DATASET_STALE_AFTER", 6 * 3600))
+    if counts["requeued"] or counts["failed"]:
+        click.echo(f"recovered: {counts['requeued']} requeued, {counts['failed']} failed")
+
+    checksums = {
+        c for (c,) in db.session.query(Dataset.checksum).filter(Dataset.checksum.isnot(None))
+    }
+    existing = {p.checksum: p for p in DatasetProfile.query.all()}
+
+    todo = []
+    for checksum in sorted(checksums):
+        profile = existing.get(checksum)
+        if profile is None:
+            db.session.add(DatasetProfile(checksum=checksum, status="queued"))
+        elif failed and profile.status == "failed":
+            profile.status = "queued"
+            profile.attempts = 0
+        elif profile.status != "queued":
+            continue
+        todo.append(checksum)
+    db.session.commit()
+
+    done = 0
+    for checksum in todo:
+        if not claim_profile(checksum):
+            continue   # the dataset worker got it first
+        profile = run_profile(checksum)
+        done += 1
+        click.echo(f"{checksum[:16]}  {profile.status}  "
+                   f"{profile.row_count if profile.row_count is not None else '-'} rows")
+    click.echo(f"profiled {done} file(s)")
+
+
+def init_app(app: Flask) -> None:
+    app.cli.add_command(profile_datasets_command)
@@ -0,0 +1,423 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+import csv
+import gzip
+import os
+import shutil
+import time
+import traceback
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+from sqlalchemy.exc import IntegrityError
+
+import publisher
+from builder.queue import flush_queue
+from dataset_formats import (
+    CHUNK_BYTES, CSV_SUFFIXES, NULL_TOKENS, PARQUET_SUFFIXES,
+    open_binary, open_text, split_suffixes,
+)
+from db import db
+from metrics import track
+from models.dataset import Dataset
+from models.dataset_profile import DatasetProfile
+from models.dataset_variant import DatasetVariant
+from uploads import TMP_DIR, HashingFile, dataset_path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# -------------------------------------------------------------------
+# Dataset variants
+#
+# Smaller downloads of a stored dataset file, written next to it:
+#
+#   uploads/datasets/<addr>/data.csv            original
+#   uploads/datasets/<addr>/data.csv.gz         gzip     (any client)
+#   uploads/datasets/<addr>/data.csv.zst        zstd     (zstandard)
+#   uploads/datasets/<addr>/data.parquet        Parquet  (pyarrow, CSV only)
+#
+# Scheduled once the file is profiled (dataset_profiler.py), one queued
+# dataset_variant row per variant, run by the dataset worker
+# (dataset_worker.py), never in gunicorn. Every variant streams: the
+# compressors copy CHUNK_BYTES at a time, the Parquet writer converts
+# one CSV block (CSV_BLOCK_BYTES) per row group, with the column types
+# the profiler inferred. Output goes through a HashingFile, so its
+# size and SHA-256 come for free.
+#
+# A compressed variant that is not smaller than the original is
+# dropped (status "skipped"). Finished variants are published like
+# the original and listed under it on function and pipeline pages.
+# Variants of already-compressed files (.gz, .parquet, ...) are not
+# made. `flask transcode-datasets` backfills older uploads.
+# -------------------------------------------------------------------
+
+VARIANT_SUFFIX = {
+    "gzip": ".gz",
+    "zstd": ".zst",
+    "parquet": ".parquet",
+}
+
+# CSV bytes per Parquet row group
+CSV_BLOCK_BYTES = 32 << 20
+
+# Profiler dtype -> Arrow type factory. "datetime" is left to Arrow's
+# own inference, which also handles time zone suffixes.
+ARROW_TYPES = {
+    "int64": "int64",
+    "float64": "float64",
+    "bool": "bool_",
+    "date": "date32",
+    "string": "string",
+    "null": "string",
+}
+
+
+def variant_kinds(path: Path) -> List[str]:
+    """
+    Variants worth making of a file, among those available here.
+    """
+    suffix, compression = split_suffixes(path)
+    kinds = []
+    if compression is None and suffix not in PARQUET_SUFFIXES:
+        kinds.append("gzip")
+        if zstandard is not None:
+            kinds.append("zstd")
+    if suffix in CSV_SUFFIXES and pa is not None:
+        kinds.append("parquet")
+    return kinds
+
+
+def variant_name(path: Path, kind: str) -> str:
+    if kind != "parquet":
+        return path.name + VARIANT_SUFFIX[kind]
+    suffix, compression = split_suffixes(path)
+    stem = path.name[:len(path.name) - len(suffix) - len(compression or "")]
+    return stem + VARIANT_SUFFIX[kind]
+
+
+# -------------------------------------------------------------------
+# Transcoders: source path -> HashingFile
+# -------------------------------------------------------------------
+
+def _gzip(path: Path, out: HashingFile, config) -> None:
+    level = config.get("DATASET_GZIP_LEVEL", 6)
+    with open(path, "rb") as src:
+        # mtime=0: same bytes in, same variant (and checksum) out
+        with gzip.GzipFile(filename=path.name, mode="wb", fileobj=out,
+                           compresslevel=level, mtime=0) as dst:
+            shutil.copyfileobj(src, dst, CHUNK_BYTES)
+
+
+def _zstd(path: Path, out: HashingFile, config) -> None:
+    cctx = zstandard.ZstdCompressor(level=config.get("DATASET_ZSTD_LEVEL", 10))
+    with open(path, "rb") as src:
+        with cctx.stream_writer(out, size=path.stat().st_size, closefd=False) as dst:
+            shutil.copyfileobj(src, dst, CHUNK_BYTES)
+
+
+def _delimiter(path: Path) -> str:
+    delimiter = CSV_SUFFIXES.get(split_suffixes(path)[0])
+    if delimiter is not None:
+        return delimiter
+    with open_text(path) as f:
+        try:
+            return csv.Sniffer().sniff(f.read(64 * 1024), delimiters=",;\t|").delimiter
+        except csv.Error:
+            return ","
+
+
+def _column_types(checksum: str) -> dict:
+    profile = db.session.get(DatasetProfile, checksum)
+    if profile is None or profile.status != "done":
+        return {}
+    return {
+        column["name"]: getattr(pa, ARROW_TYPES[column["dtype"]])()
+        for column in profile.column_list()
+        if column["dtype"] in ARROW_TYPES
+    }
+
+
+def _parquet(path: Path, out: HashingFile, config, column_types: dict) -> None:
+    nulls = sorted({v for t in NULL_TOKENS for v in (t, t.upper(), t.capitalize())})
+    codec = config.get("DATASET_PARQUET_COMPRESSION", "zstd")
+    with open_binary(path) as src:
+        reader = pa_csv.open_csv(
+            src,
+            read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_BYTES),
+            parse_options=pa_csv.ParseOptions(delimiter=_delimiter(path)),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=column_types,
+                null_values=nulls,
+                strings_can_be_null=True,
+                true_values=["true", "True", "TRUE"],
+                false_values=["false", "False", "FALSE"],
+            ),
+        )
+        with pq.ParquetWriter(out, reader.schema, compression=codec) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+
+
+# -------------------------------------------------------------------
+# Jobs
+#
+# Claimed and recovered like profiles (dataset_profiler.py): one
+# UPDATE moves a row from "queued" to "running", and rows left running
+# by a process that died are queued again, or failed after
+# DATASET_MAX_ATTEMPTS runs.
+# -------------------------------------------------------------------
+
+def claim_variant(variant_id: int) -> bool:
+    """
+    Mark a queued variant as running. False if another consumer got it
+    first.
+    """
+    claimed = (
+        DatasetVariant.query.filter_by(id=variant_id, status="queued")
+        .update(
+            {
+                "status": "running",
+                "error": None,
+                "started_at": datetime.utcnow(),
+                "attempts": DatasetVariant.attempts + 1,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.session.commit()
+    return claimed == 1
+
+
+def claim_next_variant() -> Optional[int]:
+    """
+    Claim the oldest queued variant. Returns its id, or None when there
+    is none.
+    """
+    while True:
+        variant_id = (
+            db.session.query(DatasetVariant.id)
+            .filter_by(status="queued")
+            .order_by(DatasetVariant.id)
+            .limit(1)
+            .scalar()
+        )
+        db.session.commit()   # end the read transaction
+        if variant_id is None:
+            return None
+        if claim_variant(variant_id):
+            return variant_id
+
+
+def recover_variants(stale_after: Optional[float] = None) -> Dict[str, int]:
+    """
+    Variants left running by a process that died: queue them again, or
+    fail them after DATASET_MAX_ATTEMPTS runs. Without stale_after every
+    running row counts (call when no dataset worker is running);
+    otherwise only rows started more than stale_after seconds ago.
+    """
+    max_attempts = current_app.config.get("DATASET_MAX_ATTEMPTS", 3)
+    query = DatasetVariant.query.filter_by(status="running")
+    if stale_after is not None:
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+        query = query.filter(DatasetVariant.started_at < cutoff)
+
+    counts = {"requeued": 0, "failed": 0}
+    for variant in query.all():
+        if variant.attempts >= max_attempts:
+            variant.status = "failed"
+            variant.error = f"Transcoder stopped while transcoding ({variant.attempts} attempts)"
+            variant.finished_at = datetime.utcnow()
+            counts["failed"] += 1
+        else:
+            variant.status = "queued"
+            variant.started_at = None
+            counts["requeued"] += 1
+    db.session.commit()
+    return counts
+
+
+def _source(checksum: str):
+    dataset = Dataset.query.filter_by(checksum=checksum).first()
+    if dataset is None:
+        return None, None
+    return dataset, dataset_path(dataset.download_url)
+
+
+def run_variant(variant_id: int) -> Optional[DatasetVariant]:
+    """
+    Produce one claimed (running) variant in the current app context
+    and store it.
+    """
+    variant = db.session.get(DatasetVariant, variant_id)
+    if variant is None:
+        return None
+
+    dataset, path = _source(variant.source_checksum)
+    kind = variant.kind
+
+    config = current_app.config
+    t0 = time.perf_counter()
+    out = HashingFile(
+        Path(current_app.root_path) / config.get("UPLOAD_TMP_DIR", TMP_DIR),
+        config.get("DATASET_MAX_BYTES", 1 << 34),
+    )
+    try:
+        if path is None or not path.exists():
+            raise FileNotFoundError(f"No stored file with checksum {variant.source_checksum}")
+
+        with track("dataset_variant"):
+            if kind == "gzip":
+                _gzip(path, out, config)
+            elif kind == "zstd":
+                _zstd(path, out, config)
+            else:
+                _parquet(path, out, config, _column_types(variant.source_checksum))
+            if not out.closed:
+                out.flush()
+
+        if kind != "parquet" and out.size >= path.stat().st_size:
+            variant.status = "skipped"
+            variant.error = f"{out.size} bytes, not smaller than the original"
+        elif db.session.query(Dataset.id).filter_by(checksum=variant.source_checksum).first() is None:
+            # source deleted meanwhile (its variant rows went with it)
+            return None
+        else:
+            dest = path.with_name(variant_name(path, kind))
+            os.replace(out.path, dest)
+            out.kept = True
+
+            variant.status = "done"
+            variant.download_url = dataset.download_url.rsplit("/", 1)[0] + "/" + dest.name
+            variant.size_bytes = out.size
+            variant.checksum = out.hexdigest()
+    except Exception:
+        db.session.rollback()
+        variant.status = "failed"
+        variant.error = traceback.format_exc()
+        current_app.logger.exception("Dataset variant %s (%s) failed", variant_id, kind)
+    finally:
+        out.close()
+
+    variant.finished_at = datetime.utcnow()
+    variant.duration_ms = int((time.perf_counter() - t0) * 1000)
+    db.session.commit()
+
+    flush_queue()
+    if variant.status == "done":
+        publisher.publish(variant.download_url)
+    return variant
+
+
+def _add_variants(checksum: str) -> List[DatasetVariant]:
+    _, path = _source(checksum)
+    if path is None or not path.exists():
+        return []
+
+    existing = {
+        kind for (kind,) in
+        db.session.query(DatasetVariant.kind).filter_by(source_checksum=checksum)
+    }
+    variants = [
+        DatasetVariant(source_checksum=checksum, kind=kind, status="queued")
+        for kind in variant_kinds(path)
+        if kind not in existing
+    ]
+    if not variants:
+        return []
+
+    db.session.add_all(variants)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # scheduled concurrently (same bytes uploaded twice)
+        db.session.rollback()
+        return []
+    return variants
+
+
+def schedule_variants(checksum: str) -> List[DatasetVariant]:
+    """
+    Queue the variants a stored file does not have yet; the dataset
+    worker makes them. Call after commit.
+    """
+    variants = _add_variants(checksum)
+    if current_app.config.get("DATASET_VARIANT_ASYNC", True):
+        return variants
+
+    ids = [v.id for v in variants]
+    return [run_variant(i) for i in ids if claim_variant(i)]
+
+
+def drop_variants(checksum: str) -> List[str]:
+    """
+    Delete the variant files and rows of a source file. The caller
+    commits, then unpublishes the returned download URLs.
+    """
+    urls = []
+    for variant in DatasetVariant.query.filter_by(source_checksum=checksum).all():
+        if variant.download_url:
+            path = dataset_path(variant.download_url)
+            if path is not None:
+                path.unlink(missing_ok=True)
+            urls.append(variant.download_url)
+        db.session.delete(variant)
+    return urls
+
+
+@click.command("transcode-datasets")
+@click.option("--failed", is_flag=True, help="Also retry failed variants.")
+@with_appcontext
+def transcode_datasets_command(failed: bool) -> None:
+    """Make the missing download variants of every dataset (inline)."""
+    # rows of a dataset worker that died without anyone restarting it
+    counts = recover_variants(current_app.config.get("DATASET_STALE_AFTER", 6 * 3600))
+    if counts["requeued"] or counts["failed"]:
+        click.echo(f"recovered: {counts['requeued']} requeued, {counts['failed']} failed")
+
+    if failed:
+        DatasetVariant.query.filter_by(status="failed").update(
+            {"status": "queued", "attempts": 0}, synchronize_session=False,
+        )
+        db.session.commit()
+
+    checksums = sorted({
+        c for (c,) in db.session.query(Dataset.checksum).filter(Dataset.checksum.isnot(None))
+    })
+    for checksum in checksums:
+        _add_variants(checksum)
+
+    todo = [
+        i for (i,) in
+        db.session.query(DatasetVariant.id)
+        .filter(DatasetVariant.status == "queued", DatasetVariant.source_checksum.in_(checksums))
+        .order_by(DatasetVariant.id)
+    ]
+    db.session.commit()
+
+    made = 0
+    for variant_id in todo:
+        if not claim_variant(variant_id):
+            continue   # the dataset worker got it first
+        variant = run_variant(variant_id)
+        if variant is None:
+            continue
+        made += 1
+        size = variant.size_bytes if variant.size_bytes is not None else "-"
+        click.echo(f"{variant.source_checksum[:16]}  {variant.kind:<8} {variant.status:<8} {size}")
+    click.echo(f"transcoded {made} variant(s)")
+
+
+def init_app(app: Flask) -> None:
+    app.cli.add_command(transcode_datasets_command)
@@ -0,0 +1,118 @@
+from typing import Callable, Optional
+import signal
+import time
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+import publisher
+from dataset_profiler import claim_next_profile, recover_profiles, run_profile
+from dataset_variants import claim_next_variant, recover_variants, run_variant
+from db import db
+
+# -------------------------------------------------------------------
+# Dataset worker
+#
+# Dataset jobs (profiles, dataset_profiler.py, then download variants,
+# dataset_variants.py) run in their own process,
+# `flask dataset-worker`, next to gunicorn, like the build worker:
+# uploads only record queued rows, and this loop claims them one at a
+# time. A long profile then never holds the GIL of a web worker, and
+# the queue survives gunicorn restarts. Profiles go first: the Parquet
+# variant of a CSV uses the column types of its profile.
+#
+# When the worker starts, rows left "running" by a worker that died
+# are queued again, or failed once they have been tried
+# DATASET_MAX_ATTEMPTS times, and static/datasets/ is reconciled with
+# uploads/datasets/ (publisher.py). Publishes a web worker scheduled
+# but did not live to run are picked up every DATASET_PUBLISH_SWEEP
+# seconds.
+#
+# Config:
+#   DATASET_POLL_INTERVAL  seconds between polls of an empty queue
+#   DATASET_MAX_ATTEMPTS   runs of one job before it is failed
+#   DATASET_PUBLISH_SWEEP  seconds between checks for due publishes
+# -------------------------------------------------------------------
+
+
+def recover() -> dict:
+    """
+    Requeue (or fail) the jobs of a worker that died. Call when no
+    other dataset worker is running.
+    """
+    return {"profiles": recover_profiles(), "variants": recover_variants()}
+
+
+def work_next(on_job: Optional[Callable[[str, object], None]] = None) -> bool:
+    """
+    Claim and run one queued job. False when the queue is empty.
+    """
+    checksum = claim_next_profile()
+    if checksum is not None:
+        profile = run_profile(checksum)
+        if profile is not None and on_job is not None:
+            on_job(f"profile {checksum[:16]}", profile)
+        return True
+
+    variant_id = claim_next_variant()
+    if variant_id is not None:
+        variant = run_variant(variant_id)
+        if variant is not None and on_job is not None:
+            on_job(f"variant {variant.source_checksum[:16]} {variant.kind}", variant)
+        return True
+
+    return False
+
+
+def work(
+    should_stop: Callable[[], bool],
+    on_job: Optional[Callable[[str, object], None]] = None,
+) -> None:
+    """
+    Consumer loop: run queued jobs until should_stop() says so (checked
+    between jobs, so a job in progress is finished first).
+    """
+    app = current_app._get_current_object()
+    poll = app.config.get("DATASET_POLL_INTERVAL", 1.0)
+    sweep = app.config.get("DATASET_PUBLISH_SWEEP", 60.0)
+    swept = time.monotonic()
+    while not should_stop():
+        if time.monotonic() - swept >= sweep:
+            publisher.publish_due(app)
+            swept = time.monotonic()
+        if not work_next(on_job):
+            time.sleep(poll)
+        # don't keep the job's objects (or a connection) between jobs
+        db.session.remove()
+
+
+@click.command("dataset-worker")
+@with_appcontext
+def dataset_worker_command() -> None:
+    """Run queued dataset jobs (profiles, variants) until stopped."""
+    for kind, counts in recover().items():
+        if counts["requeued"] or counts["failed"]:
+            click.echo(f"recovered {kind}: {counts['requeued']} requeued, {counts['failed']} failed")
+    published, removed, failed = publisher.reconcile(current_app._get_current_object())
+    if published or removed or failed:
+        click.echo(f"datasets: published {published}, removed {removed}, failed {failed}")
+
+    stopping = []
+
+    def stop(signum, frame):
+        # finish the job in progress, then exit
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    def report(job: str, row) -> None:
+        click.echo(f"{job}: {row.status} in {row.duration_ms} ms")
+
+    click.echo("dataset worker ready")
+    work(lambda: bool(stopping), report)
+
+
+def init_app(app: Flask) -> None:
+    app.cli.add_command(dataset_worker_command)
@@ -0,0 +1,323 @@
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List
+import threading
+import time
+
+from flask import Flask, current_app, g, has_app_context, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+from db import db
+
+# -------------------------------------------------------------------
+# Request / build instrumentation
+#
+# Every HTTP request and every build job gets a Scope on flask.g. The
+# SQLAlchemy cursor hooks count and time each statement into the
+# current scope, and log statements slower than SLOW_QUERY_MS. When the
+# scope ends, its wall time and query count go into a rolling window
+# (METRICS_WINDOW samples) per endpoint.
+#
+# Pool checkouts are tracked too, to compare peak usage with the
+# configured pool_size / max_overflow.
+#
+# Everything is per process: each gunicorn worker reports its own
+# numbers. Read them with snapshot() (admin dashboard) or
+# prometheus_text() (/admin/metrics).
+# -------------------------------------------------------------------
+
+
+class Scope:
+    """
+    Counters of one request or build job.
+    """
+
+    __slots__ = ("name", "started", "queries", "query_ms")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_ms = 0.0
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+class EndpointStats:
+    """
+    Rolling window of one endpoint, plus lifetime totals.
+    """
+
+    def __init__(self, window: int) -> None:
+        self.durations: Deque[float] = deque(maxlen=window)
+        self.queries: Deque[int] = deque(maxlen=window)
+        self.count = 0
+        self.total_ms = 0.0
+        self.total_queries = 0
+
+    def add(self, duration_ms: float, queries: int) -> None:
+        self.durations.append(duration_ms)
+        self.queries.append(queries)
+        self.count += 1
+        self.total_ms += duration_ms
+        self.total_queries += queries
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.window = 500
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.slow_queries = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+
+    def observe(self, scope: Scope, duration_ms: float) -> None:
+        with self._lock:
+            stats = self.endpoints.get(scope.name)
+            if stats is None:
+                stats = self.endpoints[scope.name] = EndpointStats(self.window)
+            stats.add(duration_ms, scope.queries)
+
+    def slow_query(self) -> None:
+        with self._lock:
+            self.slow_queries += 1
+
+    def checkout(self) -> None:
+        with self._lock:
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def checkin(self) -> None:
+        with self._lock:
+            self.checked_out -= 1
+
+    def endpoint_rows(self) -> List[dict]:
+        with self._lock:
+            items = [
+                (name, sorted(s.durations), list(s.queries), s.count, s.total_ms, s.total_queries)
+                for name, s in self.endpoints.items()
+            ]
+
+        rows = []
+        for name, durations, queries, count, total_ms, total_queries in sorted(items):
+            rows.append({
+                "endpoint": name,
+                "count": count,
+                "total_ms": total_ms,
+                "total_queries": total_queries,
+                "p50_ms": _percentile(durations, 0.50),
+                "p95_ms": _percentile(durations, 0.95),
+                "avg_queries": sum(queries) / len(queries) if queries else 0.0,
+                "max_queries": max(queries, default=0),
+            })
+        return rows
+
+
+REGISTRY = Registry()
+
+
+# -------------------------------------------------------------------
+# Scopes
+# -------------------------------------------------------------------
+
+def current_scope():
+    if not has_app_context():
+        return None
+    return g.get("metrics_scope")
+
+
+@contextmanager
+def track(name: str) -> Iterator[Scope]:
+    """
+    Record the enclosed block as one sample of <name> (build jobs, CLI).
+    Nested in a request (inline builds...), the request's scope comes
+    back afterwards, with the block's queries added to it.
+    """
+    parent = g.get("metrics_scope")
+    g.metrics_scope = scope = Scope(name)
+    try:
+        yield scope
+    finally:
+        if parent is None:
+            g.pop("metrics_scope", None)
+        else:
+            parent.queries += scope.queries
+            parent.query_ms += scope.query_ms
+            g.metrics_scope = parent
+        REGISTRY.observe(scope, scope.elapsed_ms())
+
+
+def _start_request() -> None:
+    g.metrics_scope = Scope(request.endpoint or "<unmatched>")
+
+
+def _finish_request(response):
+    scope = g.pop("metrics_scope", None)
+    if scope is None:
+        return response
+
+    duration_ms = scope.elapsed_ms()
+    REGISTRY.observe(scope, duration_ms)
+
+    # timings tell visitors about the backend: admins only, unless enabled
+    if not (current_app.config.get("METRICS_SERVER_TIMING") or current_user.is_authenticated):
+        return response
+    response.headers["Server-Timing"] = (
+        f"app;dur={duration_ms:.1f}, "
+        f'db;dur={scope.query_ms:.1f};desc="{scope.queries} queries"'
+    )
+    return response
+
+
+# -------------------------------------------------------------------
+# SQLAlchemy hooks
+# -------------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+
+    scope = current_scope()
+    if scope is not None:
+        scope.queries += 1
+        scope.query_ms += elapsed_ms
+
+    if has_app_context() and elapsed_ms >= current_app.config.get("SLOW_QUERY_MS", 100):
+        REGISTRY.slow_query()
+        current_app.logger.warning(
+            "Slow query (%.0f ms, %s): %s",
+            elapsed_ms,
+            scope.name if scope is not None else "-",
+            " ".join(statement.split())[:500],
+        )
+
+
+def _handle_error(context):
+    # after_cursor_execute does not run for failed statements
+    conn = context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+    REGISTRY.checkout()
+
+
+def _checkin(dbapi_connection, connection_record):
+    REGISTRY.checkin()
+
+
+# -------------------------------------------------------------------
+# Reports
+# -------------------------------------------------------------------
+
+def pool_status() -> dict:
+    """
+    Current pool usage of this process against the configured limits.
+    """
+    options = current_app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+    pool = db.engine.pool
+
+    return {
+        "pool_size": options.get("pool_size", 5),
+        "max_overflow": options.get("max_overflow", 10),
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else REGISTRY.checked_out,
+        "overflow": max(pool.overflow(), 0) if hasattr(pool, "overflow") else 0,
+        "peak_checked_out": REGISTRY.peak_checked_out,
+    }
+
+
+def snapshot() -> dict:
+    return {
+        "endpoints": REGISTRY.endpoint_rows(),
+        "pool": pool_status(),
+        "slow_queries": REGISTRY.slow_queries,
+        "slow_query_ms": current_app.config.get("SLOW_QUERY_MS", 100),
+        "window": REGISTRY.window,
+    }
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text() -> str:
+    """
+    snapshot() in the Prometheus text exposition format (version 0.0.4).
+    """
+    snap = snapshot()
+    lines = [
+        "# HELP visondf_request_duration_seconds Wall time per endpoint (rolling window quantiles).",
+        "# TYPE visondf_request_duration_seconds summary",
+    ]
+    for row in snap["endpoints"]:
+        ep = _label(row["endpoint"])
+        lines.append(f'visondf_request_duration_seconds{{endpoint="{ep}",quantile="0.5"}} {row["p50_ms"] / 1000:.6f}')
+        lines.append(f'visondf_request_duration_seconds{{endpoint="{ep}",quantile="0.95"}} {row["p95_ms"] / 1000:.6f}')
+        lines.append(f'visondf_request_duration_seconds_sum{{endpoint="{ep}"}} {row["total_ms"] / 1000:.6f}')
+        lines.append(f'visondf_request_duration_seconds_count{{endpoint="{ep}"}} {row["count"]}')
+
+    lines += [
+        "# HELP visondf_request_queries_total SQL statements run per endpoint.",
+        "# TYPE visondf_request_queries_total counter",
+    ]
+    for row in snap["endpoints"]:
+        lines.append(f'visondf_request_queries_total{{endpoint="{_label(row["endpoint"])}"}} {row["total_queries"]}')
+
+    pool = snap["pool"]
+    lines += [
+        "# HELP visondf_slow_queries_total Statements slower than SLOW_QUERY_MS.",
+        "# TYPE visondf_slow_queries_total counter",
+        f"visondf_slow_queries_total {snap['slow_queries']}",
+        "# HELP visondf_db_pool_checked_out Connections currently checked out.",
+        "# TYPE visondf_db_pool_checked_out gauge",
+        f"visondf_db_pool_checked_out {pool['checked_out']}",
+        "# HELP visondf_db_pool_overflow Connections open beyond pool_size.",
+        "# TYPE visondf_db_pool_overflow gauge",
+        f"visondf_db_pool_overflow {pool['overflow']}",
+        "# HELP visondf_db_pool_peak_checked_out Highest checked-out count since start.",
+        "# TYPE visondf_db_pool_peak_checked_out gauge",
+        f"visondf_db_pool_peak_checked_out {pool['peak_checked_out']}",
+        "# HELP visondf_db_pool_size Configured pool_size.",
+        "# TYPE visondf_db_pool_size gauge",
+        f"visondf_db_pool_size {pool['pool_size']}",
+        "# HELP visondf_db_pool_max_overflow Configured max_overflow.",
+        "# TYPE visondf_db_pool_max_overflow gauge",
+        f"visondf_db_pool_max_overflow {pool['max_overflow']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app: Flask) -> None:
+    """
+    Register the request hooks on app and the SQLAlchemy listeners
+    (once per process, on every Engine / Pool).
+    """
+    REGISTRY.window = app.config.get("METRICS_WINDOW", 500)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+    for target, name, fn in (
+        (Engine, "before_cursor_execute", _before_cursor_execute),
+        (Engine, "after_cursor_execute", _after_cursor_execute),
+        (Engine, "handle_error", _handle_error),
+        (Pool, "checkout", _checkout),
+        (Pool, "checkin", _checkin),
+    ):
+        if not event.contains(target, name, fn):
+            event.listen(target, name, fn)
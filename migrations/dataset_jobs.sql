@@ -0,0 +1,39 @@
+-- =========================================
+-- Upgrade: dataset jobs consumed by `flask dataset-worker`
+-- For databases whose dataset_profile / dataset_variant tables were
+-- created before the worker existed. Fresh installs get these columns from
+-- database_structure.sql and can skip this file.
+--
+-- Works on MySQL 8 and MariaDB: each step checks information_schema
+-- first, so the file can be run any number of times.
+--
+--   mysql -u df_user -p df_engine_site < migrations/dataset_jobs.sql
+-- =========================================
+
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'dataset_profile' AND COLUMN_NAME = 'attempts') = 0,
+    'ALTER TABLE dataset_profile ADD COLUMN attempts INT NOT NULL DEFAULT 0 AFTER duration_ms',
+    'DO 0');
+PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'dataset_profile' AND COLUMN_NAME = 'started_at') = 0,
+    'ALTER TABLE dataset_profile ADD COLUMN started_at DATETIME NULL AFTER created_at',
+    'DO 0');
+PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'dataset_variant' AND COLUMN_NAME = 'attempts') = 0,
+    'ALTER TABLE dataset_variant ADD COLUMN attempts INT NOT NULL DEFAULT 0 AFTER duration_ms',
+    'DO 0');
+PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'dataset_variant' AND COLUMN_NAME = 'started_at') = 0,
+    'ALTER TABLE dataset_variant ADD COLUMN started_at DATETIME NULL AFTER created_at',
+    'DO 0');
+PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
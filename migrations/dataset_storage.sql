@@ -0,0 +1,45 @@
+-- =========================================
+-- Upgrade: content-addressed dataset storage
+-- For databases created before dataset.checksum existed. Fresh installs
+-- get these columns from database_structure.sql and can skip this file.
+--
+-- Works on MySQL 8 and MariaDB: each step checks information_schema
+-- first, so the file can be run any number of times.
+--
+--   mysql -u df_user -p df_engine_site < migrations/dataset_storage.sql
+-- =========================================
+
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'dataset' AND COLUMN_NAME = 'checksum') = 0,
+    'ALTER TABLE dataset ADD COLUMN checksum CHAR(64) NULL AFTER download_url',
+    'DO 0');
+PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'dataset' AND COLUMN_NAME = 'size_bytes') = 0,
+    'ALTER TABLE dataset ADD COLUMN size_bytes BIGINT NULL AFTER checksum',
+    'DO 0');
+PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'dataset' AND COLUMN_NAME = 'published_at') = 0,
+    'ALTER TABLE dataset ADD COLUMN published_at DATETIME NULL AFTER size_bytes',
+    'DO 0');
+PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'dataset' AND COLUMN_NAME = 'publish_error') = 0,
+    'ALTER TABLE dataset ADD COLUMN publish_error TEXT NULL AFTER published_at',
+    'DO 0');
+PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+SET @sql = IF(
+    (SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'dataset' AND INDEX_NAME = 'idx_dataset_checksum') = 0,
+    'ALTER TABLE dataset ADD INDEX idx_dataset_checksum (checksum)',
+    'DO 0');
+PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
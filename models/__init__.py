@@ -1,4 +1,6 @@
 from .dataset import Dataset
+from .dataset_profile import DatasetProfile
+from .dataset_variant import DatasetVariant
 from .function_family import FunctionFamily
 from .function_impl import FunctionImpl
 from .benchmark import Benchmark
@@ -7,17 +9,25 @@ from .get_started import GetStarted
 from .pipeline_dataset import PipelineDataset
 from .pipeline import Pipeline
 from .admin_user import AdminUser
+from .build_page import BuildPage
+from .build_job import BuildJob
+from .build_profile import BuildProfile
 
 __all__ = [
     "AdminUser"
     "Dataset",
+    "DatasetProfile",
+    "DatasetVariant",
     "FunctionFamily",
     "FunctionImpl",
     "Benchmark",
     "BenchmarkDataset",
     "GetStarted",
     "PipelineDataset",
-    "Pipeline"
+    "Pipeline",
+    "BuildPage",
+    "BuildJob",
+    "BuildProfile",
 ]
 
 
@@ -0,0 +1,46 @@
+import json
+
+from db import db
+
+class BuildJob(db.Model):
+    __tablename__ = "build_job"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    status = db.Column(
+        db.Enum("queued", "running", "done", "failed", name="build_job_status"),
+        nullable=False,
+        default="queued",
+    )
+
+    # JSON list of page targets, e.g. [["function_doc", 3], ["get_started"]]
+    targets = db.Column(db.Text, nullable=False)
+
+    pages_rendered = db.Column(db.Integer, nullable=False, default=0)
+    pages_changed  = db.Column(db.Integer, nullable=False, default=0)
+    bytes_saved    = db.Column(db.BigInteger, nullable=False, default=0)
+    attempts       = db.Column(db.Integer, nullable=False, default=0)  # runs claimed by a worker
+    generation     = db.Column(db.String(32))   # site/generations/<id>, if published
+    error          = db.Column(db.Text)
+
+    created_at  = db.Column(db.DateTime, server_default=db.func.current_timestamp())
+    started_at  = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Integer)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "targets": json.loads(self.targets),
+            "pages_rendered": self.pages_rendered,
+            "pages_changed": self.pages_changed,
+            "bytes_saved": self.bytes_saved,
+            "generation": self.generation,
+            "attempts": self.attempts,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,12 @@
+from db import db
+
+class BuildPage(db.Model):
+    __tablename__ = "build_page"
+
+    # Output path relative to builds/, e.g. "docs/function_doc/3/index.html"
+    path         = db.Column(db.String(255), primary_key=True)
+    url          = db.Column(db.String(512), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+
+    # Last time the rendered bytes actually changed (drives <lastmod>)
+    lastmod      = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,36 @@
+import json
+
+from db import db
+
+class BuildProfile(db.Model):
+    __tablename__ = "build_profile"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # "job" (background worker) or "build-site" (CLI)
+    source = db.Column(db.String(32), nullable=False)
+    job_id = db.Column(
+        db.Integer,
+        db.ForeignKey("build_job.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+
+    pages         = db.Column(db.Integer, nullable=False, default=0)
+    pages_changed = db.Column(db.Integer, nullable=False, default=0)
+
+    # Summed over every page, in ms
+    query_ms  = db.Column(db.Integer, nullable=False, default=0)
+    render_ms = db.Column(db.Integer, nullable=False, default=0)
+    stage_ms  = db.Column(db.Integer, nullable=False, default=0)
+    write_ms  = db.Column(db.Integer, nullable=False, default=0)
+    post_ms   = db.Column(db.Integer, nullable=False, default=0)
+
+    bytes = db.Column(db.BigInteger, nullable=False, default=0)
+
+    # JSON: per template, per stage, per post-build step, slowest pages
+    details = db.Column(db.Text, nullable=False)
+
+    created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp())
+
+    def detail(self) -> dict:
+        return json.loads(self.details)
@@ -8,11 +8,32 @@ class Dataset(db.Model):
     version      = db.Column(db.String(32), nullable=False)
     description  = db.Column(db.Text)
     download_url = db.Column(db.String(512))
+    checksum     = db.Column(db.String(64), index=True)  # SHA-256 of the file
+    size_bytes   = db.Column(db.BigInteger)
+
+    # Set by the dataset publisher (publisher.py)
+    published_at  = db.Column(db.DateTime)
+    publish_error = db.Column(db.Text)
     created_at   = db.Column(
         db.DateTime,
         server_default=db.func.current_timestamp()
     )
 
+    # Shared by every dataset with the same file (no FK: the profile
+    # may not exist yet)
+    profile = db.relationship(
+        "DatasetProfile",
+        primaryjoin="Dataset.checksum == foreign(DatasetProfile.checksum)",
+        uselist=False,
+        viewonly=True,
+    )
+    variants = db.relationship(
+        "DatasetVariant",
+        primaryjoin="Dataset.checksum == foreign(DatasetVariant.source_checksum)",
+        order_by="DatasetVariant.size_bytes",
+        viewonly=True,
+    )
+
     __table_args__ = (
         db.UniqueConstraint("name", "version", name="uq_dataset_name_version"),
     )
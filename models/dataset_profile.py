@@ -0,0 +1,42 @@
+import json
+
+from db import db
+
+class DatasetProfile(db.Model):
+    """
+    Schema, row count, null counts and head sample of a dataset file,
+    computed in the background by dataset_profiler.py. Keyed by the
+    file's SHA-256, so datasets sharing a file share its profile.
+    """
+    __tablename__ = "dataset_profile"
+
+    checksum = db.Column(db.String(64), primary_key=True)
+
+    status = db.Column(
+        db.Enum("queued", "running", "done", "failed", "unsupported",
+                name="dataset_profile_status"),
+        nullable=False,
+        default="queued",
+    )
+
+    format    = db.Column(db.String(16))   # "csv", "parquet"
+    row_count = db.Column(db.BigInteger)
+
+    # JSON: [{"name": ..., "dtype": ..., "nulls": ...}, ...]
+    columns = db.Column(db.Text)
+    # JSON: list of head rows, values as short strings
+    sample  = db.Column(db.Text)
+
+    error       = db.Column(db.Text)
+    duration_ms = db.Column(db.Integer)
+    attempts    = db.Column(db.Integer, nullable=False, default=0)  # runs claimed by a worker
+
+    created_at  = db.Column(db.DateTime, server_default=db.func.current_timestamp())
+    started_at  = db.Column(db.DateTime)
+    profiled_at = db.Column(db.DateTime)
+
+    def column_list(self):
+        return json.loads(self.columns or "[]")
+
+    def sample_rows(self):
+        return json.loads(self.sample or "[]")
@@ -0,0 +1,40 @@
+from db import db
+
+class DatasetVariant(db.Model):
+    """
+    Transcoded copy of a dataset file (gzip, zstd or Parquet), produced
+    by the dataset worker (dataset_variants.py). Like DatasetProfile it
+    belongs to the source file, not to a dataset row.
+    """
+    __tablename__ = "dataset_variant"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    source_checksum = db.Column(db.String(64), nullable=False, index=True)
+    kind = db.Column(
+        db.Enum("gzip", "zstd", "parquet", name="dataset_variant_kind"),
+        nullable=False,
+    )
+
+    status = db.Column(
+        db.Enum("queued", "running", "done", "failed", "skipped",
+                name="dataset_variant_status"),
+        nullable=False,
+        default="queued",
+    )
+
+    download_url = db.Column(db.String(500))
+    size_bytes   = db.Column(db.BigInteger)
+    checksum     = db.Column(db.String(64))   # SHA-256 of the variant itself
+
+    error       = db.Column(db.Text)
+    duration_ms = db.Column(db.Integer)
+    attempts    = db.Column(db.Integer, nullable=False, default=0)  # runs claimed by a worker
+
+    created_at  = db.Column(db.DateTime, server_default=db.func.current_timestamp())
+    started_at  = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint("source_checksum", "kind", name="uq_dataset_variant_kind"),
+    )
@@ -0,0 +1,271 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import os
+import shutil
+import threading
+import time
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+from db import db
+from models.dataset import Dataset
+from uploads import DATASETS_DIR, DATASETS_URL
+
+# -------------------------------------------------------------------
+# Dataset publisher
+#
+# Makes uploads/datasets/<rel> visible as static/datasets/<rel>, one
+# file at a time:
+#   publish    hardlink (copy across filesystems) to a temp name in
+#              the public directory, then rename over the target:
+#              readers see the old file or the new one, never half
+#   unpublish  remove the public file (and its empty directory)
+#
+# Requests only schedule work. Operations are coalesced per path (the
+# last one wins) and run together once no new one arrived for
+# DATASET_PUBLISH_DELAY seconds, or at most DATASET_PUBLISH_MAX_DELAY
+# after the first, on a timer thread of this process.
+#
+# The outcome is stored on the Dataset rows using the file
+# (published_at / publish_error) and shown in the admin dataset list.
+# The timer is only a shortcut: a dataset with neither is still due,
+# whatever happened to the process that scheduled it. The dataset
+# worker (dataset_worker.py) reconciles the whole tree when it starts
+# and publishes due rows every DATASET_PUBLISH_SWEEP seconds;
+# `flask publish-datasets` runs the full pass by hand.
+# -------------------------------------------------------------------
+
+PUBLISH = "publish"
+UNPUBLISH = "unpublish"
+
+
+def _rel(download_url: str) -> Optional[str]:
+    prefix = DATASETS_URL + "/"
+    if not download_url or not download_url.startswith(prefix):
+        return None
+    return download_url[len(prefix):]
+
+
+def _source_dir(app: Flask) -> Path:
+    return Path(app.root_path) / DATASETS_DIR
+
+
+def _public_dir(app: Flask) -> Path:
+    return Path(app.static_folder) / "datasets"
+
+
+def _link_atomic(src: Path, dest: Path) -> None:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        # different filesystem (or no hardlink support)
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+
+
+def _is_current(src: Path, dest: Path) -> bool:
+    if not dest.exists():
+        return False
+    if os.path.samefile(src, dest):
+        return True
+    # copied (not linked): copy2 keeps size and mtime
+    a, b = src.stat(), dest.stat()
+    return a.st_size == b.st_size and a.st_mtime_ns == b.st_mtime_ns
+
+
+def publish_file(app: Flask, rel: str) -> bool:
+    """
+    Returns False when the public file already was this upload.
+    """
+    src = _source_dir(app) / rel
+    dest = _public_dir(app) / rel
+    if not src.exists():
+        raise FileNotFoundError(f"uploads/datasets/{rel} does not exist")
+    if _is_current(src, dest):
+        return False
+    _link_atomic(src, dest)
+    return True
+
+
+def unpublish_file(app: Flask, rel: str) -> None:
+    dest = _public_dir(app) / rel
+    dest.unlink(missing_ok=True)
+    if dest.parent != _public_dir(app):
+        try:
+            dest.parent.rmdir()
+        except OSError:
+            pass
+
+
+class Publisher:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: Dict[str, str] = {}
+        self._timer: Optional[threading.Timer] = None
+        self._first: Optional[float] = None
+
+    def schedule(self, app: Flask, rel: str, action: str) -> None:
+        delay = app.config.get("DATASET_PUBLISH_DELAY", 2.0)
+        max_delay = app.config.get("DATASET_PUBLISH_MAX_DELAY", 10.0)
+
+        with self._lock:
+            self._pending[rel] = action
+
+            now = time.monotonic()
+            if self._first is None:
+                self._first = now
+            elif now - self._first >= max_delay:
+                # keep the running timer: a steady burst must not
+                # postpone the publish forever
+                return
+
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(delay, self.run, args=(app,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def run(self, app: Flask) -> Dict[str, Tuple[str, Optional[str]]]:
+        """
+        Apply every pending operation now. Returns {rel: (action, error)}.
+        """
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+            self._first = None
+
+        with app.app_context():
+            return apply(app, batch)
+
+
+def apply(app: Flask, batch: Dict[str, str]) -> Dict[str, Tuple[str, Optional[str]]]:
+    """
+    Run {rel: action} operations now and record the outcome. Needs an
+    app context. Returns {rel: (action, error)}.
+    """
+    results = {}
+    for rel, action in batch.items():
+        error = None
+        try:
+            if action == PUBLISH:
+                publish_file(app, rel)
+            else:
+                unpublish_file(app, rel)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            app.logger.exception("Dataset %s of %s failed", action, rel)
+        results[rel] = (action, error)
+
+    _record(results)
+    return results
+
+
+def _record(results: Dict[str, Tuple[str, Optional[str]]]) -> None:
+    now = datetime.utcnow()
+    for rel, (action, error) in results.items():
+        if action != PUBLISH:
+            continue
+        # Bulk update: publish state is not read by any built page
+        Dataset.query.filter_by(download_url=f"{DATASETS_URL}/{rel}").update(
+            {"published_at": None if error else now, "publish_error": error},
+            synchronize_session=False,
+        )
+    db.session.commit()
+
+
+PUBLISHER = Publisher()
+
+
+def _schedule(download_url: str, action: str) -> None:
+    rel = _rel(download_url)
+    if rel is not None:
+        PUBLISHER.schedule(current_app._get_current_object(), rel, action)
+
+
+def publish(download_url: str) -> None:
+    """
+    Schedule a dataset file to be made public (call after commit).
+    """
+    _schedule(download_url, PUBLISH)
+
+
+def unpublish(download_url: str) -> None:
+    """
+    Schedule a dataset file's public copy for removal (call after commit).
+    """
+    _schedule(download_url, UNPUBLISH)
+
+
+def due() -> List[str]:
+    """
+    Paths of datasets that are neither published nor failed: scheduled
+    by a process that may have died before its timer ran.
+    """
+    rows = (
+        db.session.query(Dataset.download_url)
+        .filter(
+            Dataset.published_at.is_(None),
+            Dataset.publish_error.is_(None),
+            Dataset.download_url.startswith(DATASETS_URL + "/", autoescape=True),
+        )
+        .distinct()
+    )
+    return sorted({_rel(url) for (url,) in rows} - {None})
+
+
+def publish_due(app: Flask) -> Dict[str, Tuple[str, Optional[str]]]:
+    """
+    Publish every due dataset now (no-op for files already public).
+    """
+    return apply(app, {rel: PUBLISH for rel in due()})
+
+
+def reconcile(app: Flask) -> Tuple[int, int, int]:
+    """
+    Full pass: publish every uploaded file that is missing or stale in
+    the public directory, and every due dataset (recording an error when
+    its file is gone); remove public files with no upload. Returns
+    (published, removed, failed).
+    """
+    src_root, pub_root = _source_dir(app), _public_dir(app)
+    sources = {
+        p.relative_to(src_root).as_posix()
+        for p in src_root.rglob("*")
+        if p.is_file() and not p.name.endswith(".tmp")
+    } if src_root.exists() else set()
+    public = {
+        p.relative_to(pub_root).as_posix()
+        for p in pub_root.rglob("*")
+        if p.is_file() and not p.name.endswith(".tmp")
+    } if pub_root.exists() else set()
+
+    stale = [rel for rel in sources if not _is_current(src_root / rel, pub_root / rel)]
+
+    batch = {rel: PUBLISH for rel in sorted(sources | set(due()))}
+    batch.update({rel: UNPUBLISH for rel in sorted(public - sources)})
+    results = apply(app, batch)
+
+    failed = sum(1 for _, error in results.values() if error)
+    published = sum(1 for rel in stale if not results[rel][1])
+    removed = sum(1 for action, error in results.values() if action == UNPUBLISH and not error)
+    return published, removed, failed
+
+
+@click.command("publish-datasets")
+@with_appcontext
+def publish_datasets_command() -> None:
+    """Sync static/datasets/ with uploads/datasets/ (full pass)."""
+    published, removed, failed = reconcile(current_app._get_current_object())
+    click.echo(f"published {published} file(s), removed {removed}, failed {failed}")
+
+
+def init_app(app: Flask) -> None:
+    app.cli.add_command(publish_datasets_command)
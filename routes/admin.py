@@ -1,15 +1,15 @@
 from flask import (
     Blueprint,
+    Response,
     render_template,
     request,
     redirect,
     url_for,
-    current_app,
     abort,
     flash,
+    jsonify,
 )
 from flask_login import login_required
-from werkzeug.utils import secure_filename
 
 from models.dataset import Dataset
 from models.function_family import FunctionFamily
@@ -20,49 +20,22 @@ from models.dev import Dev
 from models.get_started import GetStarted
 from models.pipeline import Pipeline
 from models.pipeline_dataset import PipelineDataset
+from models.build_job import BuildJob
 from db import db
-from typing import Optional
+from sqlalchemy import func
+from typing import Callable, Dict, Iterable, Optional
+
+from builder.assets import assets_version
+from builder.profile import history as build_history
+from builder.queue import enqueue, flush_queue
+from uploads import remove_dataset_file, store_upload
+from dataset_profiler import schedule_profile
+from dataset_variants import drop_variants
+import cache
+import metrics
+import publisher
 
 from collections import defaultdict
-from jinja2 import Environment, FileSystemLoader
-from pathlib import Path
-import os
-import shutil
-from datetime import datetime
-
-import subprocess
-
-# -------------------------------------------------------------------
-# Jinja environment (you use it to render templates to static files)
-# -------------------------------------------------------------------
-env = Environment(
-    loader=FileSystemLoader("templates"),
-    autoescape=True,
-)
-
-# -------------------------------------------------------------------
-# Build output roots
-# -------------------------------------------------------------------
-BUILD_DIR = Path("builds")
-BUILD_DIR.mkdir(exist_ok=True)
-BASE_URL = "https://visondf.dev"
-
-DOCS_DIR = BUILD_DIR / "docs"  # builds/docs/...
-
-# Your filter axes for docs/show_functions
-NETWORK = ["any", "yes", "no"]
-GPU = ["any", "yes", "no"]
-
-FILTER_COMBINATIONS = [
-    "anyany",
-    "yesany",
-    "anyyes",
-    "yesyes",
-    "noany",
-    "anyno",
-    "nono",
-    "noyes",
-]
 
 bp = Blueprint("admin", __name__)
 
@@ -70,253 +43,47 @@ bp = Blueprint("admin", __name__)
 # Small helpers
 # -------------------------------------------------------------------
 
-def _write_html(path: Path, html: str) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(html, encoding="utf-8")
-
-    # atomic on POSIX
-    tmp.replace(path)
-
-def _rm_tree(path: Path) -> None:
-    shutil.rmtree(path, ignore_errors=True)
-
 def _bool_yes(value: Optional[str]) -> bool:
     return (value or "").strip().lower() == "yes"
 
-# -------------------------------------------------------------------
-# Rebuild helpers (THIS encodes your dependency graph)
-# -------------------------------------------------------------------
 
-def rebuild_sitemap() -> None:
-    urls = []
-
-    # 1. Homepage
-    urls.append({
-        "loc": f"{BASE_URL}/",
-        "priority": "1.0",
-        "changefreq": "weekly",
-    })
-
-    # 2. Walk all static HTML pages
-    for path in BUILD_DIR.rglob("*.html"):
-        if path.name == "index.html":
-            rel = path.parent.relative_to(BUILD_DIR)
-            url = f"{BASE_URL}/{rel}/" if str(rel) != "." else f"{BASE_URL}/"
-        else:
-            rel = path.relative_to(BUILD_DIR)
-            url = f"{BASE_URL}/{rel}"
-
-        # Exclusions
-        if "/admin/" in url:
-            continue
-
-        urls.append({
-            "loc": url,
-            "priority": "0.6",
-            "changefreq": "monthly",
-        })
-
-    today = datetime.utcnow().date().isoformat()
-
-    xml = [
-        '<?xml version="1.0" encoding="UTF-8"?>',
-        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
-    ]
-
-    for u in urls:
-        xml.append("  <url>")
-        xml.append(f"    <loc>{u['loc']}</loc>")
-        xml.append(f"    <lastmod>{today}</lastmod>")
-        xml.append(f"    <changefreq>{u['changefreq']}</changefreq>")
-        xml.append(f"    <priority>{u['priority']}</priority>")
-        xml.append("  </url>")
-
-    xml.append("</urlset>")
-
-    (BUILD_DIR / "sitemap.xml").write_text("\n".join(xml), encoding="utf-8")
-
-def rebuild_function_page(fn: FunctionImpl) -> None:
+def _count_by(column) -> Dict[int, int]:
     """
-    Rebuild ONLY the function detail page:
-      builds/docs/function_doc/<fn.id>/index.html
-
-    Trigger when:
-      - FunctionImpl fields change (summary/metadata/etc.)
-      - Benchmark changes (title/desc/highlighted)
-      - BenchmarkDataset changes (datasets list)
-
-    Notes:
-      - It is correct that benchmark changes affect ONLY this page.
-      - We read fn.benchmark and embed it, but we do not mutate it here.
+    {value: number of rows} in one GROUP BY query. Values with no row
+    are absent, so look them up with .get(key, 0).
     """
-    fn = FunctionImpl.query.get(fn.id)
-
-    benchmark = fn.benchmark
-    siblings = (
-        FunctionImpl.query.filter_by(family_id=fn.family_id)
-        .filter(FunctionImpl.id != fn.id)
+    return cache.cached(f"count_by:{column}", [column.class_], lambda: dict(
+        db.session.query(column, func.count())
+        .group_by(column)
         .all()
-    )
+    ))
 
-    html = env.get_template("docs/function.html").render(
-        fn=fn,
-        siblings=siblings,
-        benchmark=benchmark,
-    )
 
-    out = DOCS_DIR / "function_doc" / str(fn.id) / "index.html"
-    _write_html(out, html)
-    rebuild_sitemap()
-
-
-def rebuild_show_functions_for(fn: FunctionImpl) -> None:
+def _dataset_usage() -> Dict[int, dict]:
     """
-    Rebuild ONLY the show_functions listings for a given (family_id, api_level):
-      builds/docs/show_functions/<family>/<api>/<network><gpu>/index.html
-
-    Trigger when:
-      - FunctionImpl changes that affect cards/listing (summary, name, network/gpu, family, api)
-      - FunctionImpl create/delete
-      - Taxonomy reassignment
-
-    MUST NOT be triggered by benchmark changes.
+    Benchmarks and pipelines using each dataset, in two queries.
     """
-    all_fns = (
-        FunctionImpl.query.filter_by(api_level=fn.api_level, family_id=fn.family_id)
-        .all()
-    )
+    benchmarks = _count_by(BenchmarkDataset.dataset_id)
+    pipelines = _count_by(PipelineDataset.dataset_id)
 
-    api_level, complement_api_level = (
-        ("low", "high") if str(fn.api_level) == "low" else ("high", "low")
-    )
+    return {
+        dataset_id: {
+            "benchmarks": benchmarks.get(dataset_id, 0),
+            "pipelines": pipelines.get(dataset_id, 0),
+            "total": benchmarks.get(dataset_id, 0) + pipelines.get(dataset_id, 0),
+        }
+        for dataset_id in benchmarks.keys() | pipelines.keys()
+    }
 
-    base = DOCS_DIR / "show_functions" / str(fn.family_id) / api_level
-
-    for network in NETWORK:
-        for gpu in GPU:
-            filtered = [
-                f
-                for f in all_fns
-                if (network == "any" or f.network == (network == "yes"))
-                and (gpu == "any" or f.gpu == (gpu == "yes"))
-            ]
-
-            html = env.get_template("docs/doc_cards.html").render(
-                lvl=api_level,
-                family=True,
-                network=network,
-                gpu=gpu,
-                cards=filtered,
-                family_id=fn.family_id
-            )
-
-            out_dir = base / f"{network}{gpu}"
-            out_dir.mkdir(parents=True, exist_ok=True)
-            (out_dir / "index.html").write_text(html, encoding="utf-8")
-
-    base = DOCS_DIR / "show_functions" / str(fn.family_id) / complement_api_level
-
-    for network in NETWORK:
-        for gpu in GPU:
-            filtered = None
-
-            html = env.get_template("docs/doc_cards.html").render(
-                lvl=complement_api_level,
-                family=True,
-                network=network,
-                gpu=gpu,
-                cards=filtered,
-                family_id=fn.family_id
-            )
-
-            out_dir = base / f"{network}{gpu}"
-            out_dir.mkdir(parents=True, exist_ok=True)
-            (out_dir / "index.html").write_text(html, encoding="utf-8")
-    rebuild_sitemap()
-
-
-def rebuild_family_listings() -> None:
-    """
-    Rebuild family listings:
-      builds/docs/show_families/<low|high>/index.html
-    """
-    families = FunctionFamily.query.order_by(FunctionFamily.display_name).all()
 
-    out_base = DOCS_DIR / "show_families"
-    for lvl in ("low", "high"):
-        html = env.get_template("docs/doc_cards.html").render(
-            lvl=lvl,
-            family=False,
-            cards=families,
-        )
-        out = out_base / lvl / "index.html"
-        _write_html(out, html)
-    rebuild_sitemap()
-
-def rebuild_get_started_index() -> None:
+def _cached_page(models: Iterable[type], render: Callable[[], str]) -> str:
     """
-    Rebuild get started page:
-      builds/get_started/index.html
+    A list page from the shared cache (cache.py), recomputed once one
+    of the models it shows changed. The pages do not depend on who is
+    logged in, so one entry per endpoint serves everyone. The asset
+    manifest version is part of the name: the HTML embeds asset URLs.
     """
-    items = (
-        GetStarted.query.order_by(GetStarted.priority.asc(), GetStarted.id.asc()).all()
-    )
-    html = env.get_template("get_started/get_started.html").render(items=items)
-    out = BUILD_DIR / "get_started" / "index.html"
-    _write_html(out, html)
-    rebuild_sitemap()
-
-def rebuild_dev_pages(article_id: Optional[int] = None) -> None:
-    """
-    Rebuild dev list and optionally a single article page.
-      builds/dev/show_dev/index.html
-      builds/dev/dev/<id>/index.html
-    """
-    articles = Dev.query.order_by(Dev.created_at.desc()).all()
-
-    list_html = env.get_template("development/dev_cards.html").render(articles=articles)
-    _write_html(BUILD_DIR / "dev" / "show_dev" / "index.html", list_html)
-
-    if article_id is not None:
-        article = Dev.query.get(article_id)
-        if article is not None:
-            art_html = env.get_template("development/dev.html").render(article=article)
-            _write_html(BUILD_DIR / "dev" / "dev" / str(article.id) / "index.html", art_html)
-    rebuild_sitemap()
-
-def rebuild_pipeline_pages(pipeline_id: Optional[int] = None) -> None:
-    """
-    Rebuild pipeline list and optionally a single pipeline page.
-      builds/pipeline/show_pipeline/index.html
-      builds/pipeline/pipeline/<id>/index.html
-    """
-    pipelines = Pipeline.query.order_by(Pipeline.created_at.desc()).all()
-
-    list_html = env.get_template("pipeline/pipeline_cards.html").render(pipelines=pipelines)
-    _write_html(BUILD_DIR / "pipeline" / "show_pipeline" / "index.html", list_html)
-
-    if pipeline_id is not None:
-        pipeline = Pipeline.query.get(pipeline_id)
-        if pipeline is not None:
-            page_html = env.get_template("pipeline/pipeline.html").render(pipeline=pipeline)
-            _write_html(BUILD_DIR / "pipeline" / "pipeline" / str(pipeline.id) / "index.html", page_html)
-    rebuild_sitemap()
-
-def rebuild_highlight_bench() -> None:
-
-    benchs = (
-        Benchmark.query
-        .filter(Benchmark.highlighted.is_(True))
-        .order_by(Benchmark.created_at.desc())
-        .all()
-    )
-
-    html = env.get_template("benchmark/benchmark.html").render(benchs=benchs)
-    _write_html(BUILD_DIR / "benchmark" / "index.html", html)
-    rebuild_sitemap()
-
+    return cache.cached(f"admin:{request.endpoint}:{assets_version()}", models, render)
 
 # -------------------------------------------------------------------
 # Admin protection
@@ -327,12 +94,50 @@ def _protect_admin():
     pass
 
 
+@bp.after_request
+def _flush_rebuilds(response):
+    # Every page target derived from this request's commits (builder/deps)
+    # or enqueued by the handler goes to the build worker as a single
+    # job; the save itself returns right away.
+    job = flush_queue()
+    if job is not None:
+        response.headers["X-Build-Job"] = url_for("admin.build_status", job_id=job.id)
+    return response
+
+
 # -------------------------------------------------------------------
 # Dashboard
 # -------------------------------------------------------------------
 @bp.route("/")
 def dashboard():
-    return render_template("admin/admin_panel.html")
+    return render_template("admin/admin_panel.html", stats=metrics.snapshot())
+
+
+@bp.route("/metrics", methods=["GET"])
+def metrics_export():
+    return Response(
+        metrics.prometheus_text(),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
+# -------------------------------------------------------------------
+# Build jobs
+# -------------------------------------------------------------------
+@bp.route("/builds/<int:job_id>", methods=["GET"])
+def build_status(job_id: int):
+    job = BuildJob.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
+
+@bp.route("/build-stats", methods=["GET"])
+def build_stats():
+    profiles = build_history()
+    return render_template(
+        "admin/show/build_stats.html",
+        profiles=profiles,
+        latest=profiles[0].detail() if profiles else None,
+    )
 
 
 # -------------------------------------------------------------------
@@ -345,9 +150,6 @@ def edit_function_impl(function_id: int):
     datasets = Dataset.query.order_by(Dataset.name, Dataset.version).all()
 
     if request.method == "POST":
-        old_family_id = fn.family_id
-        old_api_level = fn.api_level
-
         fn.real_name = request.form["real_name"]
         fn.api_level = request.form["api_level"]
         fn.family_id = int(request.form["family_id"])
@@ -361,23 +163,10 @@ def edit_function_impl(function_id: int):
         fn.signature_html = request.form.get("signature_html")
         fn.description_html = request.form.get("description_html")
 
+        # Its page, its old and new family listings, siblings' switchers,
+        # get_started / benchmark cards: all derived by builder/deps.py
         db.session.commit()
 
-        # Always rebuild its function page
-        rebuild_function_page(fn)
-
-        # Rebuild listings affected by this function:
-        # - its NEW (family, api)
-        rebuild_show_functions_for(fn)
-        # - and if it moved family or api level, rebuild the OLD bucket too
-        if old_family_id != fn.family_id or old_api_level != fn.api_level:
-            class _Tmp:
-                pass
-            tmp = _Tmp()
-            tmp.family_id = old_family_id
-            tmp.api_level = old_api_level
-            rebuild_show_functions_for(tmp)  # type: ignore[arg-type]
-
         return redirect(url_for("admin.show_function_impl"))
 
     return render_template(
@@ -412,9 +201,6 @@ def add_function_impl():
         db.session.add(fn)
         db.session.commit()
 
-        rebuild_function_page(fn)
-        rebuild_show_functions_for(fn)
-
         return redirect(url_for("admin.show_function_impl"))
 
     return render_template(
@@ -428,27 +214,10 @@ def add_function_impl():
 def delete_function_impl(function_id: int):
     fn = FunctionImpl.query.get_or_404(function_id)
 
-    # Keep bucket info before deleting
-    family_id = fn.family_id
-    api_level = fn.api_level
-
+    # Removes its page folder and rebuilds the listings that showed it
     db.session.delete(fn)
     db.session.commit()
 
-    # Rebuild the listings bucket that contained it
-    class _Tmp:
-        pass
-    tmp = _Tmp()
-    tmp.family_id = family_id
-    tmp.api_level = api_level
-    rebuild_show_functions_for(tmp)  # type: ignore[arg-type]
-
-    # Remove the function page folder
-    _rm_tree(DOCS_DIR / "function_doc" / str(function_id))
-
-    rebuild_get_started_index()
-    rebuild_highlight_bench()
-
     return redirect(url_for("admin.show_function_impl"))
 
 
@@ -457,9 +226,11 @@ def delete_function_impl(function_id: int):
 # -------------------------------------------------------------------
 @bp.route("/datasets/edit", methods=["GET"])
 def edit_datasets():
-    datasets = Dataset.query.order_by(Dataset.created_at.desc()).all()
-    return render_template("admin/actions/edit_datasets.html", 
-                          datasets=datasets)
+    return _cached_page((Dataset, BenchmarkDataset, PipelineDataset), lambda: render_template(
+        "admin/actions/edit_datasets.html",
+        datasets=Dataset.query.order_by(Dataset.created_at.desc()).all(),
+        usage=_dataset_usage(),
+    ))
 
 @bp.route("/datasets/<int:dataset_id>/edit", methods=["GET", "POST"])
 def edit_dataset(dataset_id: int):
@@ -477,8 +248,6 @@ def edit_dataset(dataset_id: int):
 
 @bp.route("/datasets", methods=["GET", "POST"])
 def add_datasets():
-    UPLOAD_ROOT = os.path.join(current_app.root_path, "uploads", "datasets")
-
     if request.method == "POST":
         name = request.form["name"]
         version = request.form["version"]
@@ -488,31 +257,29 @@ def add_datasets():
         if not file or file.filename == "":
             raise ValueError("No file uploaded")
 
-        filename = secure_filename(file.filename)
-
-        # Ensure writable upload directory exists
-        os.makedirs(UPLOAD_ROOT, exist_ok=True)
-
-        filepath = os.path.join(UPLOAD_ROOT, filename)
-        file.save(filepath)
-
-        # Public URL remains stable
-        download_url = f"/static/datasets/{filename}"
+        # Already hashed while it streamed in (uploads.py); identical
+        # bytes reuse the stored file
+        checksum = file.stream.hexdigest()
+        same = Dataset.query.filter_by(checksum=checksum).first()
+        stored = store_upload(file, same.download_url if same else None)
 
         dataset = Dataset(
             name=name,
             version=version,
             description=description,
-            download_url=download_url,
+            download_url=stored.download_url,
+            checksum=stored.checksum,
+            size_bytes=stored.size_bytes,
         )
         db.session.add(dataset)
         db.session.commit()
 
-        subprocess.Popen(
-            ["sudo", "/bin/systemctl", "start", "visondf-publish.service"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
+        # No-op (but marks the row published) when the bytes were
+        # already stored and public
+        publisher.publish(stored.download_url)
+        # Background; no-op when these bytes were profiled before.
+        # Download variants follow once the profile is done.
+        schedule_profile(dataset)
 
         return redirect(url_for("admin.show_datasets"))
 
@@ -534,27 +301,31 @@ def delete_dataset(dataset_id: int):
     if usage_count > 0:
         abort(400, "Dataset is still used by benchmarks")
 
-    # Delete from authoring storage only
-    if dataset.download_url:
-        filename = os.path.basename(dataset.download_url)
-        upload_path = os.path.join(
-            current_app.root_path,
-            "uploads",
-            "datasets",
-            filename,
-        )
-
-        if os.path.exists(upload_path):
-            os.remove(upload_path)
+    # Delete the file, unless another dataset row shares the
+    # (content-addressed) file
+    download_url = dataset.download_url
+    variant_urls = []
+    shared = (
+        download_url
+        and Dataset.query
+        .filter(Dataset.download_url == download_url)
+        .filter(Dataset.id != dataset.id)
+        .first()
+    )
+    if download_url and not shared:
+        # variants live in the same directory: first
+        variant_urls = drop_variants(dataset.checksum) if dataset.checksum else []
+        remove_dataset_file(download_url)
+        if dataset.profile is not None:
+            db.session.delete(dataset.profile)
 
     db.session.delete(dataset)
     db.session.commit()
 
-    subprocess.Popen(
-        ["sudo", "/bin/systemctl", "start", "visondf-publish.service"],
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
+    if download_url and not shared:
+        publisher.unpublish(download_url)
+    for url in variant_urls:
+        publisher.unpublish(url)
 
     return redirect(url_for("admin.show_datasets"))
 
@@ -573,22 +344,11 @@ def taxonomy():
             new_family_id = request.form.get(field_name)
 
             if new_family_id and int(new_family_id) != fn.family_id:
-                old_family_id = fn.family_id
-                old_api_level = fn.api_level
-
                 fn.family_id = int(new_family_id)
-                db.session.commit()
 
-                rebuild_function_page(fn)
-                rebuild_show_functions_for(fn)
-
-                # Also rebuild old bucket where it came from
-                class _Tmp:
-                    pass
-                tmp = _Tmp()
-                tmp.family_id = old_family_id
-                tmp.api_level = old_api_level
-                rebuild_show_functions_for(tmp)  # type: ignore[arg-type]
+        # One transaction for the whole form; each affected page is built
+        # once, after it
+        db.session.commit()
 
         return redirect(url_for("admin.dashboard"))
 
@@ -617,21 +377,6 @@ def add_function_family():
         db.session.add(family)
         db.session.commit()
 
-        rebuild_family_listings()
-
-        # Create skeleton dirs for show_functions filters
-        out_functions_base = DOCS_DIR / "show_functions" / str(family.id)
-        for lvl in ("low", "high"):
-            for combo in FILTER_COMBINATIONS:
-                (out_functions_base / lvl / combo).mkdir(parents=True, exist_ok=True)
-
-        class _Tmp:
-            pass
-        tmp = _Tmp()
-        tmp.family_id = family.id
-        tmp.api_level = "low"
-        rebuild_show_functions_for(tmp) 
-
         return redirect(url_for("admin.show_function_family"))
 
     families = FunctionFamily.query.order_by(FunctionFamily.display_name).all()
@@ -648,7 +393,6 @@ def edit_function_family(family_id: int):
         family.description = request.form.get("description")
         db.session.commit()
 
-        rebuild_family_listings()
         return redirect(url_for("admin.show_function_family"))
 
     return render_template("admin/actions/edit_function_family.html", family=family)
@@ -667,9 +411,6 @@ def delete_function_family(family_id: int):
     db.session.delete(family)
     db.session.commit()
 
-    rebuild_family_listings()
-    _rm_tree(DOCS_DIR / "show_functions" / str(family_id))
-
     print("ok")
 
     return redirect(url_for("admin.show_function_family"))
@@ -680,30 +421,40 @@ def delete_function_family(family_id: int):
 # -------------------------------------------------------------------
 @bp.route("/datasets/show", methods=["GET"])
 def show_datasets():
-    datasets = Dataset.query.order_by(Dataset.created_at.desc()).all()
-    return render_template("admin/show/datasets.html", datasets=datasets)
+    return _cached_page((Dataset,), lambda: render_template(
+        "admin/show/datasets.html",
+        datasets=Dataset.query.order_by(Dataset.created_at.desc()).all(),
+    ))
 
 
 @bp.route("/function_family/show", methods=["GET"])
 def show_function_family():
-    families = FunctionFamily.query.order_by(FunctionFamily.display_name).all()
-    return render_template("admin/show/function_family.html", families=families)
+    return _cached_page((FunctionFamily, FunctionImpl), lambda: render_template(
+        "admin/show/function_family.html",
+        families=FunctionFamily.query.order_by(FunctionFamily.display_name).all(),
+        usage_counts=_count_by(FunctionImpl.family_id),
+    ))
 
 
 @bp.route("/function_impl/show", methods=["GET"])
 def show_function_impl():
-    functions = FunctionImpl.query.order_by(FunctionImpl.real_name).all()
-    return render_template("admin/show/function_impl.html", functions=functions)
+    return _cached_page((FunctionImpl, FunctionFamily, Dataset), lambda: render_template(
+        "admin/show/function_impl.html",
+        functions=FunctionImpl.query.order_by(FunctionImpl.real_name).all(),
+    ))
 
 
 @bp.route("/benchmarks/show", methods=["GET"])
 def show_benchs():
-    benchmarks = (
-        Benchmark.query.join(FunctionImpl)
-        .order_by(FunctionImpl.real_name)
-        .all()
-    )
-    return render_template("admin/show/benchmarks.html", benchmarks=benchmarks)
+    models = (Benchmark, BenchmarkDataset, Dataset, FunctionImpl, FunctionFamily)
+    return _cached_page(models, lambda: render_template(
+        "admin/show/benchmarks.html",
+        benchmarks=(
+            Benchmark.query.join(FunctionImpl)
+            .order_by(FunctionImpl.real_name)
+            .all()
+        ),
+    ))
 
 
 # -------------------------------------------------------------------
@@ -711,8 +462,10 @@ def show_benchs():
 # -------------------------------------------------------------------
 @bp.route("/dev/show", methods=["GET"])
 def show_dev():
-    articles = Dev.query.order_by(Dev.created_at.desc()).all()
-    return render_template("admin/show/dev.html", articles=articles)
+    return _cached_page((Dev,), lambda: render_template(
+        "admin/show/dev.html",
+        articles=Dev.query.order_by(Dev.created_at.desc()).all(),
+    ))
 
 
 @bp.route("/dev/add", methods=["GET", "POST"])
@@ -725,7 +478,6 @@ def add_dev():
         db.session.add(article)
         db.session.commit()
 
-        rebuild_dev_pages(article.id)
         return redirect(url_for("admin.show_dev"))
 
     return render_template("admin/actions/add_dev.html")
@@ -740,7 +492,6 @@ def edit_dev(article_id: int):
         article.description_html = request.form.get("description_html")
         db.session.commit()
 
-        rebuild_dev_pages(article.id)
         return redirect(url_for("admin.show_dev"))
 
     return render_template("admin/actions/edit_dev.html", article=article)
@@ -752,9 +503,6 @@ def delete_dev(article_id: int):
     db.session.delete(article)
     db.session.commit()
 
-    _rm_tree(BUILD_DIR / "dev" / "dev" / str(article_id))
-    rebuild_dev_pages(None)
-
     return redirect(url_for("admin.show_dev"))
 
 
@@ -763,8 +511,10 @@ def delete_dev(article_id: int):
 # -------------------------------------------------------------------
 @bp.route("/get_started/show", methods=["GET"])
 def show_get_started():
-    plans = GetStarted.query.order_by(GetStarted.priority.asc(), GetStarted.id.asc()).all()
-    return render_template("admin/show/get_started.html", plans=plans)
+    return _cached_page((GetStarted, FunctionImpl), lambda: render_template(
+        "admin/show/get_started.html",
+        plans=GetStarted.query.order_by(GetStarted.priority.asc(), GetStarted.id.asc()).all(),
+    ))
 
 
 @bp.route("/get_started/add", methods=["GET", "POST"])
@@ -791,7 +541,6 @@ def add_get_started():
         db.session.add(plan)
         db.session.commit()
 
-        rebuild_get_started_index()
         return redirect(url_for("admin.show_get_started"))
 
     return render_template("admin/actions/add_get_started.html", fns=fns)
@@ -810,7 +559,6 @@ def edit_get_started(plan_id: int):
         plan.function_impl = fn
 
         db.session.commit()
-        rebuild_get_started_index()
 
         return redirect(url_for("admin.show_get_started"))
 
@@ -823,7 +571,6 @@ def delete_get_started(plan_id: int):
     db.session.delete(plan)
     db.session.commit()
 
-    rebuild_get_started_index()
     return redirect(url_for("admin.show_get_started"))
 
 
@@ -832,8 +579,10 @@ def delete_get_started(plan_id: int):
 # -------------------------------------------------------------------
 @bp.route("/pipeline/show", methods=["GET"])
 def show_pipeline():
-    pipelines = Pipeline.query.all()
-    return render_template("admin/show/pipeline.html", pipelines=pipelines)
+    return _cached_page((Pipeline, PipelineDataset, Dataset), lambda: render_template(
+        "admin/show/pipeline.html",
+        pipelines=Pipeline.query.all(),
+    ))
 
 
 @bp.route("/pipeline/add", methods=["GET", "POST"])
@@ -846,7 +595,6 @@ def add_pipeline():
         db.session.add(pipeline)
         db.session.commit()
 
-        rebuild_pipeline_pages(pipeline.id)
         return redirect(url_for("admin.show_pipeline"))
 
     return render_template("admin/actions/add_pipeline.html")
@@ -861,7 +609,6 @@ def edit_pipeline(pipeline_id: int):
         pipeline.description_html = request.form.get("description_html")
         db.session.commit()
 
-        rebuild_pipeline_pages(pipeline.id)
         return redirect(url_for("admin.show_pipeline"))
 
     return render_template("admin/actions/edit_pipeline.html", pipeline=pipeline)
@@ -883,7 +630,10 @@ def edit_pipeline_datasets(pipeline_id: int):
             db.session.add(PipelineDataset(pipeline_id=pipeline.id, dataset_id=ds_id))
 
         db.session.commit()
-        rebuild_pipeline_pages(pipeline.id)
+
+        # The bulk delete above bypasses the ORM change events: builder/deps
+        # never sees the removed links, so name the page explicitly
+        enqueue("pipeline", pipeline.id)
 
         return redirect(url_for("admin.show_pipeline"))
 
@@ -900,9 +650,6 @@ def delete_pipeline(pipeline_id: int):
     db.session.delete(pipeline)
     db.session.commit()
 
-    _rm_tree(BUILD_DIR / "pipeline" / "pipeline" / str(pipeline_id))
-    rebuild_pipeline_pages(None)
-
     return redirect(url_for("admin.show_pipeline"))
 
 
@@ -927,13 +674,10 @@ def edit_benchmark(function_impl_id):
         bench.description_html = description_html
         bench.highlighted = highlighted
 
+        # Benchmark changes affect ONLY the function page (and the
+        # highlighted list when highlighted): see builder/deps.py
         db.session.commit()
 
-        # Benchmark changes affect ONLY the function page
-        rebuild_function_page(fn)
-
-        rebuild_highlight_bench()
-
         flash("Benchmark saved.", "success")
         return redirect(url_for("admin.show_benchs"))
 
@@ -967,13 +711,10 @@ def add_benchmark():
         )
         db.session.add(bench)
 
+        # Benchmark changes affect ONLY the function page (and the
+        # highlighted list when highlighted): see builder/deps.py
         db.session.commit()
 
-        # Benchmark changes affect ONLY the function page
-        rebuild_function_page(fn)
-
-        rebuild_highlight_bench()
-
         flash("Benchmark saved.", "success")
 
         return redirect(url_for("admin.show_benchs"))
@@ -999,11 +740,9 @@ def edit_benchmark_datasets(bench_id):
 
         db.session.commit()
 
-        fn = FunctionImpl.query.get_or_404(bench.function_impl_id)
-
-        # Dataset changes affect ONLY the function page
-        rebuild_function_page(fn)
-        rebuild_highlight_bench()
+        # Dataset changes affect ONLY the function page. The bulk delete
+        # above bypasses the ORM change events, so name it explicitly
+        enqueue("function_doc", bench.function_impl_id)
 
         flash("Benchmark datasets updated.", "success")
         return redirect(url_for("admin.show_benchs"))
@@ -1027,9 +766,6 @@ def delete_benchmark():
         db.session.delete(fn.benchmark)
         db.session.commit()
 
-    rebuild_function_page(fn)
-    rebuild_highlight_bench()
-
     flash("Benchmark deleted.", "success")
     return redirect(url_for("admin.show_benchs", function_id=fn.id))
 
@@ -0,0 +1,153 @@
+// =========================
+// Docs search (no backend)
+//
+// Reads the index written by builder/search.py under /search/:
+//   meta.json        version, shard layout
+//   idx/<c>.json     {"p": {prefix: [ids]}, "t": {trigram: [ids]}}
+//   docs/<n>.json    {id: [name, family, api_level, network, gpu, summary]}
+// Shards are fetched on demand and kept for the page's lifetime.
+// =========================
+(function () {
+  const input = document.getElementById("search-input");
+  const results = document.getElementById("search-results");
+  if (!input || !results) return;
+
+  const BASE = "/search/";
+  const MAX_RESULTS = 12;
+
+  let meta = null;
+  const shards = new Map();
+
+  async function getMeta() {
+    if (!meta) {
+      const res = await fetch(BASE + "meta.json", { cache: "no-cache" });
+      meta = await res.json();
+    }
+    return meta;
+  }
+
+  function load(path) {
+    if (!shards.has(path)) {
+      shards.set(
+        path,
+        fetch(`${BASE}${path}?v=${meta.version}`)
+          .then((res) => (res.ok ? res.json() : {}))
+          .catch(() => ({}))
+      );
+    }
+    return shards.get(path);
+  }
+
+  function shardOf(term) {
+    return /[a-z0-9_]/.test(term[0]) ? term[0] : "_";
+  }
+
+  function intersect(a, b) {
+    return a === null ? b : new Set([...a].filter((id) => b.has(id)));
+  }
+
+  async function idsFor(word) {
+    const idx = await load(`idx/${shardOf(word)}.json`);
+    const hits = (idx.p || {})[word.slice(0, meta.max_prefix)];
+    if (hits) return new Set(hits);
+
+    // Not a prefix of any word: look for it inside words
+    if (word.length < 3) return new Set();
+    let acc = null;
+    for (let i = 0; i + 3 <= word.length; i++) {
+      const tri = word.slice(i, i + 3);
+      const shard = await load(`idx/${shardOf(tri)}.json`);
+      acc = intersect(acc, new Set((shard.t || {})[tri] || []));
+      if (!acc.size) break;
+    }
+    return acc || new Set();
+  }
+
+  function rank(doc, query) {
+    const name = doc[0].toLowerCase();
+    if (name === query) return 0;
+    if (name.startsWith(query)) return 1;
+    if (name.includes(query)) return 2;
+    return 3;
+  }
+
+  async function search(query) {
+    const words = query.toLowerCase().match(/[a-z0-9_]+/g);
+    if (!words) return [];
+
+    await getMeta();
+
+    let ids = null;
+    for (const word of words) {
+      ids = intersect(ids, await idsFor(word));
+      if (!ids.size) return [];
+    }
+
+    const docs = await Promise.all(
+      [...ids].map(async (id) => {
+        const shard = await load(`docs/${id % meta.doc_shards}.json`);
+        return shard[id] ? [id, shard[id]] : null;
+      })
+    );
+
+    const q = words.join("_");
+    return docs
+      .filter(Boolean)
+      .sort((a, b) => rank(a[1], q) - rank(b[1], q) || a[1][0].localeCompare(b[1][0]))
+      .slice(0, MAX_RESULTS);
+  }
+
+  function render(hits) {
+    results.replaceChildren();
+
+    for (const [id, [name, family, lvl, network, gpu, summary]] of hits) {
+      const li = document.createElement("li");
+      const a = document.createElement("a");
+      a.href = `/docs/function_doc/${id}/`;
+
+      const title = document.createElement("strong");
+      title.textContent = name;
+
+      const info = document.createElement("small");
+      const flags = [family, `${lvl}-level`];
+      if (network) flags.push("network");
+      if (gpu) flags.push("gpu");
+      info.textContent = flags.join(" · ");
+
+      const text = document.createElement("span");
+      text.textContent = summary;
+
+      a.append(title, info, text);
+      li.append(a);
+      results.append(li);
+    }
+
+    results.hidden = hits.length === 0;
+  }
+
+  let timer;
+  let latest = 0;
+
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(async () => {
+      const ticket = ++latest;
+      const hits = await search(input.value.trim());
+      if (ticket === latest) render(hits);
+    }, 80);
+  });
+
+  input.addEventListener("keydown", (e) => {
+    if (e.key === "Enter") {
+      const first = results.querySelector("a");
+      if (first) window.location.href = first.href;
+      e.preventDefault();
+    } else if (e.key === "Escape") {
+      input.value = "";
+      render([]);
+    }
+  });
+
+  // Warm the index on first focus, before the first keystroke
+  input.addEventListener("focus", () => getMeta().catch(() => {}), { once: true });
+})();
@@ -0,0 +1,156 @@
+from hashlib import sha256
+from pathlib import Path
+from typing import NamedTuple, Optional
+import os
+import tempfile
+
+from flask import Flask, Request, current_app
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+# -------------------------------------------------------------------
+# Dataset uploads
+#
+# Uploaded files never sit in memory and are never copied: werkzeug's
+# multipart parser writes each chunk straight into a HashingFile, a
+# temp file under uploads/tmp that updates a SHA-256 and a byte count
+# as it goes and refuses to grow past DATASET_MAX_BYTES. (The whole
+# body is also capped by MAX_CONTENT_LENGTH, checked before reading.)
+#
+# store_upload() then renames the temp file into content-addressed
+# storage, same filesystem so it is a rename, not a copy:
+#
+#   uploads/datasets/<sha256[:16]>/<filename>
+#   -> /static/datasets/<sha256[:16]>/<filename>
+#
+# The same bytes uploaded again (under any name) are dropped and the
+# existing file is reused, and two different files with the same name
+# no longer overwrite each other.
+# -------------------------------------------------------------------
+
+UPLOAD_DIR = Path("uploads")
+DATASETS_DIR = UPLOAD_DIR / "datasets"
+TMP_DIR = UPLOAD_DIR / "tmp"
+
+# Public URL prefix of DATASETS_DIR (published by the dataset publisher)
+DATASETS_URL = "/static/datasets"
+
+# Hex digits of the checksum used as storage directory
+ADDRESS_CHARS = 16
+
+
+def _root() -> Path:
+    return Path(current_app.root_path)
+
+
+class HashingFile:
+    """
+    Write-only temp file that hashes and counts what is written to it.
+    Removed on close unless store_upload() moved it into place.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=directory, suffix=".part")
+        self._file = os.fdopen(fd, "w+b")
+        self.path = Path(name)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = sha256()
+        self.kept = False
+
+    def write(self, chunk: bytes) -> int:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise RequestEntityTooLarge(
+                f"Dataset larger than {self.max_bytes} bytes"
+            )
+        self._hash.update(chunk)
+        return self._file.write(chunk)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        if not self.kept:
+            self.path.unlink(missing_ok=True)
+
+    def __getattr__(self, name):
+        # seek/read/flush/... for FileStorage
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        return HashingFile(
+            _root() / config.get("UPLOAD_TMP_DIR", TMP_DIR),
+            config.get("DATASET_MAX_BYTES", 1 << 34),
+        )
+
+
+class StoredFile(NamedTuple):
+    checksum: str
+    size_bytes: int
+    download_url: str
+    # False when identical bytes were already stored (nothing written)
+    created: bool
+
+
+def dataset_path(download_url: str) -> Optional[Path]:
+    """
+    On-disk location of a dataset's public URL, if it is one of ours.
+    """
+    prefix = DATASETS_URL + "/"
+    if not download_url or not download_url.startswith(prefix):
+        return None
+    return _root() / DATASETS_DIR / download_url[len(prefix):]
+
+
+def store_upload(file: FileStorage, existing_url: Optional[str] = None) -> StoredFile:
+    """
+    Move an uploaded file into content-addressed storage.
+
+    existing_url is the download_url of a dataset already holding the
+    same checksum (the caller looks it up); its file is reused.
+    """
+    stream = file.stream
+    if not isinstance(stream, HashingFile):
+        raise TypeError("store_upload() needs UploadRequest as the app's request_class")
+
+    stream.flush()
+    checksum = stream.hexdigest()
+
+    if existing_url is not None and dataset_path(existing_url) and dataset_path(existing_url).exists():
+        return StoredFile(checksum, stream.size, existing_url, False)
+
+    filename = secure_filename(file.filename or "") or "dataset"
+    rel = f"{checksum[:ADDRESS_CHARS]}/{filename}"
+    dest = _root() / DATASETS_DIR / rel
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    os.replace(stream.path, dest)
+    stream.kept = True
+
+    return StoredFile(checksum, stream.size, f"{DATASETS_URL}/{rel}", True)
+
+
+def remove_dataset_file(download_url: str) -> None:
+    """
+    Delete a stored dataset file and its (then empty) address directory.
+    """
+    path = dataset_path(download_url)
+    if path is None:
+        return
+    path.unlink(missing_ok=True)
+    try:
+        path.parent.rmdir()
+    except OSError:
+        pass
+
+
+def init_app(app: Flask) -> None:
+    app.request_class = UploadRequest